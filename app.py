@@ -1,29 +1,57 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context, send_from_directory, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context, send_from_directory, send_file, make_response
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 from functools import wraps
 import os
+import csv
+import gzip
+import hashlib
+import importlib.util
 import json
 import time
 import threading
 import logging
-from io import BytesIO
+import math
+import mimetypes
+import multiprocessing
+import queue
+import re
+import secrets
+import socket
+import socketserver
+import sqlite3
+import stat
+import sys
+import tempfile
+import unicodedata
+import uuid
+import zipfile
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from io import StringIO
+from itertools import groupby
+
+from reportes_agregacion import (
+    calcular_reporte_mensual, empaquetar_reporte, guardar_datos_reporte, leer_datos_reporte, rango_mes
+)
+from reportes_pdf import renderizar_reporte_pdf
 
 try:
-    from fpdf import FPDF
+    import brotli
 except ImportError:
-    print("FPDF no está instalado. Instalando...")
-    os.system("pip install fpdf2")
-    from fpdf import FPDF
+    brotli = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'sabirus-warmi-secret-key-2024'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///sabirus_warmi.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SABIRUS_DATABASE_URI', 'sqlite:///sabirus_warmi.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
@@ -31,6 +59,20 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 db = SQLAlchemy(app)
 
+# WAL deja leer mientras otro proceso escribe; busy_timeout hace que los escritores
+# concurrentes esperen su turno en lugar de fallar con "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SABIRUS_SQLITE_BUSY_TIMEOUT_MS', 15000))
+
+@event.listens_for(Engine, 'connect')
+def configurar_sqlite(conexion, _registro):
+    if not isinstance(conexion, sqlite3.Connection):
+        return
+    cursor = conexion.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.close()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -56,7 +98,7 @@ class Producto(db.Model):
     stock_minimo = db.Column(db.Integer, default=5)
     proveedor = db.Column(db.String(100))
     imagen = db.Column(db.String(200))
-    activo = db.Column(db.Boolean, default=True)
+    activo = db.Column(db.Boolean, default=True, index=True)
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Cliente(db.Model):
@@ -65,11 +107,17 @@ class Cliente(db.Model):
     telefono = db.Column(db.String(20))
     email = db.Column(db.String(100))
     direccion = db.Column(db.String(200))
-    fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_registro = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     ventas = db.relationship('Venta', backref='cliente', lazy=True, cascade='all, delete-orphan')
     alquileres = db.relationship('Alquiler', backref='cliente', lazy=True, cascade='all, delete-orphan')
 
 class Venta(db.Model):
+    # (fecha, total) cubre los totales por rango de fechas sin leer la tabla;
+    # (cliente_id, fecha, total) cubre el resumen de compras por cliente
+    __table_args__ = (
+        db.Index('ix_venta_fecha', 'fecha', 'total'),
+        db.Index('ix_venta_cliente_id', 'cliente_id', 'fecha', 'total'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
@@ -81,14 +129,19 @@ class Venta(db.Model):
 
 class DetalleVenta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    venta_id = db.Column(db.Integer, db.ForeignKey('venta.id'), nullable=False)
-    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False)
+    venta_id = db.Column(db.Integer, db.ForeignKey('venta.id'), nullable=False, index=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False, index=True)
     cantidad = db.Column(db.Integer, nullable=False)
     precio_unitario = db.Column(db.Float, nullable=False)
     subtotal = db.Column(db.Float, nullable=False)
     producto = db.relationship('Producto', backref='detalles_venta')
 
 class Alquiler(db.Model):
+    __table_args__ = (
+        db.Index('ix_alquiler_fecha_registro', 'fecha_registro', 'total'),
+        db.Index('ix_alquiler_estado', 'estado', 'fecha_fin'),
+        db.Index('ix_alquiler_cliente_id', 'cliente_id', 'fecha_registro', 'total'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
@@ -106,8 +159,8 @@ class Alquiler(db.Model):
 
 class DetalleAlquiler(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    alquiler_id = db.Column(db.Integer, db.ForeignKey('alquiler.id'), nullable=False)
-    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False)
+    alquiler_id = db.Column(db.Integer, db.ForeignKey('alquiler.id'), nullable=False, index=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False, index=True)
     cantidad = db.Column(db.Integer, nullable=False)
     precio_dia = db.Column(db.Float, nullable=False)
     dias = db.Column(db.Integer, nullable=False)
@@ -123,60 +176,1134 @@ class ReporteMensual(db.Model):
     total_alquileres = db.Column(db.Integer, default=0)
     ingresos_alquileres = db.Column(db.Float, default=0)
     
-    productos_json = db.Column(db.Text)
-    clientes_json = db.Column(db.Text)
-    clientes_nuevos_json = db.Column(db.Text)
-    productos_stock_bajo_json = db.Column(db.Text)
-    ventas_por_dia_json = db.Column(db.Text)
-    ventas_por_metodo_pago_json = db.Column(db.Text)
-    productos_mas_reabastecidos_json = db.Column(db.Text)
-    ventas_por_tipo_producto_json = db.Column(db.Text)
-    alquileres_activos_json = db.Column(db.Text)
-    productos_mas_alquilados_json = db.Column(db.Text)
+    # Respuesta completa de /api/reportes/<id> ya serializada y comprimida con gzip
+    contenido = db.Column(db.LargeBinary)
     
     fecha_generacion = db.Column(db.DateTime, default=datetime.utcnow)
 
-# ==================== CLASE PDF ====================
-class PDF(FPDF):
+class ResumenContadores(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    total_productos = db.Column(db.Integer, default=0, nullable=False)
+    total_clientes = db.Column(db.Integer, default=0, nullable=False)
+    total_ventas = db.Column(db.Integer, default=0, nullable=False)
+    ingresos_ventas = db.Column(db.Float, default=0, nullable=False)
+    total_alquileres = db.Column(db.Integer, default=0, nullable=False)
+    alquileres_activos = db.Column(db.Integer, default=0, nullable=False)
+    ingresos_alquileres = db.Column(db.Float, default=0, nullable=False)
+
+class VentasDiarias(db.Model):
+    fecha = db.Column(db.Date, primary_key=True)
+    cantidad = db.Column(db.Integer, default=0, nullable=False)
+    total = db.Column(db.Float, default=0, nullable=False)
+
+class Trabajo(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    estado = db.Column(db.String(20), default='pendiente', nullable=False)
+    total = db.Column(db.Integer)
+    procesados = db.Column(db.Integer, default=0)
+    resultado_json = db.Column(db.Text)
+    errores_json = db.Column(db.Text)
+    mensaje = db.Column(db.Text)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'))
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_fin = db.Column(db.DateTime)
+
+class VersionRecurso(db.Model):
+    recurso = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+# Fila de version_recurso con un valor aleatorio propio de cada base: las versiones vuelven a
+# cero si la base se recrea, y el token evita que un ETag anterior coincida con datos nuevos
+RECURSO_BASE = '_base'
+
+# ==================== CONTADORES DEL DASHBOARD ====================
+# Se actualizan dentro de la misma transacción que la escritura que los modifica;
+# reconciliar_contadores() los reconstruye desde las tablas base.
+def ajustar_contadores(**deltas):
+    db.session.query(ResumenContadores).filter_by(id=1).update(
+        {getattr(ResumenContadores, campo): getattr(ResumenContadores, campo) + delta for campo, delta in deltas.items()},
+        synchronize_session=False
+    )
+
+def ajustar_ventas_diarias(fecha, cantidad, total):
+    sentencia = sqlite_insert(VentasDiarias).values(fecha=fecha.date(), cantidad=cantidad, total=total)
+    db.session.execute(sentencia.on_conflict_do_update(
+        index_elements=[VentasDiarias.fecha],
+        set_={
+            'cantidad': VentasDiarias.cantidad + sentencia.excluded.cantidad,
+            'total': VentasDiarias.total + sentencia.excluded.total
+        }
+    ))
+
+def reconciliar_contadores():
+    resumen = db.session.get(ResumenContadores, 1)
+    if resumen is None:
+        resumen = ResumenContadores(id=1)
+        db.session.add(resumen)
+    
+    resumen.total_productos = Producto.query.filter_by(activo=True).count()
+    resumen.total_clientes = Cliente.query.count()
+    resumen.total_ventas, resumen.ingresos_ventas = db.session.query(
+        db.func.count(Venta.id), db.func.coalesce(db.func.sum(Venta.total), 0)
+    ).one()
+    resumen.total_alquileres, resumen.ingresos_alquileres = db.session.query(
+        db.func.count(Alquiler.id), db.func.coalesce(db.func.sum(Alquiler.total), 0)
+    ).one()
+    resumen.alquileres_activos = Alquiler.query.filter_by(estado='activo').count()
+    
+    VentasDiarias.query.delete()
+    por_dia = db.session.query(
+        db.func.date(Venta.fecha), db.func.count(Venta.id), db.func.sum(Venta.total)
+    ).group_by(db.func.date(Venta.fecha)).all()
+    db.session.add_all([
+        VentasDiarias(fecha=datetime.strptime(dia, '%Y-%m-%d').date(), cantidad=cantidad, total=total)
+        for dia, cantidad, total in por_dia
+    ])
+    db.session.commit()
+    return resumen
+
+# ==================== RESERVA DE STOCK ====================
+class StockInsuficiente(Exception):
+    def __init__(self, productos):
+        super().__init__(f"Stock insuficiente: {', '.join(productos)}")
+        self.productos = productos
+
+def cantidades_por_producto(items):
+    cantidades = Counter()
+    for item in items:
+        cantidad = int(item['cantidad'])
+        if cantidad <= 0:
+            raise ValueError('La cantidad debe ser mayor que cero')
+        cantidades[int(item['producto_id'])] += cantidad
+    return cantidades
+
+def descontar_stock(cantidades):
+    """UPDATE condicional sobre {producto_id: cantidad}; devuelve los ids que sí alcanzaron."""
+    # La condición stock >= cantidad se evalúa con el valor vigente al escribir, no con el
+    # leído antes: dos cajas vendiendo las últimas unidades no pueden dejarlo negativo
+    cantidad = db.case(dict(cantidades), value=Producto.id)
+    return set(db.session.execute(
+        db.update(Producto)
+        .where(Producto.id.in_(cantidades), Producto.stock >= cantidad)
+        .values(stock=Producto.stock - cantidad)
+        .returning(Producto.id),
+        execution_options={'synchronize_session': 'fetch'}
+    ).scalars())
+
+def reservar_stock(items, para_alquiler=False):
+    """Descuenta el stock de todo el carrito en un único UPDATE condicional.
+    
+    Devuelve {producto_id: Producto}. Si algún producto no alcanza lanza StockInsuficiente
+    y quien llama debe hacer rollback: el UPDATE puede haber descontado los demás.
+    """
+    cantidades = cantidades_por_producto(items)
+    productos = {p.id: p for p in Producto.query.filter(Producto.id.in_(cantidades)).all()}
+    for producto_id in cantidades:
+        if producto_id not in productos:
+            raise ValueError(f'Producto {producto_id} no encontrado')
+        if para_alquiler and not productos[producto_id].disponible_alquiler:
+            raise ValueError(f'{productos[producto_id].nombre} no está disponible para alquiler')
+    
+    reservados = descontar_stock(cantidades)
+    faltantes = [productos[producto_id].nombre for producto_id in cantidades if producto_id not in reservados]
+    if faltantes:
+        raise StockInsuficiente(faltantes)
+    return productos
+
+def liberar_stock(detalles):
+    cantidades = Counter()
+    for detalle in detalles:
+        cantidades[detalle.producto_id] += detalle.cantidad
+    if not cantidades:
+        return
+    cantidad = db.case(dict(cantidades), value=Producto.id)
+    db.session.execute(
+        db.update(Producto).where(Producto.id.in_(cantidades)).values(stock=Producto.stock + cantidad),
+        execution_options={'synchronize_session': 'fetch'}
+    )
+
+@app.cli.command('reconciliar-contadores')
+def comando_reconciliar_contadores():
+    """Reconstruye los contadores del dashboard a partir de las tablas base."""
+    resumen = reconciliar_contadores()
+    print(f"Contadores reconciliados: {resumen.total_productos} productos, {resumen.total_clientes} clientes, "
+          f"{resumen.total_ventas} ventas, {resumen.total_alquileres} alquileres ({resumen.alquileres_activos} activos)")
+
+# ==================== MIGRACIONES ====================
+# La versión del esquema se guarda en PRAGMA user_version. Cada migración se aplica una
+# sola vez, en orden, y debe poder ejecutarse sobre bases creadas por versiones anteriores.
+MIGRACIONES = []
+
+def migracion(numero):
+    def registrar(funcion):
+        MIGRACIONES.append((numero, funcion))
+        return funcion
+    return registrar
+
+@migracion(1)
+def migracion_tablas():
+    """Crea las tablas que falten"""
+    db.create_all()
+
+@migracion(2)
+def migracion_indices():
+    """Índices de fechas, estados y claves foráneas"""
+    # create_all no toca tablas existentes: en bases anteriores los índices se crean aquí
+    for tabla in db.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(db.engine, checkfirst=True)
+
+@migracion(3)
+def migracion_trabajos():
+    """Tabla de trabajos en segundo plano"""
+    Trabajo.__table__.create(db.engine, checkfirst=True)
+
+# Columnas *_json de los reportes anteriores a la migración 4 y su clave en el contenido
+SECCIONES_REPORTE_LEGADAS = {
+    'productos_json': 'productos_mas_vendidos',
+    'productos_mas_alquilados_json': 'productos_mas_alquilados',
+    'alquileres_activos_json': 'alquileres_activos',
+    'clientes_json': 'clientes_frecuentes',
+    'clientes_nuevos_json': 'clientes_nuevos',
+    'productos_stock_bajo_json': 'productos_stock_bajo',
+    'ventas_por_dia_json': 'ventas_por_dia',
+    'ventas_por_metodo_pago_json': 'ventas_por_metodo_pago',
+    'productos_mas_reabastecidos_json': 'productos_mas_reabastecidos',
+    'ventas_por_tipo_producto_json': 'ventas_por_tipo_producto',
+}
+
+@migracion(4)
+def migracion_contenido_reportes():
+    """Contenido de los reportes en un único blob comprimido"""
+    # En bases nuevas create_all ya creó la tabla con contenido y sin las columnas *_json
+    columnas = {fila[1] for fila in db.session.execute(db.text('PRAGMA table_info(reporte_mensual)'))}
+    if 'contenido' not in columnas:
+        db.session.execute(db.text('ALTER TABLE reporte_mensual ADD COLUMN contenido BLOB'))
+    legadas = [columna for columna in SECCIONES_REPORTE_LEGADAS if columna in columnas]
+    if not legadas:
+        return
+    
+    filas = db.session.execute(db.text(f"SELECT id, {', '.join(legadas)} FROM reporte_mensual")).all()
+    for fila in filas:
+        reporte = db.session.get(ReporteMensual, fila[0])
+        empaquetar_reporte(reporte, {
+            SECCIONES_REPORTE_LEGADAS[columna]: json.loads(valor) if valor else []
+            for columna, valor in zip(legadas, fila[1:])
+        })
+    db.session.flush()
+    for columna in legadas:
+        db.session.execute(db.text(f'ALTER TABLE reporte_mensual DROP COLUMN {columna}'))
+
+@migracion(5)
+def migracion_versiones():
+    """Versiones de los recursos compartidas entre procesos"""
+    VersionRecurso.__table__.create(db.engine, checkfirst=True)
+
+@migracion(6)
+def migracion_token_base():
+    """Token aleatorio de la base para los ETag"""
+    db.session.execute(sqlite_insert(VersionRecurso).values(
+        recurso=RECURSO_BASE, version=secrets.randbits(31)
+    ).on_conflict_do_nothing())
+
+def version_esquema():
+    return db.session.execute(db.text('PRAGMA user_version')).scalar()
+
+def aplicar_migraciones():
+    version = version_esquema()
+    for numero, funcion in sorted(MIGRACIONES, key=lambda m: m[0]):
+        if numero <= version:
+            continue
+        logger.info(f"Aplicando migración {numero}: {funcion.__doc__}")
+        funcion()
+        db.session.execute(db.text(f'PRAGMA user_version = {numero}'))
+        db.session.commit()
+        version = numero
+    return version
+
+# El planificador decide con las estadísticas de ANALYZE (sqlite_stat1). Una foto tomada con
+# las tablas casi vacías deja de servir al crecer los datos, así que se recalculan al arrancar
+# y después de cada carga masiva; analysis_limit acota el muestreo en tablas grandes.
+LIMITE_ANALISIS = int(os.environ.get('SABIRUS_LIMITE_ANALISIS', 1000))
+
+def actualizar_estadisticas():
+    db.session.execute(db.text(f'PRAGMA analysis_limit = {LIMITE_ANALISIS}'))
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+    # Cada conexión lee las estadísticas al abrirse: las del pool se renuevan para ver las nuevas
+    db.engine.dispose()
+
+# Consultas de consultas_criticas() cuyo filtro casi no descarta filas: con estadísticas al día,
+# recorrer la tabla es el plan correcto
+RECORRIDO_ESPERADO = {'productos activos'}
+
+def consultas_criticas():
+    hoy = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    inicio_mes = hoy.replace(day=1)
+    return {
+        'ventas del día': db.session.query(db.func.count(Venta.id), db.func.sum(Venta.total)).filter(
+            Venta.fecha >= hoy, Venta.fecha < hoy + timedelta(days=1)),
+        'ventas del mes': db.session.query(db.func.count(Venta.id), db.func.sum(Venta.total)).filter(
+            Venta.fecha >= inicio_mes),
+        'alquileres del mes': db.session.query(db.func.count(Alquiler.id), db.func.sum(Alquiler.total)).filter(
+            Alquiler.fecha_registro >= inicio_mes),
+        'alquileres activos': Alquiler.query.filter(Alquiler.estado == 'activo').order_by(Alquiler.fecha_fin),
+        'ventas recientes': Venta.query.order_by(Venta.fecha.desc()).limit(50),
+        'compras por cliente': db.session.query(Venta.cliente_id, db.func.count(Venta.id), db.func.sum(Venta.total)).filter(
+            Venta.cliente_id == 1),
+        'detalles de venta': DetalleVenta.query.filter(DetalleVenta.venta_id == 1),
+        'clientes nuevos': Cliente.query.filter(Cliente.fecha_registro >= inicio_mes),
+        'productos activos': Producto.query.filter(Producto.activo == True),
+    }
+
+def plan_consulta(consulta):
+    sql = str(consulta.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return [fila[-1] for fila in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+@app.cli.command('explicar-consultas')
+def comando_explicar_consultas():
+    """Muestra el plan de SQLite para las consultas por fecha, estado y cliente."""
+    print(f"Versión del esquema: {version_esquema()}")
+    for nombre, consulta in consultas_criticas().items():
+        plan = plan_consulta(consulta)
+        # un SCAN sin índice sobre la tabla significa que la consulta recorre todas las filas
+        if any('INDEX' in paso for paso in plan):
+            aviso = ''
+        elif nombre in RECORRIDO_ESPERADO:
+            aviso = '  (recorrido esperado)'
+        else:
+            aviso = '  <-- sin índice'
+        print(f"{nombre}:{aviso}")
+        for paso in plan:
+            print(f"    {paso}")
+
+# ==================== TRABAJOS EN SEGUNDO PLANO ====================
+# Tareas largas (importaciones, reportes) corren en un pool de hilos propio; su estado y
+# progreso quedan en la tabla trabajo para consultarlos desde cualquier worker web.
+MAX_ERRORES_TRABAJO = 500
+ejecutor_trabajos = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('SABIRUS_HILOS_TRABAJOS', 2)), thread_name_prefix='trabajo'
+)
+# Los reportes de un rango de meses se reparten en un pool aparte para no bloquear las importaciones
+ejecutor_reportes = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('SABIRUS_HILOS_REPORTES', 4)), thread_name_prefix='reporte'
+)
+
+def encolar_trabajo(tipo, funcion, *args):
+    trabajo = Trabajo(id=uuid.uuid4().hex, tipo=tipo, usuario_id=session.get('user_id'))
+    db.session.add(trabajo)
+    db.session.commit()
+    ejecutor_trabajos.submit(_ejecutar_trabajo, trabajo.id, funcion, args)
+    return trabajo
+
+def _ejecutar_trabajo(trabajo_id, funcion, args):
+    with app.app_context():
+        trabajo = db.session.get(Trabajo, trabajo_id)
+        trabajo.estado = 'en_curso'
+        db.session.commit()
+        try:
+            funcion(trabajo, *args)
+            trabajo.estado = 'completado'
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error en trabajo {trabajo_id} ({trabajo.tipo}): {e}")
+            trabajo.estado = 'error'
+            trabajo.mensaje = str(e)
+        trabajo.fecha_fin = datetime.utcnow()
+        db.session.commit()
+
+def serializar_trabajo(trabajo):
+    return {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'total': trabajo.total,
+        'procesados': trabajo.procesados or 0,
+        'resultado': json.loads(trabajo.resultado_json) if trabajo.resultado_json else None,
+        'errores': json.loads(trabajo.errores_json) if trabajo.errores_json else [],
+        'mensaje': trabajo.mensaje,
+        'fecha_creacion': trabajo.fecha_creacion.strftime('%d/%m/%Y %H:%M:%S'),
+        'fecha_fin': trabajo.fecha_fin.strftime('%d/%m/%Y %H:%M:%S') if trabajo.fecha_fin else None
+    }
+
+def marcar_trabajos_interrumpidos():
+    # Un trabajo pendiente o en curso al arrancar quedó cortado por un reinicio del proceso
+    interrumpidos = Trabajo.query.filter(Trabajo.estado.in_(('pendiente', 'en_curso'))).update(
+        {'estado': 'error', 'mensaje': 'Interrumpido por un reinicio del servidor', 'fecha_fin': datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+    if interrumpidos:
+        logger.warning(f"{interrumpidos} trabajos marcados como interrumpidos")
+
+# ==================== ARTEFACTOS PDF ====================
+# Un ReporteMensual no cambia después de generarse, así que su PDF se dibuja una sola vez y se
+# guarda en disco con la fecha de generación en el nombre; regenerar el mes cambia la clave.
+REPORTES_PDF_DIR = os.environ.get('SABIRUS_REPORTES_PDF_DIR', os.path.join(app.instance_path, 'reportes'))
+
+def clave_pdf_reporte(reporte):
+    return f"{reporte.id}-{reporte.fecha_generacion.strftime('%Y%m%d%H%M%S%f')}"
+
+def ruta_pdf_reporte(reporte):
+    return os.path.join(REPORTES_PDF_DIR, f'{clave_pdf_reporte(reporte)}.pdf')
+
+def datos_reporte_pdf(reporte):
+    return {**leer_datos_reporte(reporte), 'fecha_generacion': reporte.fecha_generacion}
+
+def guardar_pdf_reporte(reporte, contenido=None):
+    ruta = ruta_pdf_reporte(reporte)
+    if contenido is None:
+        contenido = renderizar_reporte_pdf(datos_reporte_pdf(reporte))
+    os.makedirs(REPORTES_PDF_DIR, exist_ok=True)
+    # Se escribe a un temporal y se renombra para no servir nunca un PDF a medio escribir
+    fd, temporal = tempfile.mkstemp(dir=REPORTES_PDF_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+    eliminar_pdf_reporte(reporte.id, conservar=ruta)
+    return ruta
+
+def eliminar_pdf_reporte(reporte_id, conservar=None):
+    prefijo = f'{reporte_id}-'
+    if not os.path.isdir(REPORTES_PDF_DIR):
+        return
+    for nombre in os.listdir(REPORTES_PDF_DIR):
+        ruta = os.path.join(REPORTES_PDF_DIR, nombre)
+        if nombre.startswith(prefijo) and nombre.endswith('.pdf') and ruta != conservar:
+            try:
+                os.remove(ruta)
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar el PDF {nombre}: {e}")
+
+# La exportación masiva dibuja los PDF en procesos aparte para usar todos los núcleos. Los
+# procesos salen de un forkserver que solo precarga reportes_pdf: hacer fork del servidor web,
+# con sus hilos en marcha, puede heredar un lock tomado y bloquear al hijo.
+PROCESOS_PDF = int(os.environ.get('SABIRUS_PROCESOS_PDF', os.cpu_count() or 2))
+_pool_pdf = None
+_lock_pool_pdf = threading.Lock()
+
+def pool_pdf():
+    global _pool_pdf
+    with _lock_pool_pdf:
+        if _pool_pdf is None:
+            contexto = multiprocessing.get_context('forkserver')
+            contexto.set_forkserver_preload(['reportes_pdf'])
+            _pool_pdf = ProcessPoolExecutor(max_workers=PROCESOS_PDF, mp_context=contexto)
+        return _pool_pdf
+
+# ==================== VERSIONADO DE DATOS ====================
+# La versión de cada recurso vive en la tabla version_recurso y sube dentro de la misma
+# transacción que la escritura: todos los procesos del servidor ven el mismo valor y un
+# rollback la deshace junto con los datos. Cada proceso recuerda la última versión que vio y
+# las que confirmó él mismo: si al leerla de nuevo hay versiones que no son suyas, las
+# escribió otro proceso y sus cachés se descartan.
+class VersionDatos:
+    """Versiones de los recursos; invalidan los datos derivados en caché."""
     def __init__(self):
-        super().__init__()
-        self.set_auto_page_break(auto=True, margin=15)
-        
-    def header(self):
-        self.set_font('Arial', 'B', 16)
-        self.cell(0, 10, 'SABIRUS WARMI', 0, 1, 'C')
-        self.set_font('Arial', 'I', 10)
-        self.cell(0, 5, 'Reporte Mensual Completo', 0, 1, 'C')
-        self.ln(5)
-        
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
-        
-    def chapter_title(self, title):
-        self.set_font('Arial', 'B', 12)
-        self.set_fill_color(240, 240, 240)
-        self.cell(0, 8, title, 0, 1, 'L', True)
-        self.ln(2)
-        
-    def chapter_body(self, body):
-        self.set_font('Arial', '', 10)
-        self.multi_cell(0, 5, body)
-        self.ln()
+        self._lock = threading.Lock()
+        self.vistas = {}
+        # Versiones confirmadas por este proceso por encima de la vista, p. ej. si los
+        # after_commit de dos hilos llegan en otro orden que sus commits
+        self._propias = {}
+        self._suscriptores = []
+        self._suscriptores_externos = []
+    
+    def suscribir(self, callback):
+        """`callback(recursos)` tras cualquier cambio, de este proceso o de otro."""
+        self._suscriptores.append(callback)
+    
+    def suscribir_externo(self, callback):
+        """`callback(recursos)` solo para cambios que este proceso no aplicó por su cuenta."""
+        self._suscriptores_externos.append(callback)
+    
+    def _avisar(self, recursos, externo):
+        for callback in self._suscriptores + (self._suscriptores_externos if externo else []):
+            callback(recursos)
+    
+    def marcar_cambio(self, *recursos):
+        """Sube la versión de `recursos` en la transacción en curso; se llama antes del commit."""
+        cambios = db.session.info.setdefault('versiones_nuevas', {})
+        for recurso in recursos:
+            sentencia = sqlite_insert(VersionRecurso).values(recurso=recurso, version=1)
+            nueva = db.session.execute(sentencia.on_conflict_do_update(
+                index_elements=[VersionRecurso.recurso],
+                set_={'version': VersionRecurso.version + 1}
+            ).returning(VersionRecurso.version)).scalar()
+            anterior = cambios[recurso][0] if recurso in cambios else nueva - 1
+            cambios[recurso] = (anterior, nueva)
+    
+    def _confirmar(self, sesion):
+        cambios = sesion.info.pop('versiones_nuevas', None)
+        if not cambios:
+            return
+        with self._lock:
+            for recurso, (anterior, nueva) in cambios.items():
+                vista = self.vistas.get(recurso)
+                if vista is None:
+                    # Primera escritura de este proceso: nada derivado depende de una versión anterior
+                    vista = nueva
+                propias = self._propias.get(recurso, set()) | set(range(anterior + 1, nueva + 1))
+                # La vista avanza mientras las versiones siguientes sean propias; si otro proceso
+                # escribió entre medias queda un salto que sincronizar() detecta
+                while vista + 1 in propias:
+                    vista += 1
+                self.vistas[recurso] = vista
+                self._propias[recurso] = {v for v in propias if v > vista}
+        self._avisar(tuple(cambios), externo=False)
+    
+    def _descartar(self, sesion):
+        sesion.info.pop('versiones_nuevas', None)
+    
+    def sincronizar(self, recursos):
+        """Lee las versiones de `recursos` y avisa de las que cambió otro proceso."""
+        versiones = dict(db.session.query(VersionRecurso.recurso, VersionRecurso.version).filter(
+            VersionRecurso.recurso.in_(recursos)).all())
+        cambiados = []
+        with self._lock:
+            for recurso in recursos:
+                version = versiones.get(recurso, 0)
+                vista = self.vistas.get(recurso)
+                # Una versión igual o menor es una lectura anterior a un commit propio ya confirmado
+                if vista is not None and version <= vista:
+                    continue
+                propias = self._propias.pop(recurso, set())
+                if vista is None or not propias.issuperset(range(vista + 1, version + 1)):
+                    cambiados.append(recurso)
+                self.vistas[recurso] = version
+                restantes = {v for v in propias if v > version}
+                if restantes:
+                    self._propias[recurso] = restantes
+        cambiados = tuple(cambiados)
+        if cambiados:
+            self._avisar(cambiados, externo=True)
+        return versiones
+    
+    def sello(self, recursos):
+        versiones = self.sincronizar(recursos)
+        return tuple(versiones.get(recurso, 0) for recurso in recursos)
+    
+    def olvidar(self):
+        """Descarta lo visto, p. ej. tras recrear la base: las versiones vuelven a empezar."""
+        with self._lock:
+            self.vistas.clear()
+            self._propias.clear()
+
+version_datos = VersionDatos()
+event.listen(db.session, 'after_commit', version_datos._confirmar)
+event.listen(db.session, 'after_rollback', version_datos._descartar)
+
+# ==================== ÍNDICE DE BÚSQUEDA (BM25) ====================
+PALABRAS_VACIAS = {
+    'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'de', 'del', 'al', 'a', 'en', 'y', 'o',
+    'que', 'qu', 'con', 'por', 'para', 'es', 'son', 'hay', 'se', 'me', 'mi', 'tu', 'su', 'sus',
+    'cual', 'cuales', 'cuanto', 'cuantos', 'cuanta', 'cuantas', 'como', 'tiene', 'tienen', 'tenemos'
+}
+
+def normalizar_texto(texto):
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(ch for ch in texto if not unicodedata.combining(ch))
+
+class IndiceBM25:
+    """Índice léxico en memoria; se carga perezosamente y se actualiza en cada escritura."""
+    def __init__(self, cargar_documentos, k1=1.5, b=0.75):
+        self._cargar_documentos = cargar_documentos
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.cargado = False
+        self._terminos = {}
+        self._longitudes = {}
+        self._postings = {}
+        self._longitud_total = 0
+    
+    @staticmethod
+    def tokenizar(texto):
+        tokens = []
+        for palabra in re.findall(r'\w+', normalizar_texto(texto)):
+            if palabra in PALABRAS_VACIAS or (len(palabra) < 2 and not palabra.isdigit()):
+                continue
+            if len(palabra) > 4 and palabra.endswith('es'):
+                palabra = palabra[:-2]
+            elif len(palabra) > 3 and palabra.endswith('s'):
+                palabra = palabra[:-1]
+            tokens.append(palabra)
+        return tokens
+    
+    def _agregar(self, doc_id, texto):
+        terminos = Counter(self.tokenizar(texto))
+        self._terminos[doc_id] = terminos
+        self._longitudes[doc_id] = sum(terminos.values())
+        self._longitud_total += self._longitudes[doc_id]
+        for termino, frecuencia in terminos.items():
+            self._postings.setdefault(termino, {})[doc_id] = frecuencia
+    
+    def _quitar(self, doc_id):
+        terminos = self._terminos.pop(doc_id, None)
+        if terminos is None:
+            return
+        self._longitud_total -= self._longitudes.pop(doc_id)
+        for termino in terminos:
+            docs = self._postings.get(termino)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self._postings[termino]
+    
+    def _asegurar_cargado(self):
+        with self._lock:
+            if self.cargado:
+                return
+            for doc_id, texto in self._cargar_documentos():
+                self._agregar(doc_id, texto)
+            self.cargado = True
+    
+    def reiniciar(self):
+        with self._lock:
+            self.cargado = False
+            self._terminos.clear()
+            self._longitudes.clear()
+            self._postings.clear()
+            self._longitud_total = 0
+    
+    def actualizar(self, doc_id, texto):
+        with self._lock:
+            if not self.cargado:
+                return
+            self._quitar(doc_id)
+            self._agregar(doc_id, texto)
+    
+    def eliminar(self, doc_id):
+        with self._lock:
+            if self.cargado:
+                self._quitar(doc_id)
+    
+    def buscar(self, consulta, k=5):
+        self._asegurar_cargado()
+        terminos = set(self.tokenizar(consulta))
+        with self._lock:
+            total_docs = len(self._terminos)
+            if not total_docs or not terminos:
+                return []
+            longitud_media = self._longitud_total / total_docs or 1
+            puntajes = {}
+            for termino in terminos:
+                docs = self._postings.get(termino)
+                if not docs:
+                    continue
+                idf = math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, frecuencia in docs.items():
+                    norma = frecuencia + self.k1 * (1 - self.b + self.b * self._longitudes[doc_id] / longitud_media)
+                    puntajes[doc_id] = puntajes.get(doc_id, 0) + idf * frecuencia * (self.k1 + 1) / norma
+        return [doc_id for doc_id, _ in sorted(puntajes.items(), key=lambda x: (-x[1], x[0]))[:k]]
+
+def texto_indexable_producto(p):
+    return ' '.join(x for x in (p.nombre, p.tipo, p.descripcion, p.proveedor) if x)
+
+def _documentos_productos():
+    for p in Producto.query.filter_by(activo=True).all():
+        yield p.id, texto_indexable_producto(p)
+
+def _documentos_clientes():
+    for cliente_id, nombre in db.session.query(Cliente.id, Cliente.nombre).all():
+        yield cliente_id, nombre
+
+indice_productos = IndiceBM25(_documentos_productos)
+indice_clientes = IndiceBM25(_documentos_clientes)
+
+def reiniciar_indices(recursos):
+    # Las rutas de este proceso actualizan los índices documento a documento; los cambios hechos
+    # por otro proceso obligan a reconstruirlos desde la base en la próxima búsqueda
+    if 'productos' in recursos:
+        indice_productos.reiniciar()
+    if 'clientes' in recursos:
+        indice_clientes.reiniciar()
+
+version_datos.suscribir_externo(reiniciar_indices)
+
+# ==================== MÉTRICAS IA ====================
+CAMPOS_METRICAS_IA = (
+    'tiempo_contexto', 'tokens_prompt', 'tiempo_eval_prompt', 'tiempo_primer_token',
+    'tokens_generados', 'tokens_por_segundo', 'tiempo_total'
+)
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+class MetricasIA:
+    """Ventana móvil con las mediciones de las últimas consultas al asistente."""
+    def __init__(self, ventana=500):
+        self._lock = threading.Lock()
+        self._registros = deque(maxlen=ventana)
+    
+    def registrar(self, registro):
+        with self._lock:
+            self._registros.append(registro)
+        logger.info(f"metricas_ia {json.dumps(registro, ensure_ascii=False)}")
+    
+    def resumen(self):
+        with self._lock:
+            registros = list(self._registros)
+        
+        por_ruta = {}
+        for ruta in sorted({r['ruta'] for r in registros}):
+            de_ruta = [r for r in registros if r['ruta'] == ruta]
+            campos = {}
+            for campo in CAMPOS_METRICAS_IA:
+                valores = sorted(r[campo] for r in de_ruta if r.get(campo) is not None)
+                if valores:
+                    campos[campo] = {
+                        'p50': percentil(valores, 50),
+                        'p90': percentil(valores, 90),
+                        'p99': percentil(valores, 99),
+                        'max': valores[-1]
+                    }
+            por_ruta[ruta] = {
+                'consultas': len(de_ruta),
+                'canceladas': sum(1 for r in de_ruta if r.get('cancelada')),
+                'metricas': campos
+            }
+        return {'ventana': len(registros), 'rutas': por_ruta}
+
+# ==================== CACHÉ DE RESPUESTAS ====================
+class CacheRespuestas:
+    """LRU con caducidad para respuestas del modelo, por pregunta normalizada y versión de datos."""
+    def __init__(self, max_entradas=200, ttl=600):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+    
+    @staticmethod
+    def normalizar(pregunta):
+        return ' '.join(re.findall(r'\w+', normalizar_texto(pregunta)))
+    
+    def obtener(self, pregunta, sello):
+        clave = (self.normalizar(pregunta), sello)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            if time.monotonic() - entrada['creado'] > self.ttl:
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada['respuesta']
+    
+    def guardar(self, pregunta, sello, respuesta, recursos):
+        clave = (self.normalizar(pregunta), sello)
+        with self._lock:
+            self._entradas[clave] = {'respuesta': respuesta, 'recursos': set(recursos), 'creado': time.monotonic()}
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+    
+    def invalidar(self, recursos):
+        with self._lock:
+            for clave in [c for c, e in self._entradas.items() if e['recursos'].intersection(recursos)]:
+                del self._entradas[clave]
+
+# ==================== RESPUESTAS DIRECTAS (SIN MODELO) ====================
+class RouterIntenciones:
+    """Responde con consultas SQL puntuales las preguntas estructuradas más comunes."""
+    def responder(self, pregunta):
+        texto = normalizar_texto(pregunta)
+        encontrado = []
+        
+        def producto_mencionado():
+            if not encontrado:
+                encontrado.append(self.producto_mencionado(pregunta))
+            return encontrado[0]
+        
+        if any(x in texto for x in ['stock bajo', 'bajo stock', 'poco stock', 'reabastecer']):
+            return self._stock_bajo()
+        
+        if 'alquiler' in texto and any(x in texto for x in ['activo', 'vigente', 'pendiente']):
+            return self._alquileres_activos()
+        
+        if any(x in texto for x in ['stock', 'unidades', 'existencia', 'inventario', 'quedan']):
+            producto = producto_mencionado()
+            if producto:
+                return self._stock_producto(producto)
+        
+        if any(x in texto for x in ['precio', 'cuesta', 'vale', 'cobra']):
+            producto = producto_mencionado()
+            if producto:
+                return self._precio_producto(producto)
+        
+        if any(x in texto for x in ['venta', 'vendi', 'ingreso']) and \
+                any(x in texto for x in ['total', 'cuanta', 'cuanto', 'numero', 'hoy', 'este mes']):
+            if not producto_mencionado():
+                return self._total_ventas(texto)
+        
+        return None
+    
+    def producto_mencionado(self, pregunta):
+        candidatos = indice_productos.buscar(pregunta, k=5)
+        if not candidatos:
+            return None
+        tokens_pregunta = set(IndiceBM25.tokenizar(pregunta))
+        mejor = None
+        for p in Producto.query.filter(Producto.id.in_(candidatos), Producto.activo == True).all():
+            tokens_nombre = set(IndiceBM25.tokenizar(p.nombre))
+            if tokens_nombre and tokens_nombre <= tokens_pregunta:
+                if mejor is None or len(tokens_nombre) > len(IndiceBM25.tokenizar(mejor.nombre)):
+                    mejor = p
+        return mejor
+    
+    def _stock_producto(self, p):
+        aviso = "⚠️ Stock bajo" if p.stock <= p.stock_minimo else "✅ Stock suficiente"
+        return f"""📦 **{p.nombre}** ({p.tipo})
+Stock: {p.stock} unidades (mínimo: {p.stock_minimo})
+{aviso}"""
+    
+    def _precio_producto(self, p):
+        alquiler_txt = f"\n🏠 Alquiler: ${p.precio_alquiler_dia:.2f}/día" if p.disponible_alquiler else "\n❌ No disponible para alquiler"
+        return f"""💰 **{p.nombre}** ({p.tipo})
+Venta: ${p.precio:.2f}{alquiler_txt}
+🏢 Proveedor: {p.proveedor or 'No especificado'}"""
+    
+    def _stock_bajo(self):
+        productos = db.session.query(
+            Producto.nombre, Producto.stock, Producto.stock_minimo, Producto.proveedor
+        ).filter(
+            Producto.activo == True,
+            Producto.stock <= Producto.stock_minimo
+        ).order_by(Producto.stock).limit(20).all()
+        if not productos:
+            return "✅ Ningún producto tiene stock bajo"
+        resp = "⚠️ **Productos con stock bajo:**\n"
+        for nombre, stock, minimo, proveedor in productos:
+            resp += f"- {nombre}: {stock} unidades (mínimo: {minimo}) | {proveedor or 'Sin proveedor'}\n"
+        return resp
+    
+    def _alquileres_activos(self):
+        total = Alquiler.query.filter_by(estado='activo').count()
+        if not total:
+            return "🏠 No hay alquileres activos"
+        alquileres = db.session.query(
+            Alquiler.id, Cliente.nombre, Alquiler.total, Alquiler.fecha_inicio, Alquiler.fecha_fin
+        ).join(Cliente, Cliente.id == Alquiler.cliente_id).filter(
+            Alquiler.estado == 'activo'
+        ).order_by(Alquiler.fecha_fin).limit(10).all()
+        resp = f"🏠 **Alquileres activos: {total}**\n"
+        for alquiler_id, cliente, total_alquiler, inicio, fin in alquileres:
+            resp += f"- #{alquiler_id}: {cliente} | ${total_alquiler:.2f}\n"
+            resp += f"  📅 {inicio.strftime('%d/%m/%Y')} a {fin.strftime('%d/%m/%Y')}\n"
+        return resp
+    
+    def _total_ventas(self, texto):
+        consulta = db.session.query(db.func.count(Venta.id), db.func.coalesce(db.func.sum(Venta.total), 0))
+        titulo = "Ventas totales"
+        if 'hoy' in texto:
+            inicio = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            consulta = consulta.filter(Venta.fecha >= inicio, Venta.fecha < inicio + timedelta(days=1))
+            titulo = "Ventas de hoy"
+        elif 'este mes' in texto:
+            inicio = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            consulta = consulta.filter(Venta.fecha >= inicio)
+            titulo = "Ventas de este mes"
+        cantidad, total = consulta.one()
+        promedio = total / cantidad if cantidad else 0
+        return f"""🛒 **{titulo}:** {cantidad}
+💰 Ingresos: ${total:.2f}
+📊 Promedio por venta: ${promedio:.2f}"""
 
 # ==================== IA CON PRECARGA AUTOMÁTICA ====================
-class AsistenteIA:
+MAX_PRODUCTOS_PROMPT = 8
+MAX_CLIENTES_PROMPT = 5
+MAX_STOCK_BAJO_PROMPT = 15
+MAX_DESCRIPCION_PROMPT = 200
+MAX_COLA_INFERENCIA = 4
+RECURSOS_CONTEXTO = ('productos', 'clientes', 'ventas', 'alquileres', 'reportes')
+
+class ColaLlena(Exception):
+    pass
+
+class TrabajoInferencia:
     def __init__(self):
+        self.prefijo = None
+        self.prompt = None
+        self.enviado = False
+        self.metricas = {}
+        self.salida = queue.Queue()
+        self.cancelado = threading.Event()
+
+class PlanificadorInferencia:
+    """Hilo único dueño del modelo: atiende las consultas en orden FIFO con una cola acotada."""
+    def __init__(self, generar, max_cola=4):
+        self._generar = generar
+        self.max_cola = max_cola
+        self._cond = threading.Condition()
+        self._pendientes = deque()
+        self._reservados = 0
+        self._hilo = None
+    
+    def reservar(self):
+        with self._cond:
+            if self._reservados >= self.max_cola:
+                raise ColaLlena("El asistente está atendiendo otras consultas. Intenta de nuevo en unos segundos.")
+            self._reservados += 1
+            return TrabajoInferencia()
+    
+    def enviar(self, trabajo):
+        with self._cond:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._atender, daemon=True)
+                self._hilo.start()
+            trabajo.enviado = True
+            self._pendientes.append(trabajo)
+            self._cond.notify()
+    
+    def liberar(self, trabajo):
+        with self._cond:
+            if not trabajo.enviado:
+                trabajo.enviado = True
+                self._reservados -= 1
+            elif trabajo in self._pendientes:
+                self._pendientes.remove(trabajo)
+                self._reservados -= 1
+        trabajo.cancelado.set()
+    
+    def posicion(self, trabajo):
+        with self._cond:
+            try:
+                return self._pendientes.index(trabajo) + 1
+            except ValueError:
+                return 0
+    
+    def _atender(self):
+        while True:
+            with self._cond:
+                while not self._pendientes:
+                    self._cond.wait()
+                trabajo = self._pendientes.popleft()
+                self._reservados -= 1
+            
+            if trabajo.cancelado.is_set():
+                continue
+            try:
+                for texto in self._generar(trabajo):
+                    trabajo.salida.put(('texto', texto))
+                trabajo.salida.put(('metricas', trabajo.metricas))
+            except Exception as e:
+                logger.error(f"Error en inferencia: {e}")
+                trabajo.salida.put(('error', str(e)))
+            finally:
+                trabajo.salida.put(('fin', None))
+
+# ==================== SERVIDOR IA EXTERNO ====================
+RUTA_SOCKET_IA = os.environ.get('SABIRUS_IA_SOCKET')
+MODO_SERVIDOR_IA = '--servidor-ia' in sys.argv
+
+def _enviar_json(archivo, datos):
+    archivo.write((json.dumps(datos) + '\n').encode('utf-8'))
+    archivo.flush()
+
+def _leer_json(archivo):
+    linea = archivo.readline()
+    return json.loads(linea) if linea else None
+
+class PlanificadorRemoto:
+    """Misma interfaz que PlanificadorInferencia; la cola y el modelo viven en el proceso servidor IA."""
+    def __init__(self, ruta_socket, timeout=5):
+        self.ruta_socket = ruta_socket
+        self.timeout = timeout
+    
+    def _conectar(self):
+        conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conexion.settimeout(self.timeout)
+        try:
+            conexion.connect(self.ruta_socket)
+        except OSError:
+            conexion.close()
+            raise
+        return conexion
+    
+    def consultar_estado(self):
+        return self._consultar_op('estado')
+    
+    def consultar_prefijo(self):
+        return self._consultar_op('prefijo')
+    
+    def _consultar_op(self, op):
+        with self._conectar() as conexion:
+            with conexion.makefile('rwb') as archivo:
+                _enviar_json(archivo, {'op': op})
+                return _leer_json(archivo)
+    
+    def reservar(self):
+        conexion = self._conectar()
+        archivo = conexion.makefile('rwb')
+        _enviar_json(archivo, {'op': 'reservar'})
+        respuesta = _leer_json(archivo) or {}
+        if not respuesta.get('ok'):
+            conexion.close()
+            raise ColaLlena(respuesta.get('mensaje', 'El servidor IA no aceptó la consulta'))
+        
+        trabajo = TrabajoInferencia()
+        trabajo.conexion = conexion
+        trabajo.archivo = archivo
+        trabajo.posicion = 0
+        return trabajo
+    
+    def enviar(self, trabajo):
+        trabajo.enviado = True
+        _enviar_json(trabajo.archivo, {'prefijo': trabajo.prefijo, 'prompt': trabajo.prompt})
+        threading.Thread(target=self._recibir, args=(trabajo,), daemon=True).start()
+    
+    def _recibir(self, trabajo):
+        try:
+            trabajo.conexion.settimeout(None)
+            while True:
+                mensaje = _leer_json(trabajo.archivo)
+                if mensaje is None:
+                    raise OSError("Conexión con el servidor IA interrumpida")
+                if 'cola' in mensaje:
+                    trabajo.posicion = mensaje['cola']
+                elif 'texto' in mensaje:
+                    trabajo.posicion = 0
+                    trabajo.salida.put(('texto', mensaje['texto']))
+                elif 'metricas' in mensaje:
+                    trabajo.salida.put(('metricas', mensaje['metricas']))
+                elif 'error' in mensaje:
+                    trabajo.salida.put(('error', mensaje['error']))
+                    return
+                else:
+                    trabajo.salida.put(('fin', None))
+                    return
+        except (OSError, ValueError) as e:
+            if not trabajo.cancelado.is_set():
+                trabajo.salida.put(('error', str(e)))
+    
+    def posicion(self, trabajo):
+        return trabajo.posicion
+    
+    def liberar(self, trabajo):
+        trabajo.cancelado.set()
+        try:
+            # El servidor detecta el cierre y cancela la generación
+            trabajo.conexion.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        trabajo.conexion.close()
+
+class _ManejadorServidorIA(socketserver.StreamRequestHandler):
+    def handle(self):
+        asistente = self.server.asistente
+        peticion = _leer_json(self.rfile)
+        if not peticion:
+            return
+        
+        if peticion.get('op') == 'estado':
+            _enviar_json(self.wfile, asistente.obtener_estado())
+            return
+        if peticion.get('op') == 'prefijo':
+            _enviar_json(self.wfile, asistente.obtener_estadisticas_prefijo())
+            return
+        
+        try:
+            trabajo = asistente.planificador.reservar()
+        except ColaLlena as e:
+            _enviar_json(self.wfile, {'ok': False, 'mensaje': str(e)})
+            return
+        
+        try:
+            _enviar_json(self.wfile, {'ok': True})
+            datos = _leer_json(self.rfile)
+            if not datos:
+                return
+            trabajo.prefijo = datos['prefijo']
+            trabajo.prompt = datos['prompt']
+            asistente.planificador.enviar(trabajo)
+            
+            while True:
+                try:
+                    tipo, valor = trabajo.salida.get(timeout=0.5)
+                except queue.Empty:
+                    # También sirve para detectar que el cliente web se desconectó
+                    _enviar_json(self.wfile, {'cola': asistente.planificador.posicion(trabajo)})
+                    continue
+                
+                if tipo == 'texto':
+                    _enviar_json(self.wfile, {'texto': valor})
+                elif tipo == 'metricas':
+                    _enviar_json(self.wfile, {'metricas': valor})
+                elif tipo == 'error':
+                    _enviar_json(self.wfile, {'error': valor})
+                    return
+                else:
+                    _enviar_json(self.wfile, {'fin': True})
+                    return
+        except (OSError, ValueError):
+            logger.info("Cliente del servidor IA desconectado")
+        finally:
+            asistente.planificador.liberar(trabajo)
+
+class ServidorIA(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    
+    def __init__(self, ruta_socket, asistente):
+        self._retirar_socket_anterior(ruta_socket)
+        self.asistente = asistente
+        # El socket nace con permisos 0600: solo el usuario del servidor puede conectarse
+        mascara = os.umask(0o077)
+        try:
+            super().__init__(ruta_socket, _ManejadorServidorIA)
+        finally:
+            os.umask(mascara)
+        os.chmod(ruta_socket, 0o600)
+    
+    @staticmethod
+    def _retirar_socket_anterior(ruta_socket):
+        """Borra el socket que dejó un servidor anterior; cualquier otra cosa en la ruta es un error."""
+        try:
+            info = os.lstat(ruta_socket)
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+            raise RuntimeError(f"{ruta_socket} existe y no es un socket de este usuario")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as prueba:
+            if prueba.connect_ex(ruta_socket) == 0:
+                raise RuntimeError(f"Ya hay un servidor IA escuchando en {ruta_socket}")
+        os.unlink(ruta_socket)
+
+class AsistenteIA:
+    def __init__(self, socket_remoto=None, precargar=True):
         self.modelo = None
         self.cargando = False
         self.carga_completa = False
         self.error_carga = None
         self._lock = threading.Lock()
+        self._lock_contexto = threading.Lock()
+        self._contexto_cache = None
+        self._estado_prefijo = None
+        self.socket_remoto = socket_remoto
+        if socket_remoto:
+            self.planificador = PlanificadorRemoto(socket_remoto)
+        else:
+            self.planificador = PlanificadorInferencia(self._generar, max_cola=MAX_COLA_INFERENCIA)
+        self.router = RouterIntenciones()
+        self.cache_respuestas = CacheRespuestas()
+        version_datos.suscribir(self.cache_respuestas.invalidar)
+        self.consultas_por_ruta = Counter()
+        self.metricas = MetricasIA()
+        self.estadisticas_prefijo = {'aciertos': 0, 'fallos': 0, 'tiempo_aciertos': 0.0, 'tiempo_fallos': 0.0}
         
         self.rutas_modelo = [
             "modelo/gemma-2b-it-q4_k_m.gguf",
         ]
+        if os.environ.get('SABIRUS_MODELO'):
+            self.rutas_modelo.insert(0, os.environ['SABIRUS_MODELO'])
+        
+        if socket_remoto:
+            logger.info(f"Usando servidor IA externo en {socket_remoto}")
+            return
+        if not precargar:
+            return
         
         logger.info("Iniciando precarga del modelo IA...")
         self._iniciar_carga_asincrona()
@@ -235,9 +1362,17 @@ class AsistenteIA:
             logger.error(f"Error al cargar modelo IA: {e}")
     
     def esta_listo(self):
+        if self.socket_remoto:
+            return self.obtener_estado()['estado'] == 'listo'
         return self.carga_completa and self.modelo is not None
     
     def obtener_estado(self):
+        if self.socket_remoto:
+            try:
+                return self.planificador.consultar_estado()
+            except (OSError, ValueError) as e:
+                return {"estado": "error", "mensaje": f"Error: servidor IA no disponible ({e})"}
+        
         if self.carga_completa:
             return {"estado": "listo", "mensaje": "IA operativa"}
         elif self.cargando:
@@ -247,43 +1382,39 @@ class AsistenteIA:
         else:
             return {"estado": "inicial", "mensaje": "Iniciando..."}
     
+    def obtener_estadisticas_prefijo(self):
+        # El prefijo se reutiliza donde vive el modelo: en modo servidor IA, en el otro proceso
+        if self.socket_remoto:
+            try:
+                return self.planificador.consultar_prefijo()
+            except (OSError, ValueError) as e:
+                return {"error": f"servidor IA no disponible ({e})"}
+        return dict(self.estadisticas_prefijo)
+    
+    def obtener_contexto_cacheado(self):
+        version = version_datos.sello(RECURSOS_CONTEXTO)
+        with self._lock_contexto:
+            cache = self._contexto_cache
+            if cache and cache['version'] == version:
+                return cache['contexto'], cache['texto']
+        
+        contexto = self.obtener_contexto_completo()
+        texto = self.formatear_contexto_texto(contexto)
+        
+        with self._lock_contexto:
+            self._contexto_cache = {'version': version, 'contexto': contexto, 'texto': texto}
+        return contexto, texto
+    
     def obtener_contexto_completo(self):
-        productos = Producto.query.filter_by(activo=True).all()
-        productos_info = []
-        for p in productos:
-            productos_info.append({
-                'id': p.id,
-                'nombre': p.nombre,
-                'tipo': p.tipo,
-                'precio': p.precio,
-                'precio_alquiler_dia': p.precio_alquiler_dia,
-                'disponible_alquiler': p.disponible_alquiler,
-                'stock': p.stock,
-                'stock_minimo': p.stock_minimo,
-                'proveedor': p.proveedor or 'No especificado',
-                'descripcion': p.descripcion or 'Sin descripción'
-            })
-        
-        clientes = Cliente.query.all()
-        clientes_info = []
-        for c in clientes:
-            total_compras = len(c.ventas)
-            total_gastado = sum(v.total for v in c.ventas)
-            total_alquileres = len(c.alquileres)
-            ultima_compra = max([v.fecha for v in c.ventas]) if c.ventas else None
-            
-            clientes_info.append({
-                'id': c.id,
-                'nombre': c.nombre,
-                'telefono': c.telefono or 'No registrado',
-                'email': c.email or 'No registrado',
-                'total_compras': total_compras,
-                'total_gastado': total_gastado,
-                'total_alquileres': total_alquileres,
-                'ultima_compra': ultima_compra.strftime('%d/%m/%Y') if ultima_compra else 'Nunca'
-            })
-        
-        alquileres = Alquiler.query.order_by(Alquiler.fecha_registro.desc()).limit(30).all()
+        # Productos y clientes concretos se buscan por pregunta en los índices BM25
+        # (formatear_relevantes); aquí solo hacen falta los totales
+        total_productos = Producto.query.filter_by(activo=True).count()
+        total_clientes = Cliente.query.count()
+        
+        alquileres = Alquiler.query.options(
+            db.joinedload(Alquiler.cliente),
+            db.selectinload(Alquiler.detalles).joinedload(DetalleAlquiler.producto)
+        ).order_by(Alquiler.fecha_registro.desc()).limit(30).all()
         alquileres_info = []
         for a in alquileres:
             productos_alquilados = []
@@ -308,7 +1439,10 @@ class AsistenteIA:
                 'productos': productos_alquilados
             })
         
-        ventas = Venta.query.order_by(Venta.fecha.desc()).limit(50).all()
+        ventas = Venta.query.options(
+            db.joinedload(Venta.cliente),
+            db.selectinload(Venta.detalles).joinedload(DetalleVenta.producto)
+        ).order_by(Venta.fecha.desc()).limit(50).all()
         ventas_info = []
         for v in ventas:
             productos_vendidos = []
@@ -358,10 +1492,13 @@ class AsistenteIA:
             db.func.sum(Venta.total).label('gastado')
         ).join(Venta).group_by(Cliente.id).order_by(db.desc('compras')).limit(10).all()
         
-        productos_stock_bajo = Producto.query.filter(
+        # El prompt solo lista MAX_STOCK_BAJO_PROMPT productos; del resto basta el total
+        consulta_stock_bajo = Producto.query.filter(
             Producto.activo == True,
             Producto.stock <= Producto.stock_minimo
-        ).all()
+        )
+        total_stock_bajo = consulta_stock_bajo.count()
+        productos_stock_bajo = consulta_stock_bajo.order_by(Producto.stock, Producto.id).limit(MAX_STOCK_BAJO_PROMPT).all()
         
         reportes = ReporteMensual.query.order_by(ReporteMensual.fecha_generacion.desc()).limit(6).all()
         reportes_info = []
@@ -376,8 +1513,6 @@ class AsistenteIA:
             })
         
         contexto = {
-            'productos': productos_info,
-            'clientes': clientes_info,
             'ventas_recientes': ventas_info,
             'alquileres_recientes': alquileres_info,
             'estadisticas': {
@@ -387,8 +1522,9 @@ class AsistenteIA:
                 'total_alquileres': total_alquileres,
                 'ingresos_alquileres': ingresos_alquileres,
                 'alquileres_activos': alquileres_activos,
-                'total_productos': len(productos),
-                'total_clientes': len(clientes)
+                'total_productos': total_productos,
+                'total_clientes': total_clientes,
+                'total_stock_bajo': total_stock_bajo
             },
             'productos_mas_vendidos': [
                 {'nombre': p[0], 'tipo': p[1], 'proveedor': p[2] or 'No especificado', 'cantidad': int(p[3])} 
@@ -424,17 +1560,6 @@ class AsistenteIA:
         texto += f"- Total de productos: {contexto['estadisticas']['total_productos']}\n"
         texto += f"- Total de clientes: {contexto['estadisticas']['total_clientes']}\n\n"
         
-        texto += "PRODUCTOS DISPONIBLES:\n"
-        for p in contexto['productos']:
-            estado_stock = "⚠️ BAJO" if p['stock'] <= p['stock_minimo'] else "✅"
-            alquiler_info = f" | 🏠 Alquiler: ${p['precio_alquiler_dia']:.2f}/día" if p['disponible_alquiler'] else ""
-            texto += f"- [{p['id']}] {p['nombre']} ({p['tipo']})\n"
-            texto += f"  Proveedor: {p['proveedor']}\n"
-            texto += f"  💰 Venta: ${p['precio']:.2f}{alquiler_info}\n"
-            texto += f"  📦 Stock: {p['stock']} unidades {estado_stock}\n"
-            texto += f"  📝 {p['descripcion']}\n"
-        texto += "\n"
-        
         if contexto['productos_mas_vendidos']:
             texto += "🏆 TOP 10 PRODUCTOS MÁS VENDIDOS:\n"
             for i, p in enumerate(contexto['productos_mas_vendidos'], 1):
@@ -452,16 +1577,11 @@ class AsistenteIA:
             texto += "⚠️ PRODUCTOS CON STOCK BAJO:\n"
             for p in contexto['productos_stock_bajo']:
                 texto += f"- {p['nombre']} (Proveedor: {p['proveedor']}): {p['stock']} unidades (mínimo: {p['minimo']})\n"
+            restantes = contexto['estadisticas']['total_stock_bajo'] - len(contexto['productos_stock_bajo'])
+            if restantes > 0:
+                texto += f"- ... y {restantes} productos más con stock bajo\n"
             texto += "\n"
         
-        texto += "👥 CLIENTES:\n"
-        for c in contexto['clientes'][:20]:
-            texto += f"- [{c['id']}] {c['nombre']}\n"
-            texto += f"  💰 Compras: {c['total_compras']} | Gastado: ${c['total_gastado']:.2f}\n"
-            texto += f"  🏠 Alquileres: {c['total_alquileres']}\n"
-            texto += f"  📅 Última compra: {c['ultima_compra']} | 📞 {c['telefono']}\n"
-        texto += "\n"
-        
         texto += "🏠 ÚLTIMOS 10 ALQUILERES:\n"
         for a in contexto['alquileres_recientes'][:10]:
             texto += f"- Alquiler #{a['id']}: {a['cliente']} - ${a['total']:.2f}\n"
@@ -492,27 +1612,123 @@ class AsistenteIA:
         
         return texto
 
-    def consultar_streaming(self, pregunta):
+    def formatear_relevantes(self, pregunta):
+        ids_productos = indice_productos.buscar(pregunta, k=MAX_PRODUCTOS_PROMPT)
+        ids_clientes = indice_clientes.buscar(pregunta, k=MAX_CLIENTES_PROMPT)
+        
+        texto = "PRODUCTOS RELACIONADOS CON LA PREGUNTA:\n"
+        productos = {p.id: p for p in Producto.query.filter(Producto.id.in_(ids_productos)).all()} if ids_productos else {}
+        for producto_id in ids_productos:
+            p = productos.get(producto_id)
+            if not p:
+                continue
+            estado_stock = "⚠️ BAJO" if p.stock <= p.stock_minimo else "✅"
+            alquiler_info = f" | 🏠 Alquiler: ${p.precio_alquiler_dia:.2f}/día" if p.disponible_alquiler else ""
+            descripcion = (p.descripcion or 'Sin descripción')[:MAX_DESCRIPCION_PROMPT]
+            texto += f"- [{p.id}] {p.nombre} ({p.tipo})\n"
+            texto += f"  Proveedor: {p.proveedor or 'No especificado'}\n"
+            texto += f"  💰 Venta: ${p.precio:.2f}{alquiler_info}\n"
+            texto += f"  📦 Stock: {p.stock} unidades {estado_stock}\n"
+            texto += f"  📝 {descripcion}\n"
+        if not productos:
+            texto += "- Ninguno\n"
+        texto += "\n"
+        
+        texto += "👥 CLIENTES RELACIONADOS CON LA PREGUNTA:\n"
+        clientes = []
+        if ids_clientes:
+            resumen = db.session.query(
+                Cliente,
+                db.func.count(Venta.id),
+                db.func.coalesce(db.func.sum(Venta.total), 0),
+                db.func.max(Venta.fecha)
+            ).outerjoin(Venta, Venta.cliente_id == Cliente.id).filter(
+                Cliente.id.in_(ids_clientes)
+            ).group_by(Cliente.id).all()
+            alquileres = dict(db.session.query(
+                Alquiler.cliente_id, db.func.count(Alquiler.id)
+            ).filter(Alquiler.cliente_id.in_(ids_clientes)).group_by(Alquiler.cliente_id).all())
+            por_id = {fila[0].id: fila for fila in resumen}
+            clientes = [por_id[cliente_id] for cliente_id in ids_clientes if cliente_id in por_id]
+        for c, compras, gastado, ultima_compra in clientes:
+            texto += f"- [{c.id}] {c.nombre}\n"
+            texto += f"  💰 Compras: {compras} | Gastado: ${gastado:.2f}\n"
+            texto += f"  🏠 Alquileres: {alquileres.get(c.id, 0)}\n"
+            texto += f"  📅 Última compra: {ultima_compra.strftime('%d/%m/%Y') if ultima_compra else 'Nunca'} | 📞 {c.telefono or 'No registrado'}\n"
+        if not clientes:
+            texto += "- Ninguno\n"
+        texto += "\n"
+        
+        return texto
+
+    def responder_directo(self, pregunta):
+        try:
+            return self.router.responder(pregunta)
+        except Exception as e:
+            logger.error(f"Error en respuesta directa: {e}")
+            return None
+    
+    def respuesta_inmediata(self, pregunta):
+        # Antes de usar los índices de búsqueda: descarta los que cambió otro proceso
+        version_datos.sincronizar(RECURSOS_CONTEXTO)
+        respuesta = self.responder_directo(pregunta)
+        if respuesta is not None:
+            return 'directa', respuesta
+        respuesta = self.cache_respuestas.obtener(pregunta, version_datos.sello(RECURSOS_CONTEXTO))
+        if respuesta is not None:
+            return 'cache', respuesta
+        return None
+    
+    def consultar_streaming(self, pregunta, trabajo=None, inmediata=None, inicio=None):
+        registro = {'ruta': None}
+        inicio = inicio or time.perf_counter()
+        completada = False
+        consulta = self._consultar(pregunta, trabajo, inmediata, registro)
         try:
-            contexto_json = self.obtener_contexto_completo()
-            contexto_texto = self.formatear_contexto_texto(contexto_json)
+            for chunk in consulta:
+                if 'tiempo_primer_token' not in registro and isinstance(chunk, str):
+                    registro['tiempo_primer_token'] = round(time.perf_counter() - inicio, 4)
+                yield chunk
+            completada = True
+        finally:
+            consulta.close()
+            if registro['ruta']:
+                registro['tiempo_total'] = round(time.perf_counter() - inicio, 4)
+                registro['cancelada'] = not completada
+                self.metricas.registrar(registro)
+    
+    def _consultar(self, pregunta, trabajo, inmediata, registro):
+        try:
+            if inmediata is None and trabajo is None:
+                inmediata = self.respuesta_inmediata(pregunta)
+            if inmediata is not None:
+                ruta, respuesta = inmediata
+                self.consultas_por_ruta[ruta] += 1
+                registro['ruta'] = ruta
+                yield from respuesta.splitlines(keepends=True)
+                return
+            
+            sello = version_datos.sello(RECURSOS_CONTEXTO)
+            inicio_contexto = time.perf_counter()
+            contexto_json, contexto_texto = self.obtener_contexto_cacheado()
             
             if not self.esta_listo():
+                self.consultas_por_ruta['respaldo'] += 1
+                registro['ruta'] = 'respaldo'
+                registro['tiempo_contexto'] = round(time.perf_counter() - inicio_contexto, 4)
                 estado = self.obtener_estado()
                 
                 if estado['estado'] == 'cargando':
-                    msg = "El modelo IA está cargando. Mientras tanto, aquí tienes una respuesta estructurada:\n\n"
-                    for char in msg:
-                        yield char
-                        time.sleep(0.01)
+                    yield "El modelo IA está cargando. Mientras tanto, aquí tienes una respuesta estructurada:\n\n"
                 
                 respuesta = self._respuesta_sin_ia(pregunta, contexto_json)
-                for char in respuesta:
-                    yield char
-                    time.sleep(0.01)
+                yield from respuesta.splitlines(keepends=True)
                 return
             
-            prompt = f"""Eres un asistente experto del sistema Sabirus Warmi. Respondes preguntas sobre ventas y alquileres.
+            self.consultas_por_ruta['modelo'] += 1
+            registro['ruta'] = 'modelo'
+            
+            prefijo = f"""Eres un asistente experto del sistema Sabirus Warmi. Respondes preguntas sobre ventas y alquileres.
 
 {contexto_texto}
 
@@ -524,38 +1740,131 @@ INSTRUCCIONES:
 - Para alquileres, incluye fechas y estado
 - NO inventes información
 
-PREGUNTA: {pregunta}
+"""
+            prompt = f"""{prefijo}{self.formatear_relevantes(pregunta)}PREGUNTA: {pregunta}
 
 RESPUESTA:"""
-
-            respuesta_completa = ""
-            tokens_generados = 0
-            max_tokens = 200
+            registro['tiempo_contexto'] = round(time.perf_counter() - inicio_contexto, 4)
             
-            for token in self.modelo(
-                prompt,
-                max_tokens=max_tokens,
-                temperature=0.3,
-                top_p=0.9,
-                stream=True,
-                stop=["PREGUNTA:", "###", "\n\n\n"]
-            ):
-                if tokens_generados >= max_tokens:
-                    break
-                    
-                texto = token['choices'][0]['text']
-                respuesta_completa += texto
-                tokens_generados += 1
+            if trabajo is None:
+                trabajo = self.planificador.reservar()
+            trabajo.prefijo = prefijo
+            trabajo.prompt = prompt
+            self.planificador.enviar(trabajo)
+            
+            respuesta_completa = ""
+            ultimo_aviso = 0
+            while True:
+                try:
+                    tipo, valor = trabajo.salida.get(timeout=0.5)
+                except queue.Empty:
+                    posicion = self.planificador.posicion(trabajo)
+                    if posicion and time.monotonic() - ultimo_aviso >= 1:
+                        ultimo_aviso = time.monotonic()
+                        yield {'cola': posicion}
+                    continue
                 
-                if any(x in respuesta_completa.lower() for x in ["¿puedo ayudarte", "¿necesitas algo", "¿algo más"]):
+                if tipo == 'texto':
+                    respuesta_completa += valor
+                    yield valor
+                elif tipo == 'metricas':
+                    registro.update(valor)
+                elif tipo == 'error':
+                    raise Exception(valor)
+                else:
                     break
+            
+            if respuesta_completa.strip():
+                self.cache_respuestas.guardar(pregunta, sello, respuesta_completa, RECURSOS_CONTEXTO)
                 
-                yield texto
-                
+        except ColaLlena as e:
+            yield f"⏳ {e}"
         except Exception as e:
             logger.error(f"Error en consulta IA: {e}")
             yield f"❌ Error: {str(e)}"
+        finally:
+            if trabajo is not None:
+                self.planificador.liberar(trabajo)
+
+    def _generar(self, trabajo):
+        prefijo_reutilizado, tiempo_prefijo = self._preparar_prefijo(trabajo.prefijo)
+        
+        respuesta_completa = ""
+        tokens_generados = 0
+        max_tokens = 200
+        inicio_prompt = time.perf_counter()
+        primer_token = None
+        trabajo.metricas = {
+            'tokens_prompt': len(self.modelo.tokenize(trabajo.prompt.encode('utf-8'))),
+            'prefijo_reutilizado': prefijo_reutilizado
+        }
+        
+        for token in self.modelo(
+            trabajo.prompt,
+            max_tokens=max_tokens,
+            temperature=0.3,
+            top_p=0.9,
+            stream=True,
+            stop=["PREGUNTA:", "###", "\n\n\n"]
+        ):
+            if trabajo.cancelado.is_set():
+                logger.info(f"Generación cancelada tras {tokens_generados} tokens: cliente desconectado")
+                break
+            
+            if tokens_generados == 0:
+                primer_token = time.perf_counter()
+                trabajo.metricas['tiempo_eval_prompt'] = round(tiempo_prefijo + primer_token - inicio_prompt, 4)
+                self._registrar_tiempo_prompt(prefijo_reutilizado, tiempo_prefijo, primer_token - inicio_prompt)
+            
+            if tokens_generados >= max_tokens:
+                break
+                
+            texto = token['choices'][0]['text']
+            respuesta_completa += texto
+            tokens_generados += 1
+            
+            if any(x in respuesta_completa.lower() for x in ["¿puedo ayudarte", "¿necesitas algo", "¿algo más"]):
+                break
+            
+            yield texto
+        
+        trabajo.metricas['tokens_generados'] = tokens_generados
+        if primer_token is not None and tokens_generados > 1:
+            duracion = time.perf_counter() - primer_token
+            trabajo.metricas['tokens_por_segundo'] = round((tokens_generados - 1) / duracion, 2) if duracion > 0 else None
 
+    def _preparar_prefijo(self, prefijo):
+        # El estado del KV-cache tras evaluar instrucciones + contexto se guarda una vez
+        # por versión de datos; al restaurarlo llama.cpp solo evalúa la pregunta.
+        inicio = time.perf_counter()
+        estado = self._estado_prefijo
+        if estado and estado['prefijo'] == prefijo:
+            self.modelo.load_state(estado['estado'])
+            return True, time.perf_counter() - inicio
+        
+        tokens = self.modelo.tokenize(prefijo.encode('utf-8'))
+        self.modelo.reset()
+        self.modelo.eval(tokens)
+        self._estado_prefijo = {
+            'prefijo': prefijo,
+            'estado': self.modelo.save_state(),
+            'tokens': len(tokens)
+        }
+        return False, time.perf_counter() - inicio
+    
+    def _registrar_tiempo_prompt(self, prefijo_reutilizado, tiempo_prefijo, tiempo_sufijo):
+        clave = 'aciertos' if prefijo_reutilizado else 'fallos'
+        stats = self.estadisticas_prefijo
+        stats[clave] += 1
+        stats[f'tiempo_{clave}'] += tiempo_prefijo + tiempo_sufijo
+        tokens_prefijo = self._estado_prefijo['tokens'] if self._estado_prefijo else 0
+        logger.info(
+            f"Prompt IA ({'prefijo reutilizado' if prefijo_reutilizado else 'prefijo evaluado'}, {tokens_prefijo} tokens): "
+            f"prefijo {tiempo_prefijo:.3f}s + pregunta {tiempo_sufijo:.3f}s | "
+            f"promedio acierto {stats['tiempo_aciertos'] / max(stats['aciertos'], 1):.3f}s, "
+            f"promedio fallo {stats['tiempo_fallos'] / max(stats['fallos'], 1):.3f}s"
+        )
+    
     def _respuesta_sin_ia(self, pregunta, contexto):
         pregunta_lower = pregunta.lower()
         
@@ -569,14 +1878,14 @@ RESPUESTA:"""
                 return resp
             return "No hay alquileres registrados aún"
         
-        for p in contexto['productos']:
-            if p['nombre'].lower() in pregunta_lower:
-                alquiler_txt = f"\n🏠 Alquiler: ${p['precio_alquiler_dia']:.2f}/día" if p['disponible_alquiler'] else "\n❌ No disponible para alquiler"
-                return f"""📦 **{p['nombre']}** ({p['tipo']})
-💰 Venta: ${p['precio']:.2f}{alquiler_txt}
-🏢 Proveedor: {p['proveedor']}
-📦 Stock: {p['stock']} unidades
-📝 {p['descripcion']}"""
+        p = self.router.producto_mencionado(pregunta)
+        if p:
+            alquiler_txt = f"\n🏠 Alquiler: ${p.precio_alquiler_dia:.2f}/día" if p.disponible_alquiler else "\n❌ No disponible para alquiler"
+            return f"""📦 **{p.nombre}** ({p.tipo})
+💰 Venta: ${p.precio:.2f}{alquiler_txt}
+🏢 Proveedor: {p.proveedor or 'No especificado'}
+📦 Stock: {p.stock} unidades
+📝 {p.descripcion or 'Sin descripción'}"""
         
         if any(x in pregunta_lower for x in ['estadistica', 'total', 'cuanto']):
             est = contexto['estadisticas']
@@ -597,7 +1906,12 @@ RESPUESTA:"""
 ¿Qué necesitas?"""
 
 logger.info("Iniciando sistema Sabirus Warmi...")
-asistente_ia = AsistenteIA()
+# Con `python app.py` los procesos del pool de PDF reimportan este archivo como __mp_main__ al
+# arrancar; ellos solo dibujan reportes y no deben cargar su propia copia del modelo
+asistente_ia = AsistenteIA(
+    socket_remoto=None if MODO_SERVIDOR_IA else RUTA_SOCKET_IA,
+    precargar=__name__ != '__mp_main__'
+)
 
 # ==================== DECORADORES ====================
 def login_required(f):
@@ -608,6 +1922,146 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def con_etag(*recursos):
+    """ETag fuerte a partir de las versiones de `recursos`; responde 304 antes de ejecutar la vista."""
+    def decorador(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+            
+            # Las versiones salen de la base: una escritura hecha en otro proceso también cambia el ETag
+            base, *versiones = version_datos.sello((RECURSO_BASE,) + recursos)
+            etag = f'{base:x}-' + '.'.join(str(v) for v in versiones)
+            # Cada variante comprimida lleva su propio ETag; solo vale la que recibiría esta petición
+            codificacion = codificacion_aceptada()
+            for candidato in ((etag, f'{etag}-{codificacion}') if codificacion else (etag,)):
+                if request.if_none_match.contains(candidato):
+                    respuesta = Response(status=304)
+                    respuesta.set_etag(candidato)
+                    return respuesta
+            
+            respuesta = make_response(f(*args, **kwargs))
+            if respuesta.status_code == 200:
+                respuesta.set_etag(f'{etag}-{respuesta.content_encoding}' if respuesta.content_encoding else etag)
+                respuesta.cache_control.private = True
+                respuesta.cache_control.no_cache = True
+            return respuesta
+        return decorated_function
+    return decorador
+
+# ==================== COMPRESIÓN Y RECURSOS ESTÁTICOS ====================
+# Las respuestas JSON/HTML grandes salen comprimidas (brotli si está instalado, si no gzip) y
+# el CSS/JS de main.html se sirve desde /recursos con la huella del contenido en el nombre,
+# así el navegador puede guardarlo un año sin volver a preguntar.
+UMBRAL_COMPRESION = int(os.environ.get('SABIRUS_UMBRAL_COMPRESION', 1024))
+TIPOS_COMPRIMIBLES = {'application/json', 'text/html', 'text/css', 'text/javascript', 'application/javascript', 'text/plain'}
+CACHE_INMUTABLE = 365 * 24 * 3600
+TAMANOS_ICONO = (40, 80, 120)
+
+_huellas_estaticos = {}
+_contenido_estaticos = {}
+
+def codificacion_aceptada():
+    return request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+
+def comprimir(datos, codificacion, maxima=False):
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=11 if maxima else 5)
+    return gzip.compress(datos, compresslevel=9 if maxima else 6)
+
+@app.after_request
+def comprimir_respuesta(respuesta):
+    # Las respuestas en streaming (SSE, exportaciones) y los archivos se envían tal cual
+    if (respuesta.status_code != 200 or respuesta.direct_passthrough or respuesta.is_streamed
+            or respuesta.content_encoding or respuesta.mimetype not in TIPOS_COMPRIMIBLES):
+        return respuesta
+    datos = respuesta.get_data()
+    if len(datos) < UMBRAL_COMPRESION:
+        return respuesta
+    respuesta.vary.add('Accept-Encoding')
+    codificacion = codificacion_aceptada()
+    if not codificacion:
+        return respuesta
+    
+    respuesta.set_data(comprimir(datos, codificacion))
+    respuesta.content_encoding = codificacion
+    etag, debil = respuesta.get_etag()
+    if etag and not debil:
+        respuesta.set_etag(f'{etag}-{codificacion}')
+    return respuesta
+
+def huella_estatico(ruta):
+    completa = safe_join(app.static_folder, ruta)
+    if completa is None or not os.path.isfile(completa):
+        return None
+    estado = os.stat(completa)
+    clave = (estado.st_mtime_ns, estado.st_size)
+    cacheada = _huellas_estaticos.get(ruta)
+    if cacheada and cacheada[0] == clave:
+        return cacheada[1]
+    with open(completa, 'rb') as f:
+        huella = hashlib.sha256(f.read()).hexdigest()[:12]
+    _huellas_estaticos[ruta] = (clave, huella)
+    return huella
+
+@app.template_global()
+def estatico(ruta):
+    """URL de un archivo de static/ con la huella de su contenido, p. ej. /recursos/js/main.1a2b3c4d5e6f.js"""
+    huella = huella_estatico(ruta)
+    if huella is None:
+        raise FileNotFoundError(f'static/{ruta}')
+    base, extension = os.path.splitext(ruta)
+    return url_for('recurso_estatico', nombre=f'{base}.{huella}{extension}')
+
+@app.route('/recursos/<path:nombre>')
+def recurso_estatico(nombre):
+    partes = re.fullmatch(r'(.+)\.([0-9a-f]{12})(\.\w+)', nombre)
+    ruta = partes.group(1) + partes.group(3) if partes else None
+    huella = huella_estatico(ruta) if ruta else None
+    if huella is None:
+        return jsonify({'error': 'Recurso no encontrado'}), 404
+    if huella != partes.group(2):
+        # Una página vieja pide una versión anterior: se redirige a la actual
+        return redirect(estatico(ruta))
+    
+    mimetype = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+    codificacion = codificacion_aceptada() if mimetype in TIPOS_COMPRIMIBLES else None
+    # Cada archivo se lee y comprime (al máximo nivel) una sola vez por versión y codificación
+    cacheado = _contenido_estaticos.get((ruta, codificacion))
+    if cacheado is None or cacheado[0] != huella:
+        with open(safe_join(app.static_folder, ruta), 'rb') as f:
+            datos = f.read()
+        if codificacion:
+            datos = comprimir(datos, codificacion, maxima=True)
+        cacheado = _contenido_estaticos[(ruta, codificacion)] = (huella, datos)
+    
+    respuesta = Response(cacheado[1], mimetype=mimetype)
+    if codificacion:
+        respuesta.content_encoding = codificacion
+    if mimetype in TIPOS_COMPRIMIBLES:
+        respuesta.vary.add('Accept-Encoding')
+    respuesta.cache_control.public = True
+    respuesta.cache_control.max_age = CACHE_INMUTABLE
+    respuesta.cache_control.immutable = True
+    return respuesta
+
+@app.cli.command('optimizar-icono')
+def comando_optimizar_icono():
+    """Genera static/img/icono-<tamaño>.png y .webp a partir de static/icono.png."""
+    from PIL import Image, ImageOps
+    
+    original = Image.open(os.path.join(app.static_folder, 'icono.png')).convert('RGBA')
+    destino = os.path.join(app.static_folder, 'img')
+    os.makedirs(destino, exist_ok=True)
+    for tamano in TAMANOS_ICONO:
+        # El logo se muestra cuadrado con object-fit: cover, así que se recorta igual
+        icono = ImageOps.fit(original, (tamano, tamano), Image.LANCZOS)
+        for extension, opciones in (('png', {'optimize': True}), ('webp', {'quality': 90, 'method': 6})):
+            ruta = os.path.join(destino, f'icono-{tamano}.{extension}')
+            icono.save(ruta, **opciones)
+            print(f"{ruta}: {os.path.getsize(ruta)} bytes")
+
 # ==================== RUTAS ====================
 @app.route('/')
 def index():
@@ -671,36 +2125,45 @@ def uploaded_file(filename):
 @login_required
 def api_ia_estado():
     estado = asistente_ia.obtener_estado()
+    estado['consultas_por_ruta'] = dict(asistente_ia.consultas_por_ruta)
     return jsonify(estado)
 
+@app.route('/api/ia/metricas')
+@login_required
+def api_ia_metricas():
+    metricas = asistente_ia.metricas.resumen()
+    metricas['consultas_por_ruta'] = dict(asistente_ia.consultas_por_ruta)
+    metricas['prefijo'] = asistente_ia.obtener_estadisticas_prefijo()
+    return jsonify(metricas)
+
+@app.route('/api/trabajos/<trabajo_id>')
+@login_required
+def api_trabajo(trabajo_id):
+    trabajo = db.session.get(Trabajo, trabajo_id)
+    if not trabajo:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify(serializar_trabajo(trabajo))
+
 @app.route('/api/dashboard')
 @login_required
 def api_dashboard():
-    total_productos = Producto.query.filter_by(activo=True).count()
-    total_clientes = Cliente.query.count()
-    total_ventas = Venta.query.count()
-    total_alquileres = Alquiler.query.count()
-    alquileres_activos = Alquiler.query.filter_by(estado='activo').count()
+    contadores = db.session.get(ResumenContadores, 1) or reconciliar_contadores()
     productos_bajo_stock = Producto.query.filter(Producto.activo == True, Producto.stock <= Producto.stock_minimo).all()
-    ventas_recientes = Venta.query.order_by(Venta.fecha.desc()).limit(5).all()
-    alquileres_recientes = Alquiler.query.order_by(Alquiler.fecha_registro.desc()).limit(5).all()
-    
-    hoy = datetime.utcnow().date()
-    ventas_hoy = Venta.query.filter(db.func.date(Venta.fecha) == hoy).all()
-    total_vendido_hoy = sum(v.total for v in ventas_hoy)
+    ventas_recientes = Venta.query.options(db.joinedload(Venta.cliente)).order_by(Venta.fecha.desc()).limit(5).all()
+    alquileres_recientes = Alquiler.query.options(db.joinedload(Alquiler.cliente)).order_by(Alquiler.fecha_registro.desc()).limit(5).all()
     
-    ingresos_alquileres = db.session.query(db.func.sum(Alquiler.total)).scalar() or 0
+    ventas_hoy = db.session.get(VentasDiarias, datetime.utcnow().date())
     
     estado_ia = asistente_ia.obtener_estado()
     
     return jsonify({
-        'total_productos': total_productos,
-        'total_clientes': total_clientes,
-        'total_ventas': total_ventas,
-        'total_alquileres': total_alquileres,
-        'alquileres_activos': alquileres_activos,
-        'ingresos_alquileres': ingresos_alquileres,
-        'total_vendido_hoy': total_vendido_hoy,
+        'total_productos': contadores.total_productos,
+        'total_clientes': contadores.total_clientes,
+        'total_ventas': contadores.total_ventas,
+        'total_alquileres': contadores.total_alquileres,
+        'alquileres_activos': contadores.alquileres_activos,
+        'ingresos_alquileres': contadores.ingresos_alquileres,
+        'total_vendido_hoy': ventas_hoy.total if ventas_hoy else 0,
         'productos_bajo_stock': [{'nombre': p.nombre, 'stock': p.stock, 'minimo': p.stock_minimo} for p in productos_bajo_stock],
         'ventas_recientes': [{'id': v.id, 'cliente': v.cliente.nombre, 'total': v.total, 'fecha': v.fecha.strftime('%d/%m/%Y %H:%M')} for v in ventas_recientes],
         'alquileres_recientes': [{'id': a.id, 'cliente': a.cliente.nombre, 'total': a.total, 'fecha_inicio': a.fecha_inicio.strftime('%d/%m/%Y'), 'fecha_fin': a.fecha_fin.strftime('%d/%m/%Y'), 'estado': a.estado} for a in alquileres_recientes],
@@ -710,21 +2173,46 @@ def api_dashboard():
 @app.route('/api/chat-ia', methods=['POST'])
 @login_required
 def api_chat_ia():
+    inicio = time.perf_counter()
     pregunta = request.json.get('pregunta', '')
     
+    inmediata = None
+    trabajo = None
+    if asistente_ia.esta_listo():
+        inmediata = asistente_ia.respuesta_inmediata(pregunta)
+        if inmediata is None:
+            try:
+                trabajo = asistente_ia.planificador.reservar()
+            except (ColaLlena, OSError) as e:
+                respuesta = jsonify({'error': str(e)})
+                respuesta.status_code = 503
+                respuesta.headers['Retry-After'] = '5'
+                return respuesta
+    
     def generar():
+        consulta = asistente_ia.consultar_streaming(pregunta, trabajo, inmediata, inicio)
         try:
-            for chunk in asistente_ia.consultar_streaming(pregunta):
-                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+            for chunk in consulta:
+                if isinstance(chunk, dict):
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                else:
+                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
             yield f"data: {json.dumps({'done': True})}\n\n"
         except Exception as e:
             logger.error(f"Error en chat IA: {e}")
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            # Al desconectarse el cliente se cierra este generador; cerrar la consulta cancela la generación
+            consulta.close()
     
-    return Response(stream_with_context(generar()), mimetype='text/event-stream')
+    respuesta = Response(stream_with_context(generar()), mimetype='text/event-stream')
+    if trabajo is not None:
+        respuesta.call_on_close(lambda: asistente_ia.planificador.liberar(trabajo))
+    return respuesta
 
 @app.route('/api/productos', methods=['GET', 'POST', 'PUT', 'DELETE'])
 @login_required
+@con_etag('productos')
 def api_productos():
     if request.method == 'GET':
         productos = Producto.query.filter_by(activo=True).all()
@@ -780,7 +2268,10 @@ def api_productos():
             )
             
             db.session.add(producto)
+            ajustar_contadores(total_productos=1)
+            version_datos.marcar_cambio('productos')
             db.session.commit()
+            indice_productos.actualizar(producto.id, texto_indexable_producto(producto))
             
             return jsonify({
                 'success': True, 
@@ -818,7 +2309,10 @@ def api_productos():
             producto.proveedor = data.get('proveedor', '')
             if data.get('imagen'):
                 producto.imagen = data['imagen']
+            version_datos.marcar_cambio('productos')
             db.session.commit()
+            if producto.activo:
+                indice_productos.actualizar(producto.id, texto_indexable_producto(producto))
             return jsonify({'success': True})
         return jsonify({'success': False}), 404
     
@@ -826,32 +2320,247 @@ def api_productos():
         producto_id = request.json.get('id')
         producto = db.session.get(Producto, producto_id)
         if producto:
+            if producto.activo:
+                ajustar_contadores(total_productos=-1)
             producto.activo = False
+            version_datos.marcar_cambio('productos')
             db.session.commit()
+            indice_productos.eliminar(producto.id)
             return jsonify({'success': True})
         return jsonify({'success': False}), 404
 
+# ==================== IMPORTACIÓN DE CATÁLOGO ====================
+EXTENSIONES_CATALOGO = {'csv', 'xlsx'}
+TAMANO_LOTE_IMPORTACION = 500
+VALORES_VERDADEROS = {'1', 'si', 'true', 'x', 'yes', 'verdadero'}
+
+def _columna_catalogo(encabezado):
+    return normalizar_texto(str(encabezado or '')).strip().replace(' ', '_')
+
+def _filas_catalogo(ruta, extension, codificacion):
+    """Genera (número de fila, {columna: valor}) leyendo el archivo de a una fila."""
+    if extension == 'xlsx':
+        from openpyxl import load_workbook
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            encabezado = [_columna_catalogo(c) for c in next(filas, ())]
+            for numero, valores in enumerate(filas, start=2):
+                if any(v not in (None, '') for v in valores):
+                    yield numero, dict(zip(encabezado, valores))
+        finally:
+            libro.close()
+        return
+    
+    with open(ruta, newline='', encoding=codificacion) as archivo:
+        # Las hojas de cálculo en español suelen exportar CSV separados por punto y coma
+        try:
+            dialecto = csv.Sniffer().sniff(archivo.read(4096), delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        archivo.seek(0)
+        lector = csv.reader(archivo, dialecto)
+        encabezado = [_columna_catalogo(c) for c in next(lector, [])]
+        for numero, valores in enumerate(lector, start=2):
+            if any(v.strip() for v in valores):
+                yield numero, dict(zip(encabezado, valores))
+
+def _inspeccionar_catalogo(ruta, extension):
+    """Devuelve (filas aproximadas, codificación) recorriendo el archivo sin cargarlo."""
+    if extension == 'xlsx':
+        from openpyxl import load_workbook
+        libro = load_workbook(ruta, read_only=True)
+        try:
+            return max((libro.active.max_row or 1) - 1, 0), None
+        finally:
+            libro.close()
+    
+    # Excel en Windows guarda los CSV en cp1252 si no se elige UTF-8
+    for codificacion in ('utf-8-sig', 'cp1252'):
+        try:
+            with open(ruta, newline='', encoding=codificacion) as archivo:
+                return max(sum(1 for _ in archivo) - 1, 0), codificacion
+        except UnicodeDecodeError:
+            continue
+    raise ValueError('No se pudo leer el archivo: guárdelo como CSV UTF-8')
+
+def _numero_catalogo(valor, campo, tipo=float):
+    if isinstance(valor, str):
+        valor = valor.strip().replace(',', '.')
+    try:
+        numero = tipo(float(valor))
+    except (TypeError, ValueError):
+        raise ValueError(f'{campo} no es un número válido: {valor}')
+    if numero < 0:
+        raise ValueError(f'{campo} no puede ser negativo')
+    return numero
+
+def _producto_desde_fila(fila):
+    """Convierte una fila del catálogo en columnas de Producto; las celdas vacías no se tocan."""
+    texto = {campo: str(fila.get(campo) or '').strip() for campo in ('nombre', 'tipo', 'proveedor', 'descripcion')}
+    if not texto['nombre']:
+        raise ValueError('Falta el nombre')
+    if not texto['tipo']:
+        raise ValueError('Falta el tipo')
+    if fila.get('precio') in (None, ''):
+        raise ValueError('Falta el precio')
+    
+    registro = {
+        'nombre': texto['nombre'],
+        'tipo': texto['tipo'],
+        'proveedor': texto['proveedor'],
+        'precio': _numero_catalogo(fila['precio'], 'precio')
+    }
+    if texto['descripcion']:
+        registro['descripcion'] = texto['descripcion']
+    for campo, tipo in (('precio_alquiler_dia', float), ('stock', int), ('stock_minimo', int)):
+        if fila.get(campo) not in (None, ''):
+            registro[campo] = _numero_catalogo(fila[campo], campo, tipo)
+    if fila.get('disponible_alquiler') not in (None, ''):
+        registro['disponible_alquiler'] = normalizar_texto(str(fila['disponible_alquiler'])).strip() in VALORES_VERDADEROS
+    return registro
+
+def _guardar_lote_catalogo(lote):
+    """Inserta o actualiza un bloque de filas, emparejando por nombre + proveedor.
+    
+    Devuelve (creados, actualizados, ids afectados). Dentro del bloque gana la última fila.
+    """
+    por_clave = {(registro['nombre'], registro['proveedor']): registro for _, registro in lote}
+    existentes = {}
+    for producto_id, nombre, proveedor, activo in db.session.query(
+        Producto.id, Producto.nombre, Producto.proveedor, Producto.activo
+    ).filter(Producto.nombre.in_({nombre for nombre, _ in por_clave})):
+        existentes.setdefault((nombre, proveedor or ''), (producto_id, activo))
+    
+    ahora = datetime.utcnow()
+    nuevos, cambios, reactivados = [], [], 0
+    for clave, registro in por_clave.items():
+        if clave in existentes:
+            producto_id, activo = existentes[clave]
+            cambios.append({'id': producto_id, **registro, 'activo': True})
+            reactivados += 0 if activo else 1
+        else:
+            nuevos.append({
+                'descripcion': '', 'precio_alquiler_dia': 0, 'disponible_alquiler': False,
+                'stock': 0, 'stock_minimo': 5, 'activo': True, 'fecha_registro': ahora,
+                **registro
+            })
+    
+    ids = [cambio['id'] for cambio in cambios]
+    if cambios:
+        db.session.execute(db.update(Producto), cambios)
+    if nuevos:
+        # El orden de los ids no importa aquí; sin sort_by_parameter_order SQLite inserta en bloque
+        ids += db.session.execute(db.insert(Producto).returning(Producto.id), nuevos).scalars().all()
+    ajustar_contadores(total_productos=len(nuevos) + reactivados)
+    version_datos.marcar_cambio('productos')
+    return len(nuevos), len(cambios), ids
+
+def importar_catalogo(trabajo, ruta, extension):
+    try:
+        trabajo.total, codificacion = _inspeccionar_catalogo(ruta, extension)
+        db.session.commit()
+        resultado = {'creados': 0, 'actualizados': 0, 'con_error': 0}
+        errores = []
+        # El avance se cuenta aquí y se copia al trabajo en cada commit: un rollback de un bloque
+        # descartaría los incrementos hechos sobre el objeto de la sesión
+        procesados = 0
+        
+        def guardar(lote):
+            nonlocal procesados
+            try:
+                creados, actualizados, ids = _guardar_lote_catalogo(lote)
+                resultado['creados'] += creados
+                resultado['actualizados'] += actualizados
+            except Exception as e:
+                db.session.rollback()
+                ids = []
+                resultado['con_error'] += len(lote)
+                errores.extend({'fila': numero, 'error': f'No se pudo guardar el bloque: {e}'} for numero, _ in lote)
+            
+            procesados += len(lote)
+            trabajo.procesados = procesados
+            trabajo.resultado_json = json.dumps(resultado)
+            trabajo.errores_json = json.dumps(errores[:MAX_ERRORES_TRABAJO], ensure_ascii=False)
+            db.session.commit()
+            if ids and indice_productos.cargado:
+                for producto in Producto.query.filter(Producto.id.in_(ids)):
+                    indice_productos.actualizar(producto.id, texto_indexable_producto(producto))
+        
+        lote = []
+        for numero, fila in _filas_catalogo(ruta, extension, codificacion):
+            try:
+                lote.append((numero, _producto_desde_fila(fila)))
+            except ValueError as e:
+                resultado['con_error'] += 1
+                errores.append({'fila': numero, 'error': str(e)})
+                procesados += 1
+            if len(lote) >= TAMANO_LOTE_IMPORTACION:
+                guardar(lote)
+                lote = []
+        guardar(lote)
+        trabajo.total = procesados
+        if resultado['creados']:
+            actualizar_estadisticas()
+    finally:
+        os.remove(ruta)
+
+@app.route('/api/productos/importar', methods=['POST'])
+@login_required
+def api_importar_productos():
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename:
+        return jsonify({'success': False, 'error': 'Seleccione un archivo CSV o XLSX'}), 400
+    extension = archivo.filename.rsplit('.', 1)[-1].lower() if '.' in archivo.filename else ''
+    if extension not in EXTENSIONES_CATALOGO:
+        return jsonify({'success': False, 'error': 'Formato no soportado, use CSV o XLSX'}), 400
+    if extension == 'xlsx' and importlib.util.find_spec('openpyxl') is None:
+        return jsonify({'success': False, 'error': 'openpyxl no está instalado: exporte el catálogo como CSV'}), 400
+    
+    descriptor, ruta = tempfile.mkstemp(prefix='catalogo_', suffix=f'.{extension}')
+    os.close(descriptor)
+    archivo.save(ruta)
+    trabajo = encolar_trabajo('importar_catalogo', importar_catalogo, ruta, extension)
+    return jsonify({'success': True, 'trabajo_id': trabajo.id}), 202
+
 @app.route('/api/clientes', methods=['GET', 'POST', 'PUT', 'DELETE'])
 @login_required
+@con_etag('clientes', 'ventas', 'alquileres')
 def api_clientes():
     if request.method == 'GET':
-        clientes = Cliente.query.all()
+        # Conteos agrupados en subconsultas: una sola consulta en vez de dos cargas por cliente
+        compras = db.session.query(
+            Venta.cliente_id, db.func.count(Venta.id).label('total')
+        ).group_by(Venta.cliente_id).subquery()
+        alquileres = db.session.query(
+            Alquiler.cliente_id, db.func.count(Alquiler.id).label('total')
+        ).group_by(Alquiler.cliente_id).subquery()
+        clientes = db.session.query(
+            Cliente,
+            db.func.coalesce(compras.c.total, 0),
+            db.func.coalesce(alquileres.c.total, 0)
+        ).outerjoin(compras, compras.c.cliente_id == Cliente.id).outerjoin(
+            alquileres, alquileres.c.cliente_id == Cliente.id
+        ).order_by(Cliente.id).all()
         return jsonify([{
             'id': c.id, 
             'nombre': c.nombre, 
             'telefono': c.telefono, 
             'email': c.email, 
             'direccion': c.direccion, 
-            'total_compras': len(c.ventas),
-            'total_alquileres': len(c.alquileres)
-        } for c in clientes])
+            'total_compras': total_compras,
+            'total_alquileres': total_alquileres
+        } for c, total_compras, total_alquileres in clientes])
     
     elif request.method == 'POST':
         data = request.json
         cliente = Cliente(nombre=data['nombre'], telefono=data.get('telefono'), 
                          email=data.get('email'), direccion=data.get('direccion'))
         db.session.add(cliente)
+        ajustar_contadores(total_clientes=1)
+        version_datos.marcar_cambio('clientes')
         db.session.commit()
+        indice_clientes.actualizar(cliente.id, cliente.nombre)
         return jsonify({'success': True, 'id': cliente.id})
     
     elif request.method == 'PUT':
@@ -862,7 +2571,9 @@ def api_clientes():
             cliente.telefono = data.get('telefono')
             cliente.email = data.get('email')
             cliente.direccion = data.get('direccion')
+            version_datos.marcar_cambio('clientes')
             db.session.commit()
+            indice_clientes.actualizar(cliente.id, cliente.nombre)
             return jsonify({'success': True})
         return jsonify({'success': False, 'error': 'Cliente no encontrado'}), 404
     
@@ -878,21 +2589,29 @@ def api_clientes():
             total_ventas = len(cliente.ventas)
             total_alquileres = len(cliente.alquileres)
             
-            # Restaurar stock de productos vendidos
-            for venta in cliente.ventas:
-                for detalle in venta.detalles:
-                    producto = detalle.producto
-                    producto.stock += detalle.cantidad
+            # Restaurar stock de productos vendidos y de los alquileres aún no devueltos
+            # (los finalizados ya lo devolvieron al finalizar)
+            liberar_stock(
+                [detalle for venta in cliente.ventas for detalle in venta.detalles] +
+                [detalle for alquiler in cliente.alquileres if alquiler.estado == 'activo' for detalle in alquiler.detalles]
+            )
             
-            # Restaurar stock de productos alquilados
-            for alquiler in cliente.alquileres:
-                for detalle in alquiler.detalles:
-                    producto = detalle.producto
-                    producto.stock += detalle.cantidad
+            for venta in cliente.ventas:
+                ajustar_ventas_diarias(venta.fecha, -1, -venta.total)
+            ajustar_contadores(
+                total_clientes=-1,
+                total_ventas=-total_ventas,
+                ingresos_ventas=-sum(v.total for v in cliente.ventas),
+                total_alquileres=-total_alquileres,
+                alquileres_activos=-sum(1 for a in cliente.alquileres if a.estado == 'activo'),
+                ingresos_alquileres=-sum(a.total for a in cliente.alquileres)
+            )
             
             # Eliminar cliente (las ventas y alquileres se eliminan automáticamente por CASCADE)
             db.session.delete(cliente)
+            version_datos.marcar_cambio('clientes', 'ventas', 'alquileres', 'productos')
             db.session.commit()
+            indice_clientes.eliminar(cliente_id)
             
             return jsonify({
                 'success': True, 
@@ -906,51 +2625,132 @@ def api_clientes():
             logger.error(f"Error al eliminar cliente: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
+# ==================== PAGINACIÓN ====================
+LIMITE_PAGINA = 50
+LIMITE_PAGINA_MAX = 200
+
+def _fecha_parametro(nombre):
+    valor = request.args.get(nombre)
+    return datetime.strptime(valor, '%Y-%m-%d') if valor else None
+
+def paginar_por_fecha(consulta, modelo, columna_fecha):
+    """Página ordenada por (fecha, id) descendente a partir del cursor de la página anterior.
+    
+    Acepta ?limite, ?cursor, ?desde y ?hasta (YYYY-MM-DD, ambos inclusive) y ?cliente_id.
+    Lanza ValueError si algún parámetro no es válido.
+    """
+    limite = min(max(request.args.get('limite', LIMITE_PAGINA, type=int), 1), LIMITE_PAGINA_MAX)
+    desde = _fecha_parametro('desde')
+    hasta = _fecha_parametro('hasta')
+    cliente_id = request.args.get('cliente_id', type=int)
+    cursor = request.args.get('cursor')
+    
+    if desde:
+        consulta = consulta.filter(columna_fecha >= desde)
+    if hasta:
+        consulta = consulta.filter(columna_fecha < hasta + timedelta(days=1))
+    if cliente_id:
+        consulta = consulta.filter(modelo.cliente_id == cliente_id)
+    if cursor:
+        fecha_cursor, id_cursor = cursor.split('|')
+        fecha_cursor, id_cursor = datetime.fromisoformat(fecha_cursor), int(id_cursor)
+        consulta = consulta.filter(db.or_(
+            columna_fecha < fecha_cursor,
+            db.and_(columna_fecha == fecha_cursor, modelo.id < id_cursor)
+        ))
+    
+    # Se pide una fila de más para saber si hay página siguiente sin hacer un COUNT
+    filas = consulta.order_by(columna_fecha.desc(), modelo.id.desc()).limit(limite + 1).all()
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = f"{getattr(filas[-1], columna_fecha.key).isoformat()}|{filas[-1].id}"
+    return filas, siguiente
+
+def serializar_alquiler(a):
+    return {
+        'id': a.id,
+        'total': a.total,
+        'deposito': a.deposito,
+        'fecha_inicio': a.fecha_inicio.strftime('%d/%m/%Y'),
+        'fecha_fin': a.fecha_fin.strftime('%d/%m/%Y'),
+        'fecha_devolucion_real': a.fecha_devolucion_real.strftime('%d/%m/%Y') if a.fecha_devolucion_real else None,
+        'estado': a.estado,
+        'metodo_pago': a.metodo_pago,
+        'notas': a.notas,
+        'productos': [{
+            'nombre': d.producto.nombre,
+            'tipo': d.producto.tipo,
+            'cantidad': d.cantidad,
+            'precio_dia': d.precio_dia,
+            'dias': d.dias,
+            'subtotal': d.subtotal
+        } for d in a.detalles],
+        'cantidad_productos': len(a.detalles)
+    }
+
+def serializar_venta(v):
+    return {
+        'id': v.id,
+        'total': v.total,
+        'fecha': v.fecha.strftime('%d/%m/%Y %H:%M'),
+        'fecha_timestamp': v.fecha.timestamp(),
+        'metodo_pago': v.metodo_pago,
+        'productos': [{
+            'nombre': d.producto.nombre,
+            'tipo': d.producto.tipo,
+            'cantidad': d.cantidad,
+            'precio': d.precio_unitario,
+            'subtotal': d.subtotal
+        } for d in v.detalles],
+        'cantidad_productos': len(v.detalles)
+    }
+
 @app.route('/api/alquileres', methods=['GET', 'POST', 'PUT', 'DELETE'])
 @login_required
 def api_alquileres():
     if request.method == 'GET':
-        alquileres = Alquiler.query.order_by(Alquiler.fecha_registro.desc()).all()
-        
-        alquileres_por_cliente = {}
-        for a in alquileres:
-            cliente_nombre = a.cliente.nombre
-            if cliente_nombre not in alquileres_por_cliente:
-                alquileres_por_cliente[cliente_nombre] = {
-                    'cliente_id': a.cliente.id,
-                    'cliente': cliente_nombre,
-                    'alquileres': [],
-                    'total_gastado': 0,
-                    'total_alquileres': 0
-                }
-            
-            productos_detalle = [{
-                'nombre': d.producto.nombre,
-                'tipo': d.producto.tipo,
-                'cantidad': d.cantidad,
-                'precio_dia': d.precio_dia,
-                'dias': d.dias,
-                'subtotal': d.subtotal
-            } for d in a.detalles]
-            
-            alquileres_por_cliente[cliente_nombre]['alquileres'].append({
-                'id': a.id,
-                'total': a.total,
-                'deposito': a.deposito,
-                'fecha_inicio': a.fecha_inicio.strftime('%d/%m/%Y'),
-                'fecha_fin': a.fecha_fin.strftime('%d/%m/%Y'),
-                'fecha_devolucion_real': a.fecha_devolucion_real.strftime('%d/%m/%Y') if a.fecha_devolucion_real else None,
-                'estado': a.estado,
-                'metodo_pago': a.metodo_pago,
-                'notas': a.notas,
-                'productos': productos_detalle,
-                'cantidad_productos': len(a.detalles)
-            })
-            
-            alquileres_por_cliente[cliente_nombre]['total_gastado'] += a.total
-            alquileres_por_cliente[cliente_nombre]['total_alquileres'] += 1
+        # Cliente, detalles y productos en consultas fijas por página en lugar de una por fila
+        consulta = Alquiler.query.options(
+            db.joinedload(Alquiler.cliente),
+            db.selectinload(Alquiler.detalles).joinedload(DetalleAlquiler.producto)
+        )
         
-        return jsonify(list(alquileres_por_cliente.values()))
+        if request.args.get('modo') == 'agrupado':
+            alquileres_por_cliente = {}
+            for a in consulta.order_by(Alquiler.fecha_registro.desc()).all():
+                cliente_nombre = a.cliente.nombre
+                if cliente_nombre not in alquileres_por_cliente:
+                    alquileres_por_cliente[cliente_nombre] = {
+                        'cliente_id': a.cliente.id,
+                        'cliente': cliente_nombre,
+                        'alquileres': [],
+                        'total_gastado': 0,
+                        'total_alquileres': 0
+                    }
+                alquileres_por_cliente[cliente_nombre]['alquileres'].append(serializar_alquiler(a))
+                alquileres_por_cliente[cliente_nombre]['total_gastado'] += a.total
+                alquileres_por_cliente[cliente_nombre]['total_alquileres'] += 1
+            return jsonify(list(alquileres_por_cliente.values()))
+        
+        estado = request.args.get('estado')
+        if estado:
+            consulta = consulta.filter(Alquiler.estado == estado)
+        tipo = request.args.get('tipo')
+        if tipo:
+            consulta = consulta.filter(Alquiler.detalles.any(DetalleAlquiler.producto.has(Producto.tipo == tipo)))
+        try:
+            alquileres, siguiente = paginar_por_fecha(consulta, Alquiler, Alquiler.fecha_registro)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Parámetros de paginación inválidos'}), 400
+        
+        return jsonify({
+            'alquileres': [
+                {**serializar_alquiler(a), 'cliente_id': a.cliente_id, 'cliente': a.cliente.nombre}
+                for a in alquileres
+            ],
+            'siguiente': siguiente
+        })
     
     elif request.method == 'POST':
         try:
@@ -963,6 +2763,7 @@ def api_alquileres():
                 return jsonify({'success': False, 'error': 'La fecha de fin debe ser posterior a la de inicio'})
             
             dias_totales = (fecha_fin - fecha_inicio).days
+            productos = reservar_stock(data['productos'], para_alquiler=True)
             
             alquiler = Alquiler(
                 cliente_id=data['cliente_id'],
@@ -978,32 +2779,23 @@ def api_alquileres():
             db.session.add(alquiler)
             db.session.flush()
             
-            total = 0
+            detalles = []
             for item in data['productos']:
-                producto = db.session.get(Producto, item['producto_id'])
-                
-                if not producto.disponible_alquiler:
-                    db.session.rollback()
-                    return jsonify({'success': False, 'error': f'{producto.nombre} no está disponible para alquiler'})
-                
-                if producto.stock < item['cantidad']:
-                    db.session.rollback()
-                    return jsonify({'success': False, 'error': f'Stock insuficiente: {producto.nombre}'})
-                
-                subtotal = item['cantidad'] * producto.precio_alquiler_dia * dias_totales
-                detalle = DetalleAlquiler(
-                    alquiler_id=alquiler.id,
-                    producto_id=producto.id,
-                    cantidad=item['cantidad'],
-                    precio_dia=producto.precio_alquiler_dia,
-                    dias=dias_totales,
-                    subtotal=subtotal
-                )
-                db.session.add(detalle)
-                producto.stock -= item['cantidad']
-                total += subtotal
+                producto = productos[int(item['producto_id'])]
+                detalles.append({
+                    'alquiler_id': alquiler.id,
+                    'producto_id': producto.id,
+                    'cantidad': int(item['cantidad']),
+                    'precio_dia': producto.precio_alquiler_dia,
+                    'dias': dias_totales,
+                    'subtotal': int(item['cantidad']) * producto.precio_alquiler_dia * dias_totales
+                })
+            db.session.execute(db.insert(DetalleAlquiler), detalles)
             
+            total = sum(d['subtotal'] for d in detalles)
             alquiler.total = total
+            ajustar_contadores(total_alquileres=1, alquileres_activos=1, ingresos_alquileres=total)
+            version_datos.marcar_cambio('alquileres', 'productos')
             db.session.commit()
             return jsonify({'success': True, 'alquiler_id': alquiler.id})
         except Exception as e:
@@ -1019,15 +2811,20 @@ def api_alquileres():
                 return jsonify({'success': False, 'error': 'Alquiler no encontrado'}), 404
             
             if data.get('accion') == 'finalizar':
-                if alquiler.estado != 'activo':
+                # Condicional sobre el estado: dos finalizaciones simultáneas no devuelven el stock dos veces
+                finalizado = db.session.execute(
+                    db.update(Alquiler)
+                    .where(Alquiler.id == alquiler.id, Alquiler.estado == 'activo')
+                    .values(estado='finalizado', fecha_devolucion_real=datetime.utcnow()),
+                    execution_options={'synchronize_session': 'fetch'}
+                ).rowcount
+                if not finalizado:
+                    db.session.rollback()
                     return jsonify({'success': False, 'error': 'El alquiler no está activo'})
                 
-                for detalle in alquiler.detalles:
-                    producto = detalle.producto
-                    producto.stock += detalle.cantidad
-                
-                alquiler.estado = 'finalizado'
-                alquiler.fecha_devolucion_real = datetime.utcnow()
+                liberar_stock(alquiler.detalles)
+                ajustar_contadores(alquileres_activos=-1)
+                version_datos.marcar_cambio('alquileres', 'productos')
                 
                 db.session.commit()
                 return jsonify({'success': True, 'message': 'Alquiler finalizado y stock restaurado'})
@@ -1046,11 +2843,17 @@ def api_alquileres():
             if not alquiler:
                 return jsonify({'success': False, 'error': 'Alquiler no encontrado'}), 404
             
-            for detalle in alquiler.detalles:
-                producto = detalle.producto
-                producto.stock += detalle.cantidad
+            # Un alquiler finalizado ya devolvió su stock
+            if alquiler.estado == 'activo':
+                liberar_stock(alquiler.detalles)
             
+            ajustar_contadores(
+                total_alquileres=-1,
+                alquileres_activos=-1 if alquiler.estado == 'activo' else 0,
+                ingresos_alquileres=-alquiler.total
+            )
             db.session.delete(alquiler)
+            version_datos.marcar_cambio('alquileres', 'productos')
             db.session.commit()
             
             return jsonify({'success': True, 'message': 'Alquiler eliminado y stock restaurado'})
@@ -1058,70 +2861,107 @@ def api_alquileres():
             db.session.rollback()
             return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/alquileres/resumen')
+@login_required
+def api_alquileres_resumen():
+    # Solo los totales por cliente; el detalle de cada grupo se pide a /api/alquileres?cliente_id=
+    consulta = db.session.query(
+        Cliente.id, Cliente.nombre,
+        db.func.count(Alquiler.id),
+        db.func.sum(Alquiler.total),
+        db.func.sum(db.case((Alquiler.estado == 'activo', 1), else_=0)),
+        db.func.max(Alquiler.fecha_registro)
+    ).join(Alquiler, Alquiler.cliente_id == Cliente.id)
+    
+    tipo = request.args.get('tipo')
+    if tipo:
+        consulta = consulta.filter(Cliente.id.in_(
+            db.session.query(Alquiler.cliente_id).join(DetalleAlquiler).join(Producto).filter(Producto.tipo == tipo)
+        ))
+    
+    grupos = consulta.group_by(Cliente.id).order_by(db.func.max(Alquiler.fecha_registro).desc()).all()
+    tipos = [t for (t,) in db.session.query(Producto.tipo).join(DetalleAlquiler).distinct().order_by(Producto.tipo)]
+    
+    return jsonify({
+        'grupos': [{
+            'cliente_id': cliente_id,
+            'cliente': nombre,
+            'total_alquileres': cantidad,
+            'total_gastado': total or 0,
+            'alquileres_activos': activos or 0,
+            'ultima_fecha': ultima.strftime('%d/%m/%Y') if ultima else None
+        } for cliente_id, nombre, cantidad, total, activos, ultima in grupos],
+        'tipos': tipos
+    })
+
 @app.route('/api/ventas', methods=['GET', 'POST', 'DELETE'])
 @login_required
 def api_ventas():
     if request.method == 'GET':
-        ventas = Venta.query.order_by(Venta.fecha.desc()).all()
-        
-        ventas_por_cliente = {}
-        for v in ventas:
-            cliente_nombre = v.cliente.nombre
-            if cliente_nombre not in ventas_por_cliente:
-                ventas_por_cliente[cliente_nombre] = {
-                    'cliente_id': v.cliente.id,
-                    'cliente': cliente_nombre,
-                    'ventas': [],
-                    'total_gastado': 0,
-                    'total_compras': 0
-                }
-            
-            productos_detalle = [{
-                'nombre': d.producto.nombre,
-                'tipo': d.producto.tipo,
-                'cantidad': d.cantidad,
-                'precio': d.precio_unitario,
-                'subtotal': d.subtotal
-            } for d in v.detalles]
-            
-            ventas_por_cliente[cliente_nombre]['ventas'].append({
-                'id': v.id,
-                'total': v.total,
-                'fecha': v.fecha.strftime('%d/%m/%Y %H:%M'),
-                'fecha_timestamp': v.fecha.timestamp(),
-                'metodo_pago': v.metodo_pago,
-                'productos': productos_detalle,
-                'cantidad_productos': len(v.detalles)
-            })
-            
-            ventas_por_cliente[cliente_nombre]['total_gastado'] += v.total
-            ventas_por_cliente[cliente_nombre]['total_compras'] += 1
+        consulta = Venta.query.options(
+            db.joinedload(Venta.cliente),
+            db.selectinload(Venta.detalles).joinedload(DetalleVenta.producto)
+        )
         
-        return jsonify(list(ventas_por_cliente.values()))
+        if request.args.get('modo') == 'agrupado':
+            ventas_por_cliente = {}
+            for v in consulta.order_by(Venta.fecha.desc()).all():
+                cliente_nombre = v.cliente.nombre
+                if cliente_nombre not in ventas_por_cliente:
+                    ventas_por_cliente[cliente_nombre] = {
+                        'cliente_id': v.cliente.id,
+                        'cliente': cliente_nombre,
+                        'ventas': [],
+                        'total_gastado': 0,
+                        'total_compras': 0
+                    }
+                ventas_por_cliente[cliente_nombre]['ventas'].append(serializar_venta(v))
+                ventas_por_cliente[cliente_nombre]['total_gastado'] += v.total
+                ventas_por_cliente[cliente_nombre]['total_compras'] += 1
+            return jsonify(list(ventas_por_cliente.values()))
+        
+        tipo = request.args.get('tipo')
+        if tipo:
+            consulta = consulta.filter(Venta.detalles.any(DetalleVenta.producto.has(Producto.tipo == tipo)))
+        try:
+            ventas, siguiente = paginar_por_fecha(consulta, Venta, Venta.fecha)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Parámetros de paginación inválidos'}), 400
+        
+        return jsonify({
+            'ventas': [
+                {**serializar_venta(v), 'cliente_id': v.cliente_id, 'cliente': v.cliente.nombre}
+                for v in ventas
+            ],
+            'siguiente': siguiente
+        })
     
     elif request.method == 'POST':
         try:
             data = request.json
+            productos = reservar_stock(data['productos'])
             venta = Venta(cliente_id=data['cliente_id'], usuario_id=session['user_id'], 
                          total=0, metodo_pago=data['metodo_pago'])
             db.session.add(venta)
             db.session.flush()
             
-            total = 0
+            detalles = []
             for item in data['productos']:
-                producto = db.session.get(Producto, item['producto_id'])
-                if producto.stock < item['cantidad']:
-                    db.session.rollback()
-                    return jsonify({'success': False, 'error': f'Stock insuficiente: {producto.nombre}'})
-                
-                subtotal = item['cantidad'] * producto.precio
-                detalle = DetalleVenta(venta_id=venta.id, producto_id=producto.id, 
-                                      cantidad=item['cantidad'], precio_unitario=producto.precio, subtotal=subtotal)
-                db.session.add(detalle)
-                producto.stock -= item['cantidad']
-                total += subtotal
+                producto = productos[int(item['producto_id'])]
+                detalles.append({
+                    'venta_id': venta.id,
+                    'producto_id': producto.id,
+                    'cantidad': int(item['cantidad']),
+                    'precio_unitario': producto.precio,
+                    'subtotal': int(item['cantidad']) * producto.precio
+                })
+            db.session.execute(db.insert(DetalleVenta), detalles)
             
+            total = sum(d['subtotal'] for d in detalles)
             venta.total = total
+            ajustar_contadores(total_ventas=1, ingresos_ventas=total)
+            ajustar_ventas_diarias(venta.fecha, 1, total)
+            version_datos.marcar_cambio('ventas', 'productos')
             db.session.commit()
             return jsonify({'success': True, 'venta_id': venta.id})
         except Exception as e:
@@ -1136,11 +2976,12 @@ def api_ventas():
             if not venta:
                 return jsonify({'success': False, 'error': 'Venta no encontrada'}), 404
             
-            for detalle in venta.detalles:
-                producto = detalle.producto
-                producto.stock += detalle.cantidad
+            liberar_stock(venta.detalles)
             
+            ajustar_contadores(total_ventas=-1, ingresos_ventas=-venta.total)
+            ajustar_ventas_diarias(venta.fecha, -1, -venta.total)
             db.session.delete(venta)
+            version_datos.marcar_cambio('ventas', 'productos')
             db.session.commit()
             
             return jsonify({'success': True, 'message': 'Venta eliminada y stock restaurado'})
@@ -1148,8 +2989,376 @@ def api_ventas():
             db.session.rollback()
             return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/ventas/resumen')
+@login_required
+def api_ventas_resumen():
+    # Solo los totales por cliente; el detalle de cada grupo se pide a /api/ventas?cliente_id=
+    consulta = db.session.query(
+        Cliente.id, Cliente.nombre,
+        db.func.count(Venta.id),
+        db.func.sum(Venta.total),
+        db.func.max(Venta.fecha)
+    ).join(Venta, Venta.cliente_id == Cliente.id)
+    
+    tipo = request.args.get('tipo')
+    if tipo:
+        consulta = consulta.filter(Cliente.id.in_(
+            db.session.query(Venta.cliente_id).join(DetalleVenta).join(Producto).filter(Producto.tipo == tipo)
+        ))
+    
+    grupos = consulta.group_by(Cliente.id).order_by(db.func.max(Venta.fecha).desc()).all()
+    tipos = [t for (t,) in db.session.query(Producto.tipo).join(DetalleVenta).distinct().order_by(Producto.tipo)]
+    
+    return jsonify({
+        'grupos': [{
+            'cliente_id': cliente_id,
+            'cliente': nombre,
+            'total_compras': cantidad,
+            'total_gastado': total or 0,
+            'ultima_fecha': ultima.strftime('%d/%m/%Y') if ultima else None
+        } for cliente_id, nombre, cantidad, total, ultima in grupos],
+        'tipos': tipos
+    })
+
+# ==================== INGESTA POR LOTES ====================
+# Sincronización del POS sin conexión y carga de ventas desde registros en papel:
+# todo el lote se valida en memoria y se escribe en una sola transacción.
+MAX_ITEMS_LOTE = 1000
+
+def _fecha_lote(valor, por_defecto=None):
+    return datetime.fromisoformat(valor) if valor else por_defecto
+
+def _parsear_item_lote(tipo, item, ahora):
+    if not isinstance(item, dict):
+        raise ValueError('Cada item debe ser un objeto')
+    lineas = [(int(p['producto_id']), int(p['cantidad'])) for p in item['productos']]
+    cantidades = cantidades_por_producto(item['productos'])
+    if not cantidades:
+        raise ValueError('Sin productos')
+    registro = {
+        'cliente_id': int(item['cliente_id']),
+        'metodo_pago': item['metodo_pago'],
+        'lineas': lineas,
+        'cantidades': cantidades
+    }
+    if tipo == 'venta':
+        registro['fecha'] = _fecha_lote(item.get('fecha'), ahora)
+        return registro
+    
+    fecha_inicio = datetime.strptime(item['fecha_inicio'], '%Y-%m-%d')
+    fecha_fin = datetime.strptime(item['fecha_fin'], '%Y-%m-%d')
+    if fecha_fin <= fecha_inicio:
+        raise ValueError('La fecha de fin debe ser posterior a la de inicio')
+    estado = item.get('estado', 'activo')
+    if estado not in ('activo', 'finalizado'):
+        raise ValueError(f'Estado no válido: {estado}')
+    registro.update(
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        dias=(fecha_fin - fecha_inicio).days,
+        deposito=float(item.get('deposito', 0)),
+        notas=item.get('notas', ''),
+        estado=estado,
+        fecha_registro=_fecha_lote(item.get('fecha_registro'), ahora),
+        # Un alquiler ya devuelto se registra sin descontar stock
+        fecha_devolucion_real=_fecha_lote(item.get('fecha_devolucion_real'), ahora) if estado == 'finalizado' else None
+    )
+    return registro
+
+def insertar_con_ids(modelo, filas):
+    """INSERT masivo que devuelve los ids nuevos en el orden de `filas`.
+    
+    En SQLite, sort_by_parameter_order hace que SQLAlchemy inserte fila a fila. Aquí se inserta
+    en bloques y se ordenan los ids: desde la primera fila la transacción tiene el bloqueo de
+    escritura, y SQLite da a cada fila el máximo id actual + 1 en el orden de los VALUES.
+    """
+    return sorted(db.session.execute(db.insert(modelo).returning(modelo.id), filas).scalars())
+
+def registrar_lote(ventas, alquileres, usuario_id):
+    """Valida y registra un lote de ventas y alquileres.
+    
+    Devuelve (resultados, estado_http). Cada item se acepta o se rechaza por separado; los
+    aceptados se escriben juntos con inserts masivos y un único UPDATE de stock.
+    """
+    ahora = datetime.utcnow()
+    resultados = {'venta': [None] * len(ventas), 'alquiler': [None] * len(alquileres)}
+    pendientes = []
+    for tipo, items in (('venta', ventas), ('alquiler', alquileres)):
+        for indice, item in enumerate(items):
+            try:
+                pendientes.append((tipo, indice, _parsear_item_lote(tipo, item, ahora)))
+            except KeyError as e:
+                resultados[tipo][indice] = {'indice': indice, 'success': False, 'error': f'Falta el campo {e}'}
+            except (TypeError, ValueError) as e:
+                resultados[tipo][indice] = {'indice': indice, 'success': False, 'error': str(e)}
+    
+    ids_productos = {producto_id for _, _, item in pendientes for producto_id in item['cantidades']}
+    ids_clientes = {item['cliente_id'] for _, _, item in pendientes}
+    productos = {p.id: p for p in Producto.query.filter(Producto.id.in_(ids_productos)).all()} if ids_productos else {}
+    clientes = {c for (c,) in db.session.query(Cliente.id).filter(Cliente.id.in_(ids_clientes))} if ids_clientes else set()
+    
+    # Stock restante simulado en memoria: cada item ve lo que dejaron los anteriores del lote
+    restante = {producto_id: p.stock for producto_id, p in productos.items()}
+    reservado = Counter()
+    aceptados = {'venta': [], 'alquiler': []}
+    for tipo, indice, item in pendientes:
+        cantidades = item['cantidades']
+        faltantes = [pid for pid in cantidades if pid not in productos]
+        no_alquilables = [
+            productos[pid].nombre for pid in cantidades
+            if tipo == 'alquiler' and pid in productos and not productos[pid].disponible_alquiler
+        ]
+        error = None
+        if item['cliente_id'] not in clientes:
+            error = f"Cliente {item['cliente_id']} no encontrado"
+        elif faltantes:
+            error = f'Producto {faltantes[0]} no encontrado'
+        elif no_alquilables:
+            error = f"{', '.join(no_alquilables)} no está disponible para alquiler"
+        elif tipo == 'venta' or item['estado'] == 'activo':
+            insuficientes = [productos[pid].nombre for pid, cantidad in cantidades.items() if restante[pid] < cantidad]
+            if insuficientes:
+                error = f"Stock insuficiente: {', '.join(insuficientes)}"
+            else:
+                for pid, cantidad in cantidades.items():
+                    restante[pid] -= cantidad
+                    reservado[pid] += cantidad
+        
+        if error:
+            resultados[tipo][indice] = {'indice': indice, 'success': False, 'error': error}
+        else:
+            aceptados[tipo].append((indice, item))
+    
+    if reservado and len(descontar_stock(reservado)) != len(reservado):
+        # Otro proceso vendió entre la lectura y la escritura: no se registra nada del lote
+        db.session.rollback()
+        return {'success': False, 'error': 'El stock cambió mientras se procesaba el lote, vuelva a enviarlo'}, 409
+    
+    ventas_aceptadas = aceptados['venta']
+    if ventas_aceptadas:
+        filas = [{
+            'cliente_id': item['cliente_id'],
+            'usuario_id': usuario_id,
+            'total': sum(cantidad * productos[pid].precio for pid, cantidad in item['lineas']),
+            'fecha': item['fecha'],
+            'metodo_pago': item['metodo_pago']
+        } for _, item in ventas_aceptadas]
+        ids = insertar_con_ids(Venta, filas)
+        db.session.execute(db.insert(DetalleVenta), [{
+            'venta_id': venta_id,
+            'producto_id': pid,
+            'cantidad': cantidad,
+            'precio_unitario': productos[pid].precio,
+            'subtotal': cantidad * productos[pid].precio
+        } for venta_id, (_, item) in zip(ids, ventas_aceptadas) for pid, cantidad in item['lineas']])
+        
+        por_dia = {}
+        for fila in filas:
+            dia = por_dia.setdefault(fila['fecha'].date(), [fila['fecha'], 0, 0])
+            dia[1] += 1
+            dia[2] += fila['total']
+        for fecha, cantidad, total in por_dia.values():
+            ajustar_ventas_diarias(fecha, cantidad, total)
+        ajustar_contadores(total_ventas=len(filas), ingresos_ventas=sum(f['total'] for f in filas))
+        for venta_id, (indice, _) in zip(ids, ventas_aceptadas):
+            resultados['venta'][indice] = {'indice': indice, 'success': True, 'venta_id': venta_id}
+    
+    alquileres_aceptados = aceptados['alquiler']
+    if alquileres_aceptados:
+        filas = [{
+            'cliente_id': item['cliente_id'],
+            'usuario_id': usuario_id,
+            'fecha_inicio': item['fecha_inicio'],
+            'fecha_fin': item['fecha_fin'],
+            'fecha_devolucion_real': item['fecha_devolucion_real'],
+            'total': sum(cantidad * productos[pid].precio_alquiler_dia * item['dias'] for pid, cantidad in item['lineas']),
+            'deposito': item['deposito'],
+            'estado': item['estado'],
+            'metodo_pago': item['metodo_pago'],
+            'notas': item['notas'],
+            'fecha_registro': item['fecha_registro']
+        } for _, item in alquileres_aceptados]
+        ids = insertar_con_ids(Alquiler, filas)
+        db.session.execute(db.insert(DetalleAlquiler), [{
+            'alquiler_id': alquiler_id,
+            'producto_id': pid,
+            'cantidad': cantidad,
+            'precio_dia': productos[pid].precio_alquiler_dia,
+            'dias': item['dias'],
+            'subtotal': cantidad * productos[pid].precio_alquiler_dia * item['dias']
+        } for alquiler_id, (_, item) in zip(ids, alquileres_aceptados) for pid, cantidad in item['lineas']])
+        
+        ajustar_contadores(
+            total_alquileres=len(filas),
+            alquileres_activos=sum(1 for f in filas if f['estado'] == 'activo'),
+            ingresos_alquileres=sum(f['total'] for f in filas)
+        )
+        for alquiler_id, (indice, _) in zip(ids, alquileres_aceptados):
+            resultados['alquiler'][indice] = {'indice': indice, 'success': True, 'alquiler_id': alquiler_id}
+    
+    if ventas_aceptadas or alquileres_aceptados:
+        version_datos.marcar_cambio('ventas', 'alquileres', 'productos')
+    db.session.commit()
+    registradas = len(ventas_aceptadas) + len(alquileres_aceptados)
+    
+    return {
+        'success': True,
+        'registradas': registradas,
+        'rechazadas': len(ventas) + len(alquileres) - registradas,
+        'ventas': resultados['venta'],
+        'alquileres': resultados['alquiler']
+    }, 200
+
+@app.route('/api/lote', methods=['POST'])
+@login_required
+def api_lote():
+    data = request.get_json(silent=True) or {}
+    ventas = data.get('ventas') or []
+    alquileres = data.get('alquileres') or []
+    if not isinstance(ventas, list) or not isinstance(alquileres, list):
+        return jsonify({'success': False, 'error': 'ventas y alquileres deben ser listas'}), 400
+    if len(ventas) + len(alquileres) > MAX_ITEMS_LOTE:
+        return jsonify({'success': False, 'error': f'El lote admite como máximo {MAX_ITEMS_LOTE} items'}), 413
+    
+    try:
+        resultado, estado_http = registrar_lote(ventas, alquileres, session['user_id'])
+        return jsonify(resultado), estado_http
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error al registrar lote: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ==================== EXPORTACIÓN ====================
+# Una fila por línea de detalle, leída en lotes con yield_per y enviada según se genera:
+# la memoria no depende del tamaño del historial y el primer byte sale de inmediato.
+TAMANO_LOTE_EXPORTACION = 1000
+TAMANO_BLOQUE_EXPORTACION = 64 * 1024
+
+def _valor_exportable(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+def _en_bloques(lineas):
+    bloque, longitud = [], 0
+    for linea in lineas:
+        bloque.append(linea)
+        longitud += len(linea)
+        if longitud >= TAMANO_BLOQUE_EXPORTACION:
+            yield ''.join(bloque)
+            bloque, longitud = [], 0
+    if bloque:
+        yield ''.join(bloque)
+
+def _lineas_csv(filas):
+    salida = StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(list(filas.keys()))
+    for fila in filas:
+        escritor.writerow([_valor_exportable(valor) for valor in fila.values()])
+        yield salida.getvalue()
+        salida.seek(0)
+        salida.truncate()
+    yield salida.getvalue()
+
+def _lineas_ndjson(filas, clave, campos_detalle):
+    # Las filas llegan ordenadas por la clave: cada grupo consecutivo es un registro con sus productos
+    for _, grupo in groupby(filas, key=lambda fila: fila[clave]):
+        grupo = list(grupo)
+        registro = {campo: _valor_exportable(valor) for campo, valor in grupo[0].items() if campo not in campos_detalle}
+        registro['productos'] = [
+            {campo: fila[campo] for campo in campos_detalle}
+            for fila in grupo if fila['producto_id'] is not None
+        ]
+        yield json.dumps(registro, ensure_ascii=False) + '\n'
+
+def respuesta_exportacion(nombre, consulta, columna_fecha, clave, campos_detalle):
+    formato = request.args.get('formato', 'ndjson')
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({'success': False, 'error': 'Formato no soportado, use ndjson o csv'}), 400
+    try:
+        desde = _fecha_parametro('desde')
+        hasta = _fecha_parametro('hasta')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Fecha inválida, use YYYY-MM-DD'}), 400
+    
+    if desde:
+        consulta = consulta.where(columna_fecha >= desde)
+    if hasta:
+        consulta = consulta.where(columna_fecha < hasta + timedelta(days=1))
+    consulta = consulta.execution_options(yield_per=TAMANO_LOTE_EXPORTACION)
+    
+    def generar():
+        filas = db.session.execute(consulta).mappings()
+        if formato == 'csv':
+            yield from _en_bloques(_lineas_csv(filas))
+        else:
+            yield from _en_bloques(_lineas_ndjson(filas, clave, campos_detalle))
+    
+    archivo = f"{nombre}_{datetime.utcnow().strftime('%Y%m%d')}.{formato}"
+    return Response(
+        stream_with_context(generar()),
+        mimetype='text/csv' if formato == 'csv' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={archivo}'}
+    )
+
+@app.route('/api/exportar/ventas')
+@login_required
+def api_exportar_ventas():
+    consulta = db.select(
+        Venta.id.label('venta_id'),
+        Venta.fecha,
+        Venta.cliente_id,
+        Cliente.nombre.label('cliente'),
+        Venta.metodo_pago,
+        Venta.total,
+        DetalleVenta.producto_id,
+        Producto.nombre.label('producto'),
+        Producto.tipo,
+        DetalleVenta.cantidad,
+        DetalleVenta.precio_unitario,
+        DetalleVenta.subtotal
+    ).join(Cliente, Cliente.id == Venta.cliente_id).outerjoin(
+        DetalleVenta, DetalleVenta.venta_id == Venta.id
+    ).outerjoin(Producto, Producto.id == DetalleVenta.producto_id).order_by(Venta.id, DetalleVenta.id)
+    
+    return respuesta_exportacion(
+        'ventas', consulta, Venta.fecha, 'venta_id',
+        ('producto_id', 'producto', 'tipo', 'cantidad', 'precio_unitario', 'subtotal')
+    )
+
+@app.route('/api/exportar/alquileres')
+@login_required
+def api_exportar_alquileres():
+    consulta = db.select(
+        Alquiler.id.label('alquiler_id'),
+        Alquiler.fecha_registro,
+        Alquiler.cliente_id,
+        Cliente.nombre.label('cliente'),
+        Alquiler.fecha_inicio,
+        Alquiler.fecha_fin,
+        Alquiler.fecha_devolucion_real,
+        Alquiler.estado,
+        Alquiler.metodo_pago,
+        Alquiler.deposito,
+        Alquiler.total,
+        DetalleAlquiler.producto_id,
+        Producto.nombre.label('producto'),
+        Producto.tipo,
+        DetalleAlquiler.cantidad,
+        DetalleAlquiler.precio_dia,
+        DetalleAlquiler.dias,
+        DetalleAlquiler.subtotal
+    ).join(Cliente, Cliente.id == Alquiler.cliente_id).outerjoin(
+        DetalleAlquiler, DetalleAlquiler.alquiler_id == Alquiler.id
+    ).outerjoin(Producto, Producto.id == DetalleAlquiler.producto_id).order_by(Alquiler.id, DetalleAlquiler.id)
+    
+    return respuesta_exportacion(
+        'alquileres', consulta, Alquiler.fecha_registro, 'alquiler_id',
+        ('producto_id', 'producto', 'tipo', 'cantidad', 'precio_dia', 'dias', 'subtotal')
+    )
+
 @app.route('/api/reportes')
 @login_required
+@con_etag('ventas', 'alquileres', 'productos', 'clientes')
 def api_reportes():
     total_ventas = Venta.query.count()
     total_ingresos = db.session.query(db.func.sum(Venta.total)).scalar() or 0
@@ -1190,6 +3399,7 @@ def api_reportes():
 
 @app.route('/api/reportes/historicos')
 @login_required
+@con_etag('reportes')
 def api_reportes_historicos():
     reportes = ReporteMensual.query.order_by(ReporteMensual.fecha_generacion.desc()).all()
     return jsonify([{
@@ -1203,211 +3413,116 @@ def api_reportes_historicos():
         'fecha_generacion': r.fecha_generacion.strftime('%d/%m/%Y')
     } for r in reportes])
 
+MAX_MESES_BACKFILL = 120
+
+def _parsear_mes(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m')
+    except (TypeError, ValueError):
+        raise ValueError(f'Mes inválido: {valor} (use YYYY-MM)')
+
+def meses_entre(desde, hasta):
+    meses = []
+    actual = desde
+    while actual <= hasta:
+        meses.append(actual)
+        actual = rango_mes(actual)[1]
+    return meses
+
+def generar_reporte_mes(inicio_mes, reemplazar=False):
+    """Calcula y guarda el reporte de un mes en su propio contexto; devuelve 'generado' u 'omitido'."""
+    with app.app_context():
+        mes_id = inicio_mes.strftime('%Y-%m')
+        existente = db.session.get(ReporteMensual, mes_id)
+        if existente and not reemplazar:
+            return 'omitido'
+        
+        reporte = existente or ReporteMensual(id=mes_id, mes=inicio_mes.strftime('%B %Y'))
+        guardar_datos_reporte(reporte, calcular_reporte_mensual(db.session, *rango_mes(inicio_mes)))
+        db.session.add(reporte)
+        version_datos.marcar_cambio('reportes')
+        db.session.commit()
+        try:
+            guardar_pdf_reporte(reporte)
+        except Exception as e:
+            # Sin artefacto el PDF se dibuja en la primera descarga
+            logger.warning(f"No se pudo pre-generar el PDF de {mes_id}: {e}")
+        return 'generado'
+
+def generar_reportes(trabajo, meses, reemplazar):
+    # Cada mes se calcula en paralelo en el pool de reportes; este hilo solo registra el avance
+    trabajo.total = len(meses)
+    resultado = {'generados': [], 'omitidos': []}
+    errores = []
+    futuros = {ejecutor_reportes.submit(generar_reporte_mes, mes, reemplazar): mes.strftime('%Y-%m') for mes in meses}
+    for futuro in as_completed(futuros):
+        mes_id = futuros[futuro]
+        try:
+            estado = futuro.result()
+            resultado['generados' if estado == 'generado' else 'omitidos'].append(mes_id)
+        except Exception as e:
+            logger.error(f"Error al generar reporte {mes_id}: {e}")
+            errores.append({'mes': mes_id, 'error': str(e)})
+        trabajo.procesados = len(resultado['generados']) + len(resultado['omitidos']) + len(errores)
+        trabajo.resultado_json = json.dumps({k: sorted(v) for k, v in resultado.items()})
+        trabajo.errores_json = json.dumps(errores[:MAX_ERRORES_TRABAJO], ensure_ascii=False)
+        db.session.commit()
+    if errores and not resultado['generados']:
+        raise Exception(f"No se pudo generar ningún reporte: {errores[0]['error']}")
+
 @app.route('/api/reportes/generar', methods=['POST'])
 @login_required
 def api_generar_reporte():
+    """Encola la generación de un mes (por defecto el actual) o de un rango de meses.
+    
+    Cuerpo opcional: {"mes": "YYYY-MM"} o {"desde": "YYYY-MM", "hasta": "YYYY-MM", "reemplazar": bool}.
+    """
+    data = request.get_json(silent=True) or {}
+    mes_actual = rango_mes(datetime.utcnow())[0]
     try:
-        ahora = datetime.utcnow()
-        mes_id = ahora.strftime('%Y-%m')
-        mes_nombre = ahora.strftime('%B %Y')
-        
-        reporte_existente = ReporteMensual.query.get(mes_id)
-        if reporte_existente:
-            return jsonify({'success': False, 'error': 'Ya existe un reporte para este mes'}), 400
-        
-        inicio_mes = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if ahora.month == 12:
-            fin_mes = ahora.replace(year=ahora.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        if data.get('desde') or data.get('hasta'):
+            desde = _parsear_mes(data.get('desde'))
+            hasta = _parsear_mes(data.get('hasta') or mes_actual.strftime('%Y-%m'))
         else:
-            fin_mes = ahora.replace(month=ahora.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        ventas_mes = Venta.query.filter(Venta.fecha >= inicio_mes, Venta.fecha < fin_mes).all()
-        total_ventas = len(ventas_mes)
-        total_ingresos = sum(v.total for v in ventas_mes)
-        promedio_venta = (total_ingresos / total_ventas) if total_ventas > 0 else 0
-        
-        alquileres_mes = Alquiler.query.filter(Alquiler.fecha_registro >= inicio_mes, Alquiler.fecha_registro < fin_mes).all()
-        total_alquileres = len(alquileres_mes)
-        ingresos_alquileres = sum(a.total for a in alquileres_mes)
-        
-        productos_mes = db.session.query(
-            Producto.nombre,
-            Producto.tipo,
-            Producto.proveedor,
-            db.func.sum(DetalleVenta.cantidad).label('total')
-        ).join(DetalleVenta).join(Venta).filter(
-            Venta.fecha >= inicio_mes,
-            Venta.fecha < fin_mes
-        ).group_by(Producto.id).order_by(db.desc('total')).limit(10).all()
-        
-        productos_json = [{'nombre': p[0], 'tipo': p[1], 'proveedor': p[2], 'cantidad': int(p[3])} for p in productos_mes]
-        
-        productos_alquilados = db.session.query(
-            Producto.nombre,
-            Producto.tipo,
-            db.func.sum(DetalleAlquiler.cantidad).label('total')
-        ).join(DetalleAlquiler).join(Alquiler).filter(
-            Alquiler.fecha_registro >= inicio_mes,
-            Alquiler.fecha_registro < fin_mes
-        ).group_by(Producto.id).order_by(db.desc('total')).limit(10).all()
-        
-        productos_mas_alquilados_json = [{'nombre': p[0], 'tipo': p[1], 'cantidad': int(p[2])} for p in productos_alquilados]
-        
-        alquileres_activos = Alquiler.query.filter(
-            Alquiler.estado == 'activo',
-            Alquiler.fecha_registro >= inicio_mes,
-            Alquiler.fecha_registro < fin_mes
-        ).all()
-        
-        alquileres_activos_json = [{
-            'cliente': a.cliente.nombre,
-            'total': a.total,
-            'fecha_inicio': a.fecha_inicio.strftime('%d/%m/%Y'),
-            'fecha_fin': a.fecha_fin.strftime('%d/%m/%Y')
-        } for a in alquileres_activos]
-        
-        clientes_mes = db.session.query(
-            Cliente.nombre,
-            db.func.count(Venta.id).label('compras'),
-            db.func.sum(Venta.total).label('gastado')
-        ).join(Venta).filter(
-            Venta.fecha >= inicio_mes,
-            Venta.fecha < fin_mes
-        ).group_by(Cliente.id).order_by(db.desc('compras')).limit(10).all()
-        
-        clientes_json = [{'nombre': c[0], 'compras': c[1], 'gastado': float(c[2])} for c in clientes_mes]
-        
-        clientes_nuevos = Cliente.query.filter(
-            Cliente.fecha_registro >= inicio_mes,
-            Cliente.fecha_registro < fin_mes
-        ).all()
-        
-        clientes_nuevos_json = [{
-            'nombre': c.nombre,
-            'fecha_registro': c.fecha_registro.strftime('%d/%m/%Y'),
-            'telefono': c.telefono or 'N/A',
-            'email': c.email or 'N/A'
-        } for c in clientes_nuevos]
-        
-        productos_stock_bajo = []
-        for producto in Producto.query.filter_by(activo=True).all():
-            ventas_producto = db.session.query(
-                db.func.sum(DetalleVenta.cantidad)
-            ).join(Venta).filter(
-                DetalleVenta.producto_id == producto.id,
-                Venta.fecha >= inicio_mes,
-                Venta.fecha < fin_mes
-            ).scalar() or 0
-            
-            if ventas_producto > 0 and producto.stock <= producto.stock_minimo:
-                productos_stock_bajo.append({
-                    'nombre': producto.nombre,
-                    'tipo': producto.tipo,
-                    'stock_actual': producto.stock,
-                    'stock_minimo': producto.stock_minimo,
-                    'veces_vendido': int(ventas_producto)
-                })
-        
-        productos_stock_bajo_json = productos_stock_bajo
-        
-        ventas_por_dia = {}
-        for venta in ventas_mes:
-            dia = venta.fecha.strftime('%d/%m')
-            if dia not in ventas_por_dia:
-                ventas_por_dia[dia] = {'cantidad': 0, 'total': 0}
-            ventas_por_dia[dia]['cantidad'] += 1
-            ventas_por_dia[dia]['total'] += venta.total
-        
-        ventas_por_dia_json = [
-            {'dia': dia, 'cantidad': datos['cantidad'], 'total': datos['total']}
-            for dia, datos in sorted(ventas_por_dia.items())
-        ]
-        
-        ventas_por_metodo = {}
-        for venta in ventas_mes:
-            metodo = venta.metodo_pago
-            if metodo not in ventas_por_metodo:
-                ventas_por_metodo[metodo] = {'cantidad': 0, 'total': 0}
-            ventas_por_metodo[metodo]['cantidad'] += 1
-            ventas_por_metodo[metodo]['total'] += venta.total
-        
-        ventas_por_metodo_pago_json = [
-            {'metodo': metodo, 'cantidad': datos['cantidad'], 'total': datos['total']}
-            for metodo, datos in ventas_por_metodo.items()
-        ]
-        
-        productos_mas_reabastecidos_json = productos_json[:5]
-        
-        ventas_por_tipo = db.session.query(
-            Producto.tipo,
-            db.func.sum(DetalleVenta.cantidad).label('cantidad'),
-            db.func.sum(DetalleVenta.subtotal).label('total')
-        ).join(DetalleVenta).join(Venta).filter(
-            Venta.fecha >= inicio_mes,
-            Venta.fecha < fin_mes
-        ).group_by(Producto.tipo).all()
-        
-        ventas_por_tipo_producto_json = [
-            {'tipo': t[0], 'cantidad': int(t[1]), 'total': float(t[2])}
-            for t in ventas_por_tipo
-        ]
-        
-        reporte = ReporteMensual(
-            id=mes_id,
-            mes=mes_nombre,
-            total_ventas=total_ventas,
-            total_ingresos=total_ingresos,
-            promedio_venta=promedio_venta,
-            total_alquileres=total_alquileres,
-            ingresos_alquileres=ingresos_alquileres,
-            productos_json=json.dumps(productos_json),
-            clientes_json=json.dumps(clientes_json),
-            clientes_nuevos_json=json.dumps(clientes_nuevos_json),
-            productos_stock_bajo_json=json.dumps(productos_stock_bajo_json),
-            ventas_por_dia_json=json.dumps(ventas_por_dia_json),
-            ventas_por_metodo_pago_json=json.dumps(ventas_por_metodo_pago_json),
-            productos_mas_reabastecidos_json=json.dumps(productos_mas_reabastecidos_json),
-            ventas_por_tipo_producto_json=json.dumps(ventas_por_tipo_producto_json),
-            alquileres_activos_json=json.dumps(alquileres_activos_json),
-            productos_mas_alquilados_json=json.dumps(productos_mas_alquilados_json)
-        )
-        
-        db.session.add(reporte)
-        db.session.commit()
-        
-        return jsonify({'success': True, 'reporte_id': mes_id})
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Error al generar reporte: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+            desde = hasta = _parsear_mes(data['mes']) if data.get('mes') else mes_actual
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if desde > hasta:
+        return jsonify({'success': False, 'error': 'El mes inicial debe ser anterior al final'}), 400
+    if hasta > mes_actual:
+        return jsonify({'success': False, 'error': 'No se pueden generar reportes de meses futuros'}), 400
+    meses = meses_entre(desde, hasta)
+    if len(meses) > MAX_MESES_BACKFILL:
+        return jsonify({'success': False, 'error': f'Como máximo {MAX_MESES_BACKFILL} meses por solicitud'}), 400
+    
+    reemplazar = bool(data.get('reemplazar'))
+    if len(meses) == 1 and not reemplazar and db.session.get(ReporteMensual, meses[0].strftime('%Y-%m')):
+        return jsonify({'success': False, 'error': 'Ya existe un reporte para este mes'}), 400
+    
+    trabajo = encolar_trabajo('generar_reportes', generar_reportes, meses, reemplazar)
+    return jsonify({
+        'success': True,
+        'trabajo_id': trabajo.id,
+        'meses': [mes.strftime('%Y-%m') for mes in meses]
+    }), 202
 
 @app.route('/api/reportes/<reporte_id>')
 @login_required
+@con_etag('reportes')
 def api_obtener_reporte(reporte_id):
     reporte = ReporteMensual.query.get(reporte_id)
     if not reporte:
         return jsonify({'error': 'Reporte no encontrado'}), 404
     
-    return jsonify({
-        'id': reporte.id,
-        'mes': reporte.mes,
-        'total_ventas': reporte.total_ventas,
-        'total_ingresos': reporte.total_ingresos,
-        'promedio_venta': reporte.promedio_venta,
-        'total_alquileres': reporte.total_alquileres,
-        'ingresos_alquileres': reporte.ingresos_alquileres,
-        'productos_mas_vendidos': json.loads(reporte.productos_json) if reporte.productos_json else [],
-        'productos_mas_alquilados': json.loads(reporte.productos_mas_alquilados_json) if reporte.productos_mas_alquilados_json else [],
-        'alquileres_activos': json.loads(reporte.alquileres_activos_json) if reporte.alquileres_activos_json else [],
-        'clientes_frecuentes': json.loads(reporte.clientes_json) if reporte.clientes_json else [],
-        'clientes_nuevos': json.loads(reporte.clientes_nuevos_json) if reporte.clientes_nuevos_json else [],
-        'productos_stock_bajo': json.loads(reporte.productos_stock_bajo_json) if reporte.productos_stock_bajo_json else [],
-        'ventas_por_dia': json.loads(reporte.ventas_por_dia_json) if reporte.ventas_por_dia_json else [],
-        'ventas_por_metodo_pago': json.loads(reporte.ventas_por_metodo_pago_json) if reporte.ventas_por_metodo_pago_json else [],
-        'productos_mas_reabastecidos': json.loads(reporte.productos_mas_reabastecidos_json) if reporte.productos_mas_reabastecidos_json else [],
-        'ventas_por_tipo_producto': json.loads(reporte.ventas_por_tipo_producto_json) if reporte.ventas_por_tipo_producto_json else [],
-        'fecha_generacion': reporte.fecha_generacion.strftime('%d/%m/%Y')
-    })
+    # El contenido ya es el JSON de la respuesta en gzip: se envía tal cual si el cliente lo acepta
+    if request.accept_encodings['gzip']:
+        respuesta = Response(reporte.contenido, mimetype='application/json')
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    else:
+        respuesta = Response(gzip.decompress(reporte.contenido), mimetype='application/json')
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
 
 @app.route('/api/reportes/<reporte_id>', methods=['DELETE'])
 @login_required
@@ -1418,7 +3533,9 @@ def api_eliminar_reporte(reporte_id):
             return jsonify({'success': False, 'error': 'Reporte no encontrado'}), 404
         
         db.session.delete(reporte)
+        version_datos.marcar_cambio('reportes')
         db.session.commit()
+        eliminar_pdf_reporte(reporte_id)
         
         return jsonify({'success': True, 'message': 'Reporte eliminado correctamente'})
     except Exception as e:
@@ -1433,129 +3550,132 @@ def api_descargar_reporte(reporte_id):
     if not reporte:
         return jsonify({'error': 'Reporte no encontrado'}), 404
     
-    pdf = PDF()
-    pdf.add_page()
-    
-    pdf.set_font('Arial', 'B', 14)
-    pdf.cell(0, 10, f'Mes: {reporte.mes}', 0, 1)
-    pdf.set_font('Arial', '', 10)
-    pdf.cell(0, 8, f'Fecha de generacion: {reporte.fecha_generacion.strftime("%d/%m/%Y %H:%M")}', 0, 1)
-    pdf.ln(5)
-    
-    pdf.chapter_title('RESUMEN GENERAL')
-    resumen = f'''Ventas: {reporte.total_ventas} ($ {reporte.total_ingresos:.2f})
-Promedio por Venta: $ {reporte.promedio_venta:.2f}
-Alquileres: {reporte.total_alquileres} ($ {reporte.ingresos_alquileres:.2f})'''
-    pdf.chapter_body(resumen)
-    
-    productos = json.loads(reporte.productos_json) if reporte.productos_json else []
-    if productos:
-        pdf.chapter_title('PRODUCTOS MAS VENDIDOS')
-        texto_productos = ''
-        for i, p in enumerate(productos, 1):
-            texto_productos += f"{i}. {p['nombre']} ({p['tipo']})\n"
-            texto_productos += f"   Proveedor: {p.get('proveedor', 'No especificado')}\n"
-            texto_productos += f"   Cantidad: {p['cantidad']} unidades\n\n"
-        pdf.chapter_body(texto_productos)
-    
-    productos_alquilados = json.loads(reporte.productos_mas_alquilados_json) if reporte.productos_mas_alquilados_json else []
-    if productos_alquilados:
-        pdf.chapter_title('PRODUCTOS MAS ALQUILADOS')
-        texto_alq = ''
-        for i, p in enumerate(productos_alquilados, 1):
-            texto_alq += f"{i}. {p['nombre']} ({p['tipo']}): {p['cantidad']} veces\n"
-        pdf.chapter_body(texto_alq)
-    
-    alquileres_activos = json.loads(reporte.alquileres_activos_json) if reporte.alquileres_activos_json else []
-    if alquileres_activos:
-        pdf.chapter_title(f'ALQUILERES ACTIVOS ({len(alquileres_activos)})')
-        texto_activos = ''
-        for i, a in enumerate(alquileres_activos, 1):
-            texto_activos += f"{i}. {a['cliente']} - $ {a['total']:.2f}\n"
-            texto_activos += f"   {a['fecha_inicio']} a {a['fecha_fin']}\n\n"
-        pdf.chapter_body(texto_activos)
-    
-    clientes = json.loads(reporte.clientes_json) if reporte.clientes_json else []
-    if clientes:
-        pdf.chapter_title('CLIENTES FRECUENTES DEL MES')
-        texto_clientes = ''
-        for i, c in enumerate(clientes, 1):
-            texto_clientes += f"{i}. {c['nombre']}: {c['compras']} compras - $ {c['gastado']:.2f}\n"
-        pdf.chapter_body(texto_clientes)
-    
-    clientes_nuevos = json.loads(reporte.clientes_nuevos_json) if reporte.clientes_nuevos_json else []
-    if clientes_nuevos:
-        pdf.chapter_title(f'NUEVOS CLIENTES REGISTRADOS ({len(clientes_nuevos)})')
-        texto_nuevos = ''
-        for i, c in enumerate(clientes_nuevos, 1):
-            texto_nuevos += f"{i}. {c['nombre']} - Registrado: {c['fecha_registro']}\n"
-            texto_nuevos += f"   Telefono: {c['telefono']} | Email: {c['email']}\n\n"
-        pdf.chapter_body(texto_nuevos)
-    
-    productos_stock_bajo = json.loads(reporte.productos_stock_bajo_json) if reporte.productos_stock_bajo_json else []
-    if productos_stock_bajo:
-        pdf.chapter_title(f'PRODUCTOS CON STOCK BAJO ({len(productos_stock_bajo)})')
-        texto_stock = ''
-        for i, p in enumerate(productos_stock_bajo, 1):
-            texto_stock += f"{i}. {p['nombre']} ({p['tipo']})\n"
-            texto_stock += f"   Stock actual: {p['stock_actual']} | Minimo: {p['stock_minimo']}\n"
-            texto_stock += f"   Veces vendido este mes: {p['veces_vendido']}\n\n"
-        pdf.chapter_body(texto_stock)
-    
-    ventas_por_dia = json.loads(reporte.ventas_por_dia_json) if reporte.ventas_por_dia_json else []
-    if ventas_por_dia:
-        pdf.chapter_title('VENTAS POR DIA DEL MES')
-        texto_dias = ''
-        for v in ventas_por_dia:
-            texto_dias += f"{v['dia']}: {v['cantidad']} ventas - $ {v['total']:.2f}\n"
-        pdf.chapter_body(texto_dias)
-    
-    ventas_por_metodo = json.loads(reporte.ventas_por_metodo_pago_json) if reporte.ventas_por_metodo_pago_json else []
-    if ventas_por_metodo:
-        pdf.chapter_title('VENTAS POR METODO DE PAGO')
-        texto_metodos = ''
-        for v in ventas_por_metodo:
-            texto_metodos += f"{v['metodo']}: {v['cantidad']} ventas - $ {v['total']:.2f}\n"
-        pdf.chapter_body(texto_metodos)
-    
-    productos_reabastecidos = json.loads(reporte.productos_mas_reabastecidos_json) if reporte.productos_mas_reabastecidos_json else []
-    if productos_reabastecidos:
-        pdf.chapter_title('PRODUCTOS CON MAYOR DEMANDA')
-        pdf.set_font('Arial', '', 9)
-        pdf.multi_cell(0, 5, 'Estos productos requieren reabastecimiento frecuente')
-        pdf.ln(2)
-        pdf.set_font('Arial', '', 10)
-        texto_demanda = ''
-        for i, p in enumerate(productos_reabastecidos, 1):
-            texto_demanda += f"{i}. {p['nombre']} ({p['tipo']})\n"
-            texto_demanda += f"   Proveedor: {p.get('proveedor', 'No especificado')}\n"
-            texto_demanda += f"   Cantidad: {p['cantidad']} unidades\n\n"
-        pdf.chapter_body(texto_demanda)
-    
-    ventas_por_tipo = json.loads(reporte.ventas_por_tipo_producto_json) if reporte.ventas_por_tipo_producto_json else []
-    if ventas_por_tipo:
-        pdf.chapter_title('VENTAS POR CATEGORIA')
-        texto_categorias = ''
-        for v in ventas_por_tipo:
-            texto_categorias += f"{v['tipo'].capitalize()}: {v['cantidad']} unidades - $ {v['total']:.2f}\n"
-        pdf.chapter_body(texto_categorias)
-    
-    pdf_output = BytesIO()
-    pdf_string = pdf.output(dest='S').encode('latin-1')
-    pdf_output.write(pdf_string)
-    pdf_output.seek(0)
-    
-    return send_file(
-        pdf_output,
+    ruta = ruta_pdf_reporte(reporte)
+    if not os.path.exists(ruta):
+        ruta = guardar_pdf_reporte(reporte)
+    
+    # conditional=True responde 304 a If-None-Match/If-Modified-Since y atiende Range
+    respuesta = send_file(
+        ruta,
         mimetype='application/pdf',
         as_attachment=True,
-        download_name=f'reporte_completo_{reporte_id}.pdf'
+        download_name=f'reporte_completo_{reporte_id}.pdf',
+        conditional=True,
+        etag=clave_pdf_reporte(reporte),
+        last_modified=reporte.fecha_generacion,
+        max_age=0
+    )
+    respuesta.cache_control.private = True
+    return respuesta
+
+class _SalidaZip:
+    """Destino de escritura para ZipFile que acumula lo escrito hasta que el generador lo entrega."""
+    def __init__(self):
+        self.partes = []
+    
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+    
+    def flush(self):
+        pass
+    
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+def _zip_reportes(reporte_ids):
+    # Como mucho dos PDF por proceso en vuelo: la memoria no crece con la cantidad de reportes
+    pool = pool_pdf()
+    en_vuelo_max = PROCESOS_PDF * 2
+    salida = _SalidaZip()
+    errores = []
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_STORED) as archivo_zip:
+        def agregar(reporte_id, contenido):
+            info = zipfile.ZipInfo(f'reporte_completo_{reporte_id}.pdf', datetime.utcnow().timetuple()[:6])
+            archivo_zip.writestr(info, contenido)
+        
+        pendientes = {}
+        ids = iter(reporte_ids)
+        while True:
+            for reporte_id in ids:
+                reporte = db.session.get(ReporteMensual, reporte_id)
+                if reporte is None:
+                    continue
+                ruta = ruta_pdf_reporte(reporte)
+                if os.path.exists(ruta):
+                    # Ya hay artefacto: se copia sin volver a dibujarlo
+                    with open(ruta, 'rb') as f:
+                        agregar(reporte_id, f.read())
+                    yield salida.vaciar()
+                    continue
+                futuro = pool.submit(renderizar_reporte_pdf, datos_reporte_pdf(reporte))
+                pendientes[futuro] = reporte
+                if len(pendientes) >= en_vuelo_max:
+                    break
+            if not pendientes:
+                break
+            
+            listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                reporte = pendientes.pop(futuro)
+                try:
+                    contenido = futuro.result()
+                except Exception as e:
+                    logger.error(f"Error al dibujar el PDF de {reporte.id}: {e}")
+                    errores.append(f'{reporte.id}: {e}')
+                    continue
+                agregar(reporte.id, contenido)
+                try:
+                    guardar_pdf_reporte(reporte, contenido)
+                except OSError as e:
+                    logger.warning(f"No se pudo guardar el PDF de {reporte.id}: {e}")
+                yield salida.vaciar()
+        
+        if errores:
+            archivo_zip.writestr('errores.txt', '\n'.join(errores))
+    yield salida.vaciar()
+
+@app.route('/api/reportes/exportar')
+@login_required
+def api_exportar_reportes():
+    """ZIP con los PDF de los reportes de ?desde=YYYY-MM&hasta=YYYY-MM (por defecto todos)."""
+    desde = request.args.get('desde')
+    hasta = request.args.get('hasta')
+    try:
+        for valor in (desde, hasta):
+            if valor:
+                _parsear_mes(valor)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Los id de ReporteMensual son 'YYYY-MM', así que el orden de texto es el cronológico
+    consulta = db.select(ReporteMensual.id).order_by(ReporteMensual.id)
+    if desde:
+        consulta = consulta.where(ReporteMensual.id >= desde)
+    if hasta:
+        consulta = consulta.where(ReporteMensual.id <= hasta)
+    
+    reporte_ids = db.session.execute(consulta).scalars().all()
+    if not reporte_ids:
+        return jsonify({'success': False, 'error': 'No hay reportes en ese rango'}), 404
+    
+    archivo = f"reportes_{datetime.utcnow().strftime('%Y%m%d')}.zip"
+    return Response(
+        stream_with_context(_zip_reportes(reporte_ids)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={archivo}'}
     )
 
 # ==================== INICIALIZACIÓN ====================
 def init_db():
     with app.app_context():
-        db.create_all()
+        aplicar_migraciones()
+        actualizar_estadisticas()
+        marcar_trabajos_interrumpidos()
+        if db.session.get(ResumenContadores, 1) is None:
+            reconciliar_contadores()
         admin = Usuario.query.filter_by(username='admin').first()
         if not admin:
             admin = Usuario(username='admin', password=generate_password_hash('admin123'),
@@ -1565,6 +3685,16 @@ def init_db():
             logger.info("✅ Admin creado - Usuario: admin, Contraseña: admin123")
 
 if __name__ == '__main__':
+    if MODO_SERVIDOR_IA:
+        # python app.py --servidor-ia: un único proceso carga el modelo y lo comparte con los
+        # workers web que arranquen con SABIRUS_IA_SOCKET apuntando al mismo socket
+        # Por defecto dentro de instance/, no en un directorio compartido como /tmp
+        ruta_socket = RUTA_SOCKET_IA or os.path.join(app.instance_path, 'ia.sock')
+        os.makedirs(os.path.dirname(ruta_socket), mode=0o700, exist_ok=True)
+        logger.info(f"Servidor IA escuchando en {ruta_socket}")
+        ServidorIA(ruta_socket, asistente_ia).serve_forever()
+        sys.exit(0)
+    
     os.makedirs('templates', exist_ok=True)
     os.makedirs('static/uploads', exist_ok=True)
     os.makedirs('modelo', exist_ok=True)
@@ -0,0 +1,487 @@
+"""Benchmark del pipeline de chat de Sabirus Warmi sin el modelo real.
+
+Crea una base SQLite temporal, la llena con datos sintéticos de varios tamaños,
+sustituye llama_cpp.Llama por un modelo falso determinista y mide:
+
+- obtener_contexto_completo y formatear_contexto_texto
+- la agregación del reporte mensual
+- la ida y vuelta completa de /api/chat-ia (SSE) por cada ruta: modelo, caché y directa
+- el comportamiento con varias consultas concurrentes
+- ventas y alquileres simultáneos sobre el mismo producto (sin sobreventa)
+- la ingesta por lotes (/api/lote) frente a un POST /api/ventas por venta
+- la exportación ZIP de reportes en PDF (pool de procesos) frente a dibujarlos uno a uno
+- la lectura de un reporte guardado (con y sin gzip) y su tamaño comprimido frente al JSON
+
+Uso:
+    python benchmark.py --tamanos 100 10000 100000 --salida benchmark_resultados.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+
+from reportes_agregacion import calcular_reporte_mensual, guardar_datos_reporte, leer_datos_reporte, rango_mes
+
+
+class LlamaFalso:
+    """Imita la interfaz de llama_cpp.Llama que usa AsistenteIA, con tiempos deterministas."""
+    tokens_por_segundo = 50.0
+    segundos_por_token_prompt = 0.0002
+    tokens_respuesta = 40
+
+    def __init__(self, model_path=None, **kwargs):
+        self.model_path = model_path
+        self._tokens = []
+
+    def tokenize(self, texto, add_bos=True, special=False):
+        return [hash(p) & 0xFFFF for p in texto.decode('utf-8', 'ignore').split()]
+
+    def reset(self):
+        self._tokens = []
+
+    def eval(self, tokens):
+        time.sleep(len(tokens) * self.segundos_por_token_prompt)
+        self._tokens = self._tokens + list(tokens)
+
+    def save_state(self):
+        return list(self._tokens)
+
+    def load_state(self, estado):
+        self._tokens = list(estado)
+
+    def __call__(self, prompt, max_tokens=200, stream=True, **kwargs):
+        tokens = self.tokenize(prompt.encode('utf-8'))
+        comunes = 0
+        for a, b in zip(self._tokens, tokens):
+            if a != b:
+                break
+            comunes += 1
+        self.eval(tokens[comunes:])
+        self._tokens = tokens
+        for i in range(min(max_tokens, self.tokens_respuesta)):
+            time.sleep(1.0 / self.tokens_por_segundo)
+            yield {'choices': [{'text': f'palabra{i} '}]}
+
+
+def preparar_entorno(directorio):
+    ruta_db = os.path.join(directorio, 'benchmark.db')
+    ruta_modelo = os.path.join(directorio, 'modelo_falso.gguf')
+    open(ruta_modelo, 'w').close()
+
+    os.environ['SABIRUS_DATABASE_URI'] = f'sqlite:///{ruta_db}'
+    os.environ['SABIRUS_MODELO'] = ruta_modelo
+    os.environ['SABIRUS_REPORTES_PDF_DIR'] = os.path.join(directorio, 'reportes')
+    os.environ.pop('SABIRUS_IA_SOCKET', None)
+
+    modulo = types.ModuleType('llama_cpp')
+    modulo.Llama = LlamaFalso
+    sys.modules['llama_cpp'] = modulo
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as aplicacion
+    aplicacion.logger.setLevel('WARNING')
+
+    limite = time.time() + 10
+    while not aplicacion.asistente_ia.esta_listo() and time.time() < limite:
+        time.sleep(0.05)
+    if not aplicacion.asistente_ia.esta_listo():
+        raise RuntimeError(f"El modelo falso no cargó: {aplicacion.asistente_ia.obtener_estado()}")
+    return aplicacion
+
+
+def sembrar(aplicacion, total_ventas, semilla=42):
+    m = aplicacion
+    db = m.db
+    rnd = random.Random(semilla)
+    ahora = datetime.utcnow()
+
+    total_productos = 200
+    total_clientes = max(10, total_ventas // 20)
+    total_alquileres = max(5, total_ventas // 10)
+    tipos = ['vestido', 'poncho', 'sombrero', 'chompa', 'manta', 'pollera']
+    proveedores = ['Textiles Sur', 'Lanas Cusco', 'Artesanías Puno', 'Hilos del Valle']
+
+    with m.app.app_context():
+        db.drop_all()
+        db.session.execute(db.text('PRAGMA user_version = 0'))
+        db.session.commit()
+        m.init_db()
+        usuario_id = m.Usuario.query.filter_by(username='admin').first().id
+
+        db.session.execute(db.insert(m.Producto), [{
+            'id': i,
+            'nombre': f'{rnd.choice(tipos).capitalize()} modelo {i}',
+            'tipo': rnd.choice(tipos),
+            'descripcion': f'Prenda artesanal número {i} tejida a mano',
+            'precio': round(rnd.uniform(10, 300), 2),
+            'precio_alquiler_dia': round(rnd.uniform(2, 30), 2),
+            'disponible_alquiler': rnd.random() < 0.5,
+            'stock': rnd.randint(0, 500),
+            'stock_minimo': 5,
+            'proveedor': rnd.choice(proveedores),
+            'activo': True,
+            'fecha_registro': ahora - timedelta(days=rnd.randint(0, 720))
+        } for i in range(1, total_productos + 1)])
+
+        db.session.execute(db.insert(m.Cliente), [{
+            'id': i,
+            'nombre': f'Cliente {i}',
+            'telefono': f'9{i:08d}',
+            'fecha_registro': ahora - timedelta(days=rnd.randint(0, 720))
+        } for i in range(1, total_clientes + 1)])
+
+        ventas, detalles_venta = [], []
+        for venta_id in range(1, total_ventas + 1):
+            total = 0
+            for _ in range(rnd.randint(1, 3)):
+                cantidad = rnd.randint(1, 4)
+                precio = round(rnd.uniform(10, 300), 2)
+                detalles_venta.append({
+                    'venta_id': venta_id, 'producto_id': rnd.randint(1, total_productos),
+                    'cantidad': cantidad, 'precio_unitario': precio, 'subtotal': cantidad * precio
+                })
+                total += cantidad * precio
+            ventas.append({
+                'id': venta_id, 'cliente_id': rnd.randint(1, total_clientes), 'usuario_id': usuario_id,
+                'total': total, 'fecha': ahora - timedelta(minutes=rnd.randint(0, 365 * 24 * 60)),
+                'metodo_pago': rnd.choice(['efectivo', 'tarjeta', 'transferencia'])
+            })
+        db.session.execute(db.insert(m.Venta), ventas)
+        db.session.execute(db.insert(m.DetalleVenta), detalles_venta)
+
+        alquileres, detalles_alquiler = [], []
+        for alquiler_id in range(1, total_alquileres + 1):
+            inicio = ahora - timedelta(days=rnd.randint(0, 365))
+            dias = rnd.randint(1, 10)
+            cantidad = rnd.randint(1, 2)
+            precio_dia = round(rnd.uniform(2, 30), 2)
+            detalles_alquiler.append({
+                'alquiler_id': alquiler_id, 'producto_id': rnd.randint(1, total_productos),
+                'cantidad': cantidad, 'precio_dia': precio_dia, 'dias': dias,
+                'subtotal': cantidad * precio_dia * dias
+            })
+            alquileres.append({
+                'id': alquiler_id, 'cliente_id': rnd.randint(1, total_clientes), 'usuario_id': usuario_id,
+                'fecha_inicio': inicio, 'fecha_fin': inicio + timedelta(days=dias),
+                'total': cantidad * precio_dia * dias, 'deposito': 0,
+                'estado': 'activo' if rnd.random() < 0.2 else 'finalizado',
+                'metodo_pago': 'efectivo', 'fecha_registro': inicio
+            })
+        db.session.execute(db.insert(m.Alquiler), alquileres)
+        db.session.execute(db.insert(m.DetalleAlquiler), detalles_alquiler)
+        m.version_datos.marcar_cambio(*m.RECURSOS_CONTEXTO)
+        db.session.commit()
+        m.reconciliar_contadores()
+        m.actualizar_estadisticas()
+
+    # drop_all vuelve las versiones a cero: lo que el proceso tenga en caché ya no sirve
+    m.version_datos.olvidar()
+    m.asistente_ia._contexto_cache = None
+    m.indice_productos.reiniciar()
+    m.indice_clientes.reiniciar()
+    return {
+        'productos': total_productos, 'clientes': total_clientes, 'ventas': total_ventas,
+        'detalles_venta': len(detalles_venta), 'alquileres': total_alquileres
+    }
+
+
+def resumir(tiempos):
+    tiempos = sorted(tiempos)
+    return {
+        'n': len(tiempos),
+        'media': round(statistics.mean(tiempos), 5),
+        'p50': round(tiempos[len(tiempos) // 2], 5),
+        'p90': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.9))], 5),
+        'max': round(tiempos[-1], 5)
+    }
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return resumir(tiempos)
+
+
+def cliente_autenticado(aplicacion):
+    cliente = aplicacion.app.test_client()
+    cliente.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    return cliente
+
+
+def consulta_sse(cliente, pregunta):
+    inicio = time.perf_counter()
+    respuesta = cliente.post('/api/chat-ia', json={'pregunta': pregunta}, buffered=False)
+    primer_chunk = None
+    chunks = 0
+    for linea in respuesta.response:
+        if b'"chunk"' in linea:
+            chunks += 1
+            if primer_chunk is None:
+                primer_chunk = time.perf_counter() - inicio
+    respuesta.close()
+    return {
+        'estado_http': respuesta.status_code,
+        'primer_chunk': primer_chunk,
+        'total': time.perf_counter() - inicio,
+        'chunks': chunks
+    }
+
+
+def medir_chat(aplicacion, repeticiones):
+    cliente = cliente_autenticado(aplicacion)
+    resultados = {}
+
+    modelo = [consulta_sse(cliente, f'¿Qué me recomiendas para la temporada {i}?') for i in range(repeticiones)]
+    cache = [consulta_sse(cliente, '¿Qué me recomiendas para la temporada 0?') for _ in range(repeticiones)]
+    directa = [consulta_sse(cliente, '¿Cuántas ventas hoy?') for _ in range(repeticiones)]
+
+    for nombre, medidas in (('modelo', modelo), ('cache', cache), ('directa', directa)):
+        resultados[nombre] = {
+            'primer_chunk': resumir([r['primer_chunk'] or r['total'] for r in medidas]),
+            'total': resumir([r['total'] for r in medidas])
+        }
+    return resultados
+
+
+def medir_concurrencia(aplicacion, hilos):
+    resultados = []
+    lock = threading.Lock()
+
+    def trabajador(i):
+        cliente = cliente_autenticado(aplicacion)
+        resultado = consulta_sse(cliente, f'Pregunta abierta concurrente número {i}')
+        with lock:
+            resultados.append(resultado)
+
+    inicio = time.perf_counter()
+    trabajadores = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    duracion = time.perf_counter() - inicio
+
+    atendidas = [r for r in resultados if r['estado_http'] == 200]
+    return {
+        'hilos': hilos,
+        'duracion': round(duracion, 4),
+        'atendidas': len(atendidas),
+        'rechazadas_503': sum(1 for r in resultados if r['estado_http'] == 503),
+        'consultas_por_segundo': round(len(atendidas) / duracion, 3) if duracion else None,
+        'total': resumir([r['total'] for r in atendidas]) if atendidas else None
+    }
+
+
+def medir_reserva_stock(aplicacion, hilos, stock_inicial=10):
+    """Varias cajas compran a la vez el mismo producto con menos unidades que compradores.
+
+    Con la reserva condicional nunca se venden más unidades que las que había.
+    """
+    with aplicacion.app.app_context():
+        producto = aplicacion.Producto.query.filter_by(disponible_alquiler=True).first()
+        producto.stock = stock_inicial
+        aplicacion.db.session.commit()
+        producto_id = producto.id
+        cliente_id = aplicacion.Cliente.query.first().id
+
+    resultados = []
+    lock = threading.Lock()
+    barrera = threading.Barrier(hilos)
+
+    def trabajador(i):
+        cliente = cliente_autenticado(aplicacion)
+        carrito = [{'producto_id': producto_id, 'cantidad': 1}]
+        barrera.wait()
+        if i % 2:
+            respuesta = cliente.post('/api/alquileres', json={
+                'cliente_id': cliente_id, 'metodo_pago': 'efectivo',
+                'fecha_inicio': '2024-01-01', 'fecha_fin': '2024-01-03', 'productos': carrito
+            })
+        else:
+            respuesta = cliente.post('/api/ventas', json={
+                'cliente_id': cliente_id, 'metodo_pago': 'efectivo', 'productos': carrito
+            })
+        with lock:
+            resultados.append(respuesta.get_json())
+
+    inicio = time.perf_counter()
+    trabajadores = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    duracion = time.perf_counter() - inicio
+
+    with aplicacion.app.app_context():
+        stock_final = aplicacion.db.session.get(aplicacion.Producto, producto_id).stock
+
+    exitosas = sum(1 for r in resultados if r.get('success'))
+    sin_stock = sum(1 for r in resultados if not r.get('success') and 'Stock insuficiente' in r.get('error', ''))
+    return {
+        'hilos': hilos,
+        'stock_inicial': stock_inicial,
+        'stock_final': stock_final,
+        'exitosas': exitosas,
+        'rechazadas_sin_stock': sin_stock,
+        'errores': len(resultados) - exitosas - sin_stock,
+        'sin_sobreventa': stock_final >= 0 and exitosas == stock_inicial - stock_final,
+        'duracion': round(duracion, 4)
+    }
+
+
+def medir_lote(aplicacion, cantidad):
+    """Registra las mismas ventas una a una por POST /api/ventas y luego en un único POST /api/lote."""
+    with aplicacion.app.app_context():
+        aplicacion.Producto.query.update({'stock': 1_000_000})
+        aplicacion.db.session.commit()
+        ids_productos = [p.id for p in aplicacion.Producto.query.limit(20)]
+        ids_clientes = [c.id for c in aplicacion.Cliente.query.limit(20)]
+
+    rnd = random.Random(7)
+    ventas = [{
+        'cliente_id': rnd.choice(ids_clientes),
+        'metodo_pago': 'efectivo',
+        'productos': [{'producto_id': pid, 'cantidad': rnd.randint(1, 3)} for pid in rnd.sample(ids_productos, 3)]
+    } for _ in range(cantidad)]
+    cliente = cliente_autenticado(aplicacion)
+
+    inicio = time.perf_counter()
+    individuales = sum(1 for venta in ventas if cliente.post('/api/ventas', json=venta).get_json().get('success'))
+    duracion_individual = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    respuesta = cliente.post('/api/lote', json={'ventas': ventas}).get_json()
+    duracion_lote = time.perf_counter() - inicio
+
+    return {
+        'ventas': cantidad,
+        'individual': {'registradas': individuales, 'duracion': round(duracion_individual, 4),
+                       'ventas_por_segundo': round(cantidad / duracion_individual, 1)},
+        'lote': {'registradas': respuesta.get('registradas'), 'duracion': round(duracion_lote, 4),
+                 'ventas_por_segundo': round(cantidad / duracion_lote, 1)},
+        'aceleracion': round(duracion_individual / duracion_lote, 1)
+    }
+
+
+def medir_exportacion_reportes(aplicacion, cantidad):
+    """Dibuja los PDF de `cantidad` reportes uno a uno y luego los exporta en un ZIP por /api/reportes/exportar."""
+    m = aplicacion
+    with m.app.app_context():
+        datos_mes = calcular_reporte_mensual(m.db.session, *rango_mes(datetime.utcnow()))
+        m.ReporteMensual.query.delete()
+        for i in range(cantidad):
+            reporte = m.ReporteMensual(id=f'{2000 + i // 12}-{i % 12 + 1:02d}', mes=f'Mes {i}')
+            guardar_datos_reporte(reporte, datos_mes)
+            m.db.session.add(reporte)
+        m.db.session.commit()
+        datos = [m.datos_reporte_pdf(r) for r in m.ReporteMensual.query]
+
+    inicio = time.perf_counter()
+    for d in datos:
+        m.renderizar_reporte_pdf(d)
+    duracion_serial = time.perf_counter() - inicio
+
+    if os.path.isdir(m.REPORTES_PDF_DIR):
+        for nombre in os.listdir(m.REPORTES_PDF_DIR):
+            os.remove(os.path.join(m.REPORTES_PDF_DIR, nombre))
+    cliente = cliente_autenticado(aplicacion)
+    inicio = time.perf_counter()
+    respuesta = cliente.get('/api/reportes/exportar')
+    bytes_zip = sum(len(trozo) for trozo in respuesta.response)
+    duracion_zip = time.perf_counter() - inicio
+
+    return {
+        'reportes': cantidad,
+        'procesos': m.PROCESOS_PDF,
+        'serial': round(duracion_serial, 4),
+        'zip': round(duracion_zip, 4),
+        'bytes_zip': bytes_zip,
+        'aceleracion': round(duracion_serial / duracion_zip, 1)
+    }
+
+
+def medir_lectura_reporte(aplicacion, repeticiones):
+    """Lee un reporte guardado por /api/reportes/<id> con y sin Accept-Encoding: gzip."""
+    with aplicacion.app.app_context():
+        reporte = aplicacion.ReporteMensual.query.first()
+        reporte_id = reporte.id
+        bytes_contenido = len(reporte.contenido)
+        bytes_json = len(json.dumps(leer_datos_reporte(reporte)))
+    cliente = cliente_autenticado(aplicacion)
+    return {
+        'bytes_json': bytes_json,
+        'bytes_contenido': bytes_contenido,
+        'sin_gzip': medir(lambda: cliente.get(f'/api/reportes/{reporte_id}'), repeticiones),
+        'gzip': medir(lambda: cliente.get(f'/api/reportes/{reporte_id}', headers={'Accept-Encoding': 'gzip'}),
+                      repeticiones)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[100, 10000, 100000],
+                        help='cantidades de ventas sintéticas a sembrar')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--hilos', type=int, default=8, help='consultas concurrentes')
+    parser.add_argument('--tokens-por-segundo', type=float, default=50.0,
+                        help='velocidad de generación del modelo falso')
+    parser.add_argument('--lote', type=int, default=500, help='ventas por lote en la prueba de ingesta')
+    parser.add_argument('--reportes', type=int, default=48, help='reportes en la prueba de exportación ZIP')
+    parser.add_argument('--salida', default='benchmark_resultados.json')
+    args = parser.parse_args()
+
+    LlamaFalso.tokens_por_segundo = args.tokens_por_segundo
+
+    with tempfile.TemporaryDirectory() as directorio:
+        aplicacion = preparar_entorno(directorio)
+        asistente = aplicacion.asistente_ia
+        resultados = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'parametros': vars(args),
+            'tamanos': []
+        }
+
+        for tamano in args.tamanos:
+            print(f"Sembrando {tamano} ventas...", flush=True)
+            inicio = time.perf_counter()
+            conteos = sembrar(aplicacion, tamano)
+            asistente.metricas = aplicacion.MetricasIA()
+            resultado = {'conteos': conteos, 'siembra': round(time.perf_counter() - inicio, 3)}
+
+            with aplicacion.app.app_context():
+                contexto = asistente.obtener_contexto_completo()
+                resultado['obtener_contexto_completo'] = medir(asistente.obtener_contexto_completo, args.repeticiones)
+                resultado['formatear_contexto_texto'] = medir(
+                    lambda: asistente.formatear_contexto_texto(contexto), args.repeticiones)
+                resultado['longitud_contexto_texto'] = len(asistente.formatear_contexto_texto(contexto))
+                mes_actual = rango_mes(datetime.utcnow())
+                resultado['calcular_reporte_mensual'] = medir(
+                    lambda: calcular_reporte_mensual(aplicacion.db.session, *mes_actual), args.repeticiones)
+
+            resultado['chat_sse'] = medir_chat(aplicacion, args.repeticiones)
+            resultado['concurrencia'] = medir_concurrencia(aplicacion, args.hilos)
+            resultado['reserva_stock'] = medir_reserva_stock(aplicacion, max(args.hilos, 2) * 4)
+            resultado['lote'] = medir_lote(aplicacion, args.lote)
+            resultado['exportacion_reportes'] = medir_exportacion_reportes(aplicacion, args.reportes)
+            resultado['lectura_reporte'] = medir_lectura_reporte(aplicacion, args.repeticiones)
+            resultado['metricas_ia'] = asistente.metricas.resumen()
+            resultados['tamanos'].append(resultado)
+            print(json.dumps({k: v for k, v in resultado.items() if k != 'metricas_ia'}, indent=2), flush=True)
+
+    with open(args.salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Agregación y empaquetado de los reportes mensuales.
+
+Módulo sin efectos al importarse, como reportes_pdf: no crea la app ni la base. Las consultas
+usan tablas ligeras de SQLAlchemy Core con solo las columnas que leen y reciben la sesión en
+la que ejecutarse, así que app.py, benchmark.py y las pruebas comparten el mismo cálculo.
+"""
+import gzip
+import json
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, column, desc, func, select, table
+
+producto = table(
+    'producto',
+    column('id', Integer), column('nombre', String), column('tipo', String), column('proveedor', String),
+    column('stock', Integer), column('stock_minimo', Integer), column('activo', Boolean)
+)
+cliente = table(
+    'cliente',
+    column('id', Integer), column('nombre', String), column('telefono', String), column('email', String),
+    column('fecha_registro', DateTime)
+)
+venta = table(
+    'venta',
+    column('id', Integer), column('cliente_id', Integer), column('total', Float), column('fecha', DateTime),
+    column('metodo_pago', String)
+)
+detalle_venta = table(
+    'detalle_venta',
+    column('id', Integer), column('venta_id', Integer), column('producto_id', Integer), column('cantidad', Integer),
+    column('subtotal', Float)
+)
+alquiler = table(
+    'alquiler',
+    column('id', Integer), column('cliente_id', Integer), column('total', Float), column('estado', String),
+    column('fecha_inicio', DateTime), column('fecha_fin', DateTime), column('fecha_registro', DateTime)
+)
+detalle_alquiler = table(
+    'detalle_alquiler',
+    column('id', Integer), column('alquiler_id', Integer), column('producto_id', Integer), column('cantidad', Integer)
+)
+
+# Un número fijo de consultas agrupadas por mes, sin importar cuántos productos o ventas haya.
+def rango_mes(fecha):
+    inicio = fecha.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if inicio.month == 12:
+        return inicio, inicio.replace(year=inicio.year + 1, month=1)
+    return inicio, inicio.replace(month=inicio.month + 1)
+
+def calcular_reporte_mensual(sesion, inicio_mes, fin_mes):
+    """Devuelve los totales y las secciones del reporte de [inicio_mes, fin_mes)."""
+    en_mes_venta = (venta.c.fecha >= inicio_mes, venta.c.fecha < fin_mes)
+    en_mes_alquiler = (alquiler.c.fecha_registro >= inicio_mes, alquiler.c.fecha_registro < fin_mes)
+    ventas_detalladas = detalle_venta.join(venta, venta.c.id == detalle_venta.c.venta_id)
+
+    # Una sola lectura de las ventas del mes (solo las columnas necesarias) alimenta los
+    # totales y los desgloses por día y por método de pago
+    total_ventas, total_ingresos = 0, 0
+    ventas_por_dia, ventas_por_metodo = {}, {}
+    for fecha, total, metodo in sesion.execute(
+        select(venta.c.fecha, venta.c.total, venta.c.metodo_pago)
+        .where(*en_mes_venta).order_by(venta.c.fecha, venta.c.id)
+    ):
+        total_ventas += 1
+        total_ingresos += total
+        dia = ventas_por_dia.setdefault(fecha.strftime('%d/%m'), {'cantidad': 0, 'total': 0})
+        dia['cantidad'] += 1
+        dia['total'] += total
+        por_metodo = ventas_por_metodo.setdefault(metodo, {'cantidad': 0, 'total': 0})
+        por_metodo['cantidad'] += 1
+        por_metodo['total'] += total
+
+    total_alquileres, ingresos_alquileres = 0, 0
+    alquileres_activos = []
+    for total, estado, nombre_cliente, fecha_inicio, fecha_fin in sesion.execute(
+        select(alquiler.c.total, alquiler.c.estado, cliente.c.nombre, alquiler.c.fecha_inicio, alquiler.c.fecha_fin)
+        .select_from(alquiler.join(cliente, cliente.c.id == alquiler.c.cliente_id))
+        .where(*en_mes_alquiler).order_by(alquiler.c.fecha_registro, alquiler.c.id)
+    ):
+        total_alquileres += 1
+        ingresos_alquileres += total
+        if estado == 'activo':
+            alquileres_activos.append({
+                'cliente': nombre_cliente,
+                'total': total,
+                'fecha_inicio': fecha_inicio.strftime('%d/%m/%Y'),
+                'fecha_fin': fecha_fin.strftime('%d/%m/%Y')
+            })
+
+    productos_mes = sesion.execute(
+        select(
+            producto.c.nombre,
+            producto.c.tipo,
+            producto.c.proveedor,
+            func.sum(detalle_venta.c.cantidad).label('total')
+        ).select_from(producto.join(ventas_detalladas, detalle_venta.c.producto_id == producto.c.id))
+        .where(*en_mes_venta).group_by(producto.c.id).order_by(desc('total')).limit(10)
+    ).all()
+    productos = [{'nombre': p[0], 'tipo': p[1], 'proveedor': p[2], 'cantidad': int(p[3])} for p in productos_mes]
+
+    productos_alquilados = sesion.execute(
+        select(
+            producto.c.nombre,
+            producto.c.tipo,
+            func.sum(detalle_alquiler.c.cantidad).label('total')
+        ).select_from(
+            producto.join(detalle_alquiler, detalle_alquiler.c.producto_id == producto.c.id)
+            .join(alquiler, alquiler.c.id == detalle_alquiler.c.alquiler_id)
+        ).where(*en_mes_alquiler).group_by(producto.c.id).order_by(desc('total')).limit(10)
+    ).all()
+
+    clientes_mes = sesion.execute(
+        select(
+            cliente.c.nombre,
+            func.count(venta.c.id).label('compras'),
+            func.sum(venta.c.total).label('gastado')
+        ).select_from(cliente.join(venta, venta.c.cliente_id == cliente.c.id))
+        .where(*en_mes_venta).group_by(cliente.c.id).order_by(desc('compras')).limit(10)
+    ).all()
+
+    clientes_nuevos = sesion.execute(
+        select(cliente.c.nombre, cliente.c.fecha_registro, cliente.c.telefono, cliente.c.email)
+        .where(cliente.c.fecha_registro >= inicio_mes, cliente.c.fecha_registro < fin_mes)
+        .order_by(cliente.c.fecha_registro, cliente.c.id)
+    ).all()
+
+    # Antes era una consulta SUM por cada producto activo; ahora una agrupada para todos
+    stock_bajo = sesion.execute(
+        select(
+            producto.c.nombre,
+            producto.c.tipo,
+            producto.c.stock,
+            producto.c.stock_minimo,
+            func.sum(detalle_venta.c.cantidad)
+        ).select_from(producto.join(ventas_detalladas, detalle_venta.c.producto_id == producto.c.id)).where(
+            *en_mes_venta,
+            producto.c.activo == True,
+            producto.c.stock <= producto.c.stock_minimo
+        ).group_by(producto.c.id).having(func.sum(detalle_venta.c.cantidad) > 0).order_by(producto.c.id)
+    ).all()
+
+    ventas_por_tipo = sesion.execute(
+        select(
+            producto.c.tipo,
+            func.sum(detalle_venta.c.cantidad).label('cantidad'),
+            func.sum(detalle_venta.c.subtotal).label('total')
+        ).select_from(producto.join(ventas_detalladas, detalle_venta.c.producto_id == producto.c.id))
+        .where(*en_mes_venta).group_by(producto.c.tipo)
+    ).all()
+
+    return {
+        'total_ventas': total_ventas,
+        'total_ingresos': total_ingresos,
+        'promedio_venta': (total_ingresos / total_ventas) if total_ventas > 0 else 0,
+        'total_alquileres': total_alquileres,
+        'ingresos_alquileres': ingresos_alquileres,
+        'productos_mas_vendidos': productos,
+        'clientes_frecuentes': [{'nombre': c[0], 'compras': c[1], 'gastado': float(c[2])} for c in clientes_mes],
+        'clientes_nuevos': [{
+            'nombre': nombre,
+            'fecha_registro': fecha_registro.strftime('%d/%m/%Y'),
+            'telefono': telefono or 'N/A',
+            'email': email or 'N/A'
+        } for nombre, fecha_registro, telefono, email in clientes_nuevos],
+        'productos_stock_bajo': [{
+            'nombre': nombre,
+            'tipo': tipo,
+            'stock_actual': stock,
+            'stock_minimo': stock_minimo,
+            'veces_vendido': int(vendido)
+        } for nombre, tipo, stock, stock_minimo, vendido in stock_bajo],
+        'ventas_por_dia': [
+            {'dia': dia, 'cantidad': datos['cantidad'], 'total': datos['total']}
+            for dia, datos in sorted(ventas_por_dia.items())
+        ],
+        'ventas_por_metodo_pago': [
+            {'metodo': metodo, 'cantidad': datos['cantidad'], 'total': datos['total']}
+            for metodo, datos in ventas_por_metodo.items()
+        ],
+        'productos_mas_reabastecidos': productos[:5],
+        'ventas_por_tipo_producto': [
+            {'tipo': t[0], 'cantidad': int(t[1]), 'total': float(t[2])} for t in ventas_por_tipo
+        ],
+        'alquileres_activos': alquileres_activos,
+        'productos_mas_alquilados': [
+            {'nombre': p[0], 'tipo': p[1], 'cantidad': int(p[2])} for p in productos_alquilados
+        ]
+    }
+
+TOTALES_REPORTE = ('total_ventas', 'total_ingresos', 'promedio_venta', 'total_alquileres', 'ingresos_alquileres')
+
+def empaquetar_reporte(reporte, secciones):
+    # Se guarda el cuerpo exacto de /api/reportes/<id>: leerlo no requiere parsear ni volver a serializar
+    datos = {
+        'id': reporte.id,
+        'mes': reporte.mes,
+        **{campo: getattr(reporte, campo) for campo in TOTALES_REPORTE},
+        **secciones,
+        'fecha_generacion': reporte.fecha_generacion.strftime('%d/%m/%Y')
+    }
+    reporte.contenido = gzip.compress(json.dumps(datos, ensure_ascii=False).encode('utf-8'), mtime=0)
+
+def guardar_datos_reporte(reporte, datos):
+    """Copia a reporte los totales de calcular_reporte_mensual y empaqueta sus secciones."""
+    for campo in TOTALES_REPORTE:
+        setattr(reporte, campo, datos[campo])
+    reporte.fecha_generacion = datetime.utcnow()
+    empaquetar_reporte(reporte, {clave: valor for clave, valor in datos.items() if clave not in TOTALES_REPORTE})
+
+def leer_datos_reporte(reporte):
+    return json.loads(gzip.decompress(reporte.contenido))
@@ -0,0 +1,155 @@
+"""Renderizado del PDF de los reportes mensuales.
+
+Módulo sin efectos al importarse (no crea la app, la base ni el asistente IA), para que los
+procesos del pool de exportación puedan cargarlo y dibujar reportes a partir de datos simples.
+"""
+import os
+from types import SimpleNamespace
+
+try:
+    from fpdf import FPDF
+except ImportError:
+    print("FPDF no está instalado. Instalando...")
+    os.system("pip install fpdf2")
+    from fpdf import FPDF
+
+
+class PDF(FPDF):
+    def __init__(self):
+        super().__init__()
+        self.set_auto_page_break(auto=True, margin=15)
+        
+    def header(self):
+        self.set_font('Arial', 'B', 16)
+        self.cell(0, 10, 'SABIRUS WARMI', 0, 1, 'C')
+        self.set_font('Arial', 'I', 10)
+        self.cell(0, 5, 'Reporte Mensual Completo', 0, 1, 'C')
+        self.ln(5)
+        
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
+        
+    def chapter_title(self, title):
+        self.set_font('Arial', 'B', 12)
+        self.set_fill_color(240, 240, 240)
+        self.cell(0, 8, title, 0, 1, 'L', True)
+        self.ln(2)
+        
+    def chapter_body(self, body):
+        self.set_font('Arial', '', 10)
+        self.multi_cell(0, 5, body)
+        self.ln()
+
+def renderizar_reporte_pdf(datos):
+    """Recibe el contenido de un ReporteMensual como dict y devuelve los bytes del PDF."""
+    reporte = SimpleNamespace(**datos)
+    pdf = PDF()
+    pdf.add_page()
+    
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, f'Mes: {reporte.mes}', 0, 1)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 8, f'Fecha de generacion: {reporte.fecha_generacion.strftime("%d/%m/%Y %H:%M")}', 0, 1)
+    pdf.ln(5)
+    
+    pdf.chapter_title('RESUMEN GENERAL')
+    resumen = f'''Ventas: {reporte.total_ventas} ($ {reporte.total_ingresos:.2f})
+Promedio por Venta: $ {reporte.promedio_venta:.2f}
+Alquileres: {reporte.total_alquileres} ($ {reporte.ingresos_alquileres:.2f})'''
+    pdf.chapter_body(resumen)
+    
+    productos = reporte.productos_mas_vendidos
+    if productos:
+        pdf.chapter_title('PRODUCTOS MAS VENDIDOS')
+        texto_productos = ''
+        for i, p in enumerate(productos, 1):
+            texto_productos += f"{i}. {p['nombre']} ({p['tipo']})\n"
+            texto_productos += f"   Proveedor: {p.get('proveedor', 'No especificado')}\n"
+            texto_productos += f"   Cantidad: {p['cantidad']} unidades\n\n"
+        pdf.chapter_body(texto_productos)
+    
+    productos_alquilados = reporte.productos_mas_alquilados
+    if productos_alquilados:
+        pdf.chapter_title('PRODUCTOS MAS ALQUILADOS')
+        texto_alq = ''
+        for i, p in enumerate(productos_alquilados, 1):
+            texto_alq += f"{i}. {p['nombre']} ({p['tipo']}): {p['cantidad']} veces\n"
+        pdf.chapter_body(texto_alq)
+    
+    alquileres_activos = reporte.alquileres_activos
+    if alquileres_activos:
+        pdf.chapter_title(f'ALQUILERES ACTIVOS ({len(alquileres_activos)})')
+        texto_activos = ''
+        for i, a in enumerate(alquileres_activos, 1):
+            texto_activos += f"{i}. {a['cliente']} - $ {a['total']:.2f}\n"
+            texto_activos += f"   {a['fecha_inicio']} a {a['fecha_fin']}\n\n"
+        pdf.chapter_body(texto_activos)
+    
+    clientes = reporte.clientes_frecuentes
+    if clientes:
+        pdf.chapter_title('CLIENTES FRECUENTES DEL MES')
+        texto_clientes = ''
+        for i, c in enumerate(clientes, 1):
+            texto_clientes += f"{i}. {c['nombre']}: {c['compras']} compras - $ {c['gastado']:.2f}\n"
+        pdf.chapter_body(texto_clientes)
+    
+    clientes_nuevos = reporte.clientes_nuevos
+    if clientes_nuevos:
+        pdf.chapter_title(f'NUEVOS CLIENTES REGISTRADOS ({len(clientes_nuevos)})')
+        texto_nuevos = ''
+        for i, c in enumerate(clientes_nuevos, 1):
+            texto_nuevos += f"{i}. {c['nombre']} - Registrado: {c['fecha_registro']}\n"
+            texto_nuevos += f"   Telefono: {c['telefono']} | Email: {c['email']}\n\n"
+        pdf.chapter_body(texto_nuevos)
+    
+    productos_stock_bajo = reporte.productos_stock_bajo
+    if productos_stock_bajo:
+        pdf.chapter_title(f'PRODUCTOS CON STOCK BAJO ({len(productos_stock_bajo)})')
+        texto_stock = ''
+        for i, p in enumerate(productos_stock_bajo, 1):
+            texto_stock += f"{i}. {p['nombre']} ({p['tipo']})\n"
+            texto_stock += f"   Stock actual: {p['stock_actual']} | Minimo: {p['stock_minimo']}\n"
+            texto_stock += f"   Veces vendido este mes: {p['veces_vendido']}\n\n"
+        pdf.chapter_body(texto_stock)
+    
+    ventas_por_dia = reporte.ventas_por_dia
+    if ventas_por_dia:
+        pdf.chapter_title('VENTAS POR DIA DEL MES')
+        texto_dias = ''
+        for v in ventas_por_dia:
+            texto_dias += f"{v['dia']}: {v['cantidad']} ventas - $ {v['total']:.2f}\n"
+        pdf.chapter_body(texto_dias)
+    
+    ventas_por_metodo = reporte.ventas_por_metodo_pago
+    if ventas_por_metodo:
+        pdf.chapter_title('VENTAS POR METODO DE PAGO')
+        texto_metodos = ''
+        for v in ventas_por_metodo:
+            texto_metodos += f"{v['metodo']}: {v['cantidad']} ventas - $ {v['total']:.2f}\n"
+        pdf.chapter_body(texto_metodos)
+    
+    productos_reabastecidos = reporte.productos_mas_reabastecidos
+    if productos_reabastecidos:
+        pdf.chapter_title('PRODUCTOS CON MAYOR DEMANDA')
+        pdf.set_font('Arial', '', 9)
+        pdf.multi_cell(0, 5, 'Estos productos requieren reabastecimiento frecuente')
+        pdf.ln(2)
+        pdf.set_font('Arial', '', 10)
+        texto_demanda = ''
+        for i, p in enumerate(productos_reabastecidos, 1):
+            texto_demanda += f"{i}. {p['nombre']} ({p['tipo']})\n"
+            texto_demanda += f"   Proveedor: {p.get('proveedor', 'No especificado')}\n"
+            texto_demanda += f"   Cantidad: {p['cantidad']} unidades\n\n"
+        pdf.chapter_body(texto_demanda)
+    
+    ventas_por_tipo = reporte.ventas_por_tipo_producto
+    if ventas_por_tipo:
+        pdf.chapter_title('VENTAS POR CATEGORIA')
+        texto_categorias = ''
+        for v in ventas_por_tipo:
+            texto_categorias += f"{v['tipo'].capitalize()}: {v['cantidad']} unidades - $ {v['total']:.2f}\n"
+        pdf.chapter_body(texto_categorias)
+    
+    return bytes(pdf.output())
@@ -0,0 +1,2156 @@
+let currentView = 'dashboard';
+let data = { productos: [], clientes: [], ventas: [], alquileres: [], carrito: [], ventasResumen: { grupos: [], tipos: [] }, alquileresResumen: { grupos: [], tipos: [] } };
+let gruposVisibles = { venta: [], alquiler: [] };
+let isInitialized = false;
+let filtroActual = 'todos';
+let clienteSeleccionado = null;
+let productoSeleccionado = null;
+
+// Última respuesta de cada GET con ETag: si el servidor responde 304 se reutiliza sin volver a descargarla
+const respuestasConEtag = new Map();
+
+async function request(url, options = {}) {
+    try {
+        const esGet = !options.method || options.method.toUpperCase() === 'GET';
+        const previa = esGet ? respuestasConEtag.get(url) : null;
+        const headers = { 'Content-Type': 'application/json', ...(previa ? { 'If-None-Match': previa.etag } : {}), ...options.headers };
+        const res = await fetch(url, { ...options, headers });
+        if (res.status === 304 && previa) return previa.datos;
+        
+        const datos = await res.json();
+        const etag = res.headers.get('ETag');
+        if (esGet && res.ok && etag) respuestasConEtag.set(url, { etag, datos });
+        return datos;
+    } catch (error) {
+        console.error('Error en request:', error);
+        return { success: false, error: error.message };
+    }
+}
+
+async function showView(view, element) {
+    currentView = view;
+    
+    document.querySelectorAll('.nav-link').forEach(l => l.classList.remove('active'));
+    
+    if (element) {
+        element.classList.add('active');
+    } else {
+        const linkElement = document.querySelector(`[data-view="${view}"]`);
+        if (linkElement) {
+            linkElement.classList.add('active');
+        }
+    }
+    
+    const titles = { 
+        dashboard: 'Panel Principal', 
+        productos: 'Productos', 
+        ventas: 'Ventas', 
+        alquileres: 'Alquileres',
+        clientes: 'Clientes', 
+        reportes: 'Reportes'
+    };
+    document.getElementById('pageTitle').textContent = titles[view] || 'Panel Principal';
+    
+    if (view === 'dashboard') await renderDashboard();
+    else if (view === 'productos') await renderProductos();
+    else if (view === 'ventas') await renderVentas();
+    else if (view === 'alquileres') await renderAlquileres();
+    else if (view === 'clientes') await renderClientes();
+    else if (view === 'reportes') await renderReportes();
+}
+
+async function renderDashboard() {
+    const d = await request('/api/dashboard');
+    
+    // Separar productos con stock 0 y stock bajo
+    const productosAgotados = d.productos_bajo_stock.filter(p => p.stock === 0);
+    const productosStockBajo = d.productos_bajo_stock.filter(p => p.stock > 0);
+    
+    document.getElementById('mainContent').innerHTML = `
+        <div class="stats-grid">
+            <div class="stat-card blue">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <path d="M21 16V8a2 2 0 0 0-1-1.73l-7-4a2 2 0 0 0-2 0l-7 4A2 2 0 0 0 3 8v8a2 2 0 0 0 1 1.73l7 4a2 2 0 0 0 2 0l7-4A2 2 0 0 0 21 16z"/>
+                    </svg>
+                </div>
+                <div class="stat-value">${d.total_productos}</div>
+                <div class="stat-label">Productos</div>
+            </div>
+            <div class="stat-card green">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <path d="M17 21v-2a4 4 0 0 0-4-4H5a4 4 0 0 0-4 4v2"/>
+                        <circle cx="9" cy="7" r="4"/>
+                        <path d="M23 21v-2a4 4 0 0 0-3-3.87"/>
+                        <path d="M16 3.13a4 4 0 0 1 0 7.75"/>
+                    </svg>
+                </div>
+                <div class="stat-value">${d.total_clientes}</div>
+                <div class="stat-label">Clientes</div>
+            </div>
+            <div class="stat-card orange">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <circle cx="12" cy="12" r="10"/>
+                        <path d="M12 6v6l4 2"/>
+                    </svg>
+                </div>
+                <div class="stat-value">${d.total_ventas}</div>
+                <div class="stat-label">Ventas</div>
+            </div>
+            <div class="stat-card purple">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <path d="M3 9l9-7 9 7v11a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2z"/>
+                        <polyline points="9 22 9 12 15 12 15 22"/>
+                    </svg>
+                </div>
+                <div class="stat-value">${d.total_alquileres}</div>
+                <div class="stat-label">Alquileres</div>
+            </div>
+            <div class="stat-card red">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <line x1="12" y1="1" x2="12" y2="23"/>
+                        <path d="M17 5H9.5a3.5 3.5 0 0 0 0 7h5a3.5 3.5 0 0 1 0 7H6"/>
+                    </svg>
+                </div>
+                <div class="stat-value">$ ${d.total_vendido_hoy.toFixed(2)}</div>
+                <div class="stat-label">Vendido Hoy</div>
+            </div>
+        </div>
+        
+        ${productosAgotados.length > 0 ? `
+            <div class="alert" style="background:#ffebee; color:#c62828; border-color:#d32f2f">
+                <div style="display:flex; align-items:center; gap:10px; margin-bottom:10px">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="#c62828" stroke-width="2">
+                        <circle cx="12" cy="12" r="10"/>
+                        <line x1="12" y1="8" x2="12" y2="12"/>
+                        <line x1="12" y1="16" x2="12.01" y2="16"/>
+                    </svg>
+                    <strong style="font-size:16px">⚠️ PRODUCTOS AGOTADOS (${productosAgotados.length})</strong>
+                </div>
+                <div style="background:#fff; padding:15px; border-radius:8px; margin-top:10px">
+                    ${productosAgotados.map(p => `
+                        <div style="display:flex; justify-content:space-between; align-items:center; padding:8px 0; border-bottom:1px solid #ffcdd2">
+                            <div>
+                                <strong style="color:#c62828">${p.nombre}</strong>
+                                <span class="badge badge-danger" style="margin-left:8px">STOCK: 0</span>
+                            </div>
+                            <button class="btn btn-primary" style="padding:6px 12px; font-size:13px" onclick="showView('productos', document.querySelector('[data-view=productos]'))">
+                                Reabastecer
+                            </button>
+                        </div>
+                    `).join('')}
+                </div>
+            </div>
+        ` : ''}
+        
+        ${productosStockBajo.length > 0 ? `
+            <div class="alert alert-warning">
+                <strong>⚠️ Stock bajo:</strong> ${productosStockBajo.map(p => `${p.nombre} (${p.stock})`).join(', ')}
+            </div>
+        ` : ''}
+        
+        <div class="grid-2">
+            <div class="card">
+                <h3>Ventas Recientes</h3>
+                ${d.ventas_recientes.map(v => `<p>🛒 ${v.cliente} - $ ${v.total.toFixed(2)} (${v.fecha})</p>`).join('') || '<p>No hay ventas</p>'}
+            </div>
+            <div class="card">
+                <h3>Alquileres Recientes</h3>
+                ${d.alquileres_recientes && d.alquileres_recientes.length > 0 ? d.alquileres_recientes.map(a => `
+                    <p>🏠 ${a.cliente} - $ ${a.total.toFixed(2)} 
+                    <br><small style="color:#666">${a.fecha_inicio} → ${a.fecha_fin} | <span class="badge ${a.estado === 'activo' ? 'badge-success' : 'badge-info'}">${a.estado}</span></small></p>
+                `).join('') : '<p>No hay alquileres</p>'}
+            </div>
+        </div>
+        <div class="card">
+            <h3>Acceso Rápido</h3>
+            <div style="display:flex; gap:10px; flex-wrap:wrap">
+                <button class="btn btn-primary" onclick="showView('ventas', document.querySelector('[data-view=ventas]')); setTimeout(() => mostrarFormVenta(), 100)">Nueva Venta</button>
+                <button class="btn btn-warning" onclick="showView('alquileres', document.querySelector('[data-view=alquileres]')); setTimeout(() => mostrarFormAlquiler(), 100)">Nuevo Alquiler</button>
+                <button class="btn btn-success" onclick="showView('productos', document.querySelector('[data-view=productos]')); setTimeout(() => mostrarFormProducto(), 100)">Nuevo Producto</button>
+            </div>
+        </div>
+    `;
+}
+
+async function renderProductos() {
+    data.productos = await request('/api/productos');
+    console.log('Productos cargados:', data.productos);
+    
+    document.getElementById('mainContent').innerHTML = `
+        <div class="card">
+            <div style="display:flex; justify-content:space-between; margin-bottom:20px">
+                <input type="text" class="form-control" placeholder="Buscar..." onkeyup="filtrarProductos(this.value)" style="max-width:300px">
+                <div style="display:flex; gap:10px">
+                    <button class="btn btn-black" onclick="mostrarImportarCatalogo()">Importar Catálogo</button>
+                    <button class="btn btn-primary" onclick="mostrarFormProducto()">Nuevo Producto</button>
+                </div>
+            </div>
+            <div class="product-grid" id="productGrid">
+                ${data.productos.map(p => {
+                    const imagenUrl = p.imagen ? `/uploads/${p.imagen}` : null;
+                    const tieneImagen = imagenUrl !== null;
+                    
+                    // Determinar estado del stock
+                    const stockAgotado = p.stock === 0;
+                    const stockBajo = p.stock > 0 && p.stock <= p.stock_minimo;
+                    
+                    let imagenHTML = '';
+                    if (tieneImagen) {
+                        imagenHTML = `<div class="product-image" style="background-image: url('${imagenUrl}'); background-size: cover; background-position: center; ${stockAgotado ? 'filter: grayscale(80%); opacity: 0.7;' : ''}"></div>`;
+                    } else {
+                        imagenHTML = `<div class="product-image" style="${stockAgotado ? 'filter: grayscale(80%); opacity: 0.7;' : ''}"></div>`;
+                    }
+                    
+                    return `
+                    <div class="product-card ${stockAgotado ? 'producto-agotado' : ''}">
+                        ${stockAgotado ? '<span class="product-badge badge badge-danger" style="z-index:10">AGOTADO</span>' : 
+                          stockBajo ? '<span class="product-badge badge badge-warning">STOCK BAJO</span>' : 
+                          p.disponible_alquiler ? '<span class="product-badge badge badge-purple">Alquilable</span>' : ''}
+                        ${imagenHTML}
+                        <div class="product-info">
+                            <div class="product-name" style="${stockAgotado ? 'color: #999;' : ''}">${p.nombre}</div>
+                            <div class="product-price" style="${stockAgotado ? 'color: #999;' : ''}">💰 $ ${p.precio.toFixed(2)}</div>
+                            ${p.disponible_alquiler ? `<p style="color:${stockAgotado ? '#999' : '#7b1fa2'}; font-size:13px">🏠 $ ${p.precio_alquiler_dia.toFixed(2)}/día</p>` : ''}
+                            <p style="color:#666; font-size:13px">🏢 ${p.proveedor || 'No especificado'}</p>
+                            <p style="color:${stockAgotado ? '#d32f2f' : stockBajo ? '#f57c00' : '#666'}; font-size:13px; font-weight:${stockAgotado ? '700' : '400'}">
+                                📦 Stock: ${p.stock} ${stockAgotado ? '⚠️ AGOTADO' : stockBajo ? '⚠️' : ''} | Min: ${p.stock_minimo}
+                            </p>
+                            <div style="display:flex; gap:10px; margin-top:10px">
+                                <button class="btn btn-primary" style="flex:1; padding:8px" onclick='editarProducto(${JSON.stringify(p)})'>Editar</button>
+                                <button class="btn btn-danger" style="flex:1; padding:8px" onclick="eliminarProducto(${p.id})">Eliminar</button>
+                            </div>
+                        </div>
+                    </div>
+                `}).join('')}
+            </div>
+        </div>
+    `;
+}
+
+function filtrarProductos(txt) {
+    const cards = document.querySelectorAll('.product-card');
+    cards.forEach(c => c.style.display = c.textContent.toLowerCase().includes(txt.toLowerCase()) ? 'block' : 'none');
+}
+
+function mostrarImportarCatalogo() {
+    document.getElementById('modalTitle').textContent = 'Importar Catálogo';
+    document.getElementById('modalBody').innerHTML = `
+        <form onsubmit="importarCatalogo(event)">
+            <p style="color:#666; font-size:13px; margin-bottom:15px">
+                Archivo CSV o XLSX con columnas <strong>nombre, tipo, precio</strong> y opcionalmente
+                proveedor, stock, stock_minimo, precio_alquiler_dia, disponible_alquiler y descripcion.
+                Los productos con el mismo nombre y proveedor se actualizan.
+            </p>
+            <div class="form-group"><input type="file" class="form-control" id="archivoCatalogo" accept=".csv,.xlsx" required></div>
+            <div id="progresoImportacion" style="margin-bottom:15px"></div>
+            <div style="display:flex; gap:10px">
+                <button type="submit" class="btn btn-primary" style="flex:1" id="btnImportar">Importar</button>
+                <button type="button" class="btn btn-danger" onclick="closeModal()">Cerrar</button>
+            </div>
+        </form>
+    `;
+    document.getElementById('modalForm').classList.add('active');
+}
+
+// Consulta un trabajo en segundo plano hasta que termine, avisando el progreso en cada vuelta
+async function esperarTrabajo(trabajoId, alProgresar) {
+    let trabajo;
+    do {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        trabajo = await request(`/api/trabajos/${trabajoId}`);
+        if (alProgresar) alProgresar(trabajo);
+    } while (trabajo.estado === 'pendiente' || trabajo.estado === 'en_curso');
+    return trabajo;
+}
+
+async function importarCatalogo(e) {
+    e.preventDefault();
+    const formData = new FormData();
+    formData.append('archivo', document.getElementById('archivoCatalogo').files[0]);
+    document.getElementById('btnImportar').disabled = true;
+    
+    try {
+        const res = await fetch('/api/productos/importar', { method: 'POST', body: formData });
+        const result = await res.json();
+        if (!result.success) {
+            alert('Error: ' + result.error);
+            document.getElementById('btnImportar').disabled = false;
+            return;
+        }
+        
+        // La importación corre en segundo plano: se consulta el progreso hasta que termine
+        const trabajo = await esperarTrabajo(result.trabajo_id, t => {
+            const progreso = document.getElementById('progresoImportacion');
+            if (progreso) {
+                progreso.innerHTML = `Procesadas <strong>${t.procesados}</strong>${t.total ? ` de ${t.total}` : ''} filas`;
+            }
+        });
+        
+        const progreso = document.getElementById('progresoImportacion');
+        if (trabajo.estado === 'error') {
+            if (progreso) progreso.innerHTML = `<p style="color:#c62828">❌ ${trabajo.mensaje}</p>`;
+        } else if (progreso) {
+            const r = trabajo.resultado || { creados: 0, actualizados: 0, con_error: 0 };
+            progreso.innerHTML = `
+                <p>✅ ${r.creados} creados, ${r.actualizados} actualizados, ${r.con_error} con error</p>
+                ${trabajo.errores.length ? `<div style="max-height:150px; overflow:auto; font-size:13px; color:#c62828; margin-top:10px">
+                    ${trabajo.errores.map(err => `Fila ${err.fila}: ${err.error}`).join('<br>')}
+                </div>` : ''}
+            `;
+        }
+        if (currentView === 'productos') await renderProductos();
+    } catch (error) {
+        alert('Error al importar: ' + error.message);
+    }
+}
+
+function mostrarFormProducto(producto = null) {
+    const p = producto || { nombre: '', tipo: '', precio: '', precio_alquiler_dia: 0, disponible_alquiler: false, stock: '', stock_minimo: 5, proveedor: '', descripcion: '', imagen: '' };
+    document.getElementById('modalTitle').textContent = producto ? 'Editar Producto' : 'Nuevo Producto';
+    document.getElementById('modalBody').innerHTML = `
+        <form id="formProducto" onsubmit="guardarProducto(event, ${producto ? producto.id : 'null'})">
+            <div class="form-group"><label class="form-label">Nombre</label><input class="form-control" name="nombre" value="${p.nombre}" required></div>
+            <div class="form-group"><label class="form-label">Tipo</label>
+                <select class="form-control" name="tipo" required>
+                    <option value="aretes" ${p.tipo==='aretes'?'selected':''}>Aretes</option>
+                    <option value="collares" ${p.tipo==='collares'?'selected':''}>Collares</option>
+                    <option value="coronas" ${p.tipo==='coronas'?'selected':''}>Coronas</option>
+                    <option value="bisuteria" ${p.tipo==='bisuteria'?'selected':''}>Bisutería</option>
+                </select>
+            </div>
+            <div class="form-group"><label class="form-label">Proveedor</label><input class="form-control" name="proveedor" value="${p.proveedor}" placeholder="Nombre del proveedor"></div>
+            <div class="form-group">
+                <label class="form-label">Imagen del Producto</label>
+                <input type="file" class="form-control" id="imagenProducto" accept="image/*" onchange="previewImagen(event)">
+                <div id="imagePreview" style="margin-top:10px; text-align:center">
+                    ${p.imagen ? `<img src="/uploads/${p.imagen}" style="max-width:200px; max-height:200px; border-radius:8px">` : '<p style="color:#666; font-size:13px">No hay imagen seleccionada</p>'}
+                </div>
+            </div>
+            <div class="grid-2">
+                <div class="form-group"><label class="form-label">Precio Venta ($)</label><input type="number" step="0.01" class="form-control" name="precio" value="${p.precio}" required></div>
+                <div class="form-group"><label class="form-label">Stock</label><input type="number" class="form-control" name="stock" value="${p.stock}" required></div>
+            </div>
+            <div class="form-group"><label class="form-label">Stock Mínimo</label><input type="number" class="form-control" name="stock_minimo" value="${p.stock_minimo}"></div>
+            
+            <div class="form-check">
+                <input type="checkbox" id="disponible_alquiler" name="disponible_alquiler" ${p.disponible_alquiler ? 'checked' : ''} onchange="toggleAlquilerFields(this.checked)">
+                <label for="disponible_alquiler" class="form-label" style="margin:0">🏠 Disponible para alquiler</label>
+            </div>
+            
+            <div id="alquilerFields" style="display:${p.disponible_alquiler ? 'block' : 'none'}; background:#f3e5f5; padding:15px; border-radius:8px; margin-top:10px">
+                <div class="form-group"><label class="form-label">Precio por Día ($)</label><input type="number" step="0.01" class="form-control" name="precio_alquiler_dia" value="${p.precio_alquiler_dia}"></div>
+            </div>
+            
+            <div class="form-group"><label class="form-label">Descripción</label><textarea class="form-control" name="descripcion">${p.descripcion||''}</textarea></div>
+            <div style="display:flex; gap:10px">
+                <button type="submit" class="btn btn-primary" style="flex:1">Guardar</button>
+                <button type="button" class="btn btn-danger" onclick="closeModal()">Cancelar</button>
+            </div>
+        </form>
+    `;
+    document.getElementById('modalForm').classList.add('active');
+}
+
+function toggleAlquilerFields(checked) {
+    document.getElementById('alquilerFields').style.display = checked ? 'block' : 'none';
+}
+
+function previewImagen(event) {
+    const file = event.target.files[0];
+    if (file) {
+        const reader = new FileReader();
+        reader.onload = function(e) {
+            document.getElementById('imagePreview').innerHTML = `
+                <img src="${e.target.result}" style="max-width:200px; max-height:200px; border-radius:8px">
+                <p style="color:#2e7d32; font-size:13px; margin-top:5px">Imagen cargada: ${file.name}</p>
+            `;
+        };
+        reader.readAsDataURL(file);
+    }
+}
+
+function editarProducto(p) { mostrarFormProducto(p); }
+
+async function guardarProducto(e, id) {
+    e.preventDefault();
+    const formElement = document.getElementById('formProducto');
+    
+    try {
+        let response;
+        
+        if (id) {
+            const formData = new FormData(formElement);
+            const data = {
+                id: id,
+                nombre: formData.get('nombre'),
+                tipo: formData.get('tipo'),
+                precio: formData.get('precio'),
+                precio_alquiler_dia: formData.get('precio_alquiler_dia') || 0,
+                disponible_alquiler: document.getElementById('disponible_alquiler').checked,
+                stock: formData.get('stock'),
+                stock_minimo: formData.get('stock_minimo'),
+                proveedor: formData.get('proveedor'),
+                descripcion: formData.get('descripcion')
+            };
+            
+            response = await fetch('/api/productos', {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(data)
+            });
+        } else {
+            const formData = new FormData();
+            
+            formData.append('nombre', formElement.querySelector('input[name="nombre"]').value);
+            formData.append('tipo', formElement.querySelector('select[name="tipo"]').value);
+            formData.append('precio', formElement.querySelector('input[name="precio"]').value);
+            formData.append('precio_alquiler_dia', formElement.querySelector('input[name="precio_alquiler_dia"]').value || 0);
+            formData.append('disponible_alquiler', document.getElementById('disponible_alquiler').checked);
+            formData.append('stock', formElement.querySelector('input[name="stock"]').value);
+            formData.append('stock_minimo', formElement.querySelector('input[name="stock_minimo"]').value);
+            formData.append('proveedor', formElement.querySelector('input[name="proveedor"]').value);
+            formData.append('descripcion', formElement.querySelector('textarea[name="descripcion"]').value);
+            
+            const imagenInput = document.getElementById('imagenProducto');
+            if (imagenInput && imagenInput.files && imagenInput.files[0]) {
+                formData.append('imagen', imagenInput.files[0]);
+            }
+            
+            response = await fetch('/api/productos', {
+                method: 'POST',
+                body: formData
+            });
+        }
+        
+        const result = await response.json();
+        
+        if (result.success) {
+            closeModal();
+            await renderProductos();
+            alert('Producto guardado correctamente');
+        } else {
+            alert('Error al guardar producto: ' + (result.error || 'Error desconocido'));
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert('Error al guardar producto: ' + error.message);
+    }
+}
+
+async function eliminarProducto(id) {
+    if (confirm('¿Eliminar producto?')) {
+        await request('/api/productos', { method: 'DELETE', body: JSON.stringify({ id }) });
+        renderProductos();
+    }
+}
+
+async function renderClientes() {
+    data.clientes = await request('/api/clientes');
+    document.getElementById('mainContent').innerHTML = `
+        <div class="card">
+            <div style="display:flex; justify-content:space-between; margin-bottom:20px">
+                <h2>Clientes</h2>
+                <button class="btn btn-primary" onclick="mostrarFormCliente()">Nuevo Cliente</button>
+            </div>
+            <table class="table">
+                <thead>
+                    <tr>
+                        <th>Nombre</th>
+                        <th>Teléfono</th>
+                        <th>Email</th>
+                        <th>Compras</th>
+                        <th>Alquileres</th>
+                        <th>Acciones</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${data.clientes.map(c => `
+                        <tr>
+                            <td><strong>${c.nombre}</strong></td>
+                            <td>${c.telefono || '-'}</td>
+                            <td>${c.email || '-'}</td>
+                            <td>
+                                <span class="badge badge-info">${c.total_compras}</span>
+                            </td>
+                            <td>
+                                <span class="badge badge-purple">${c.total_alquileres}</span>
+                            </td>
+                            <td>
+                                <div style="display:flex; gap:10px">
+                                    <button class="btn btn-primary" 
+                                            style="padding:6px 12px; font-size:13px" 
+                                            onclick='editarCliente(${JSON.stringify(c)})'>
+                                        Editar
+                                    </button>
+                                    <button class="btn btn-danger" 
+                                            style="padding:6px 12px; font-size:13px; display:inline-flex; align-items:center; gap:5px" 
+                                            onclick="eliminarCliente(${c.id}, '${c.nombre.replace(/'/g, "\\'")}', ${c.total_compras}, ${c.total_alquileres})">
+                                        <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                                            <polyline points="3 6 5 6 21 6"/>
+                                            <path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"/>
+                                            <line x1="10" y1="11" x2="10" y2="17"/>
+                                            <line x1="14" y1="11" x2="14" y2="17"/>
+                                        </svg>
+                                        Eliminar
+                                    </button>
+                                </div>
+                            </td>
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        </div>
+    `;
+}
+
+// ==================== FUNCIÓN PARA ELIMINAR CLIENTE ====================
+async function eliminarCliente(id, nombre, totalCompras, totalAlquileres) {
+    mostrarModalConfirmacion(id, nombre, totalCompras, totalAlquileres);
+}
+
+function mostrarModalConfirmacion(id, nombre, totalCompras, totalAlquileres) {
+    document.getElementById('modalTitle').textContent = '⚠️ Confirmar Eliminación';
+    
+    const tieneRegistros = totalCompras > 0 || totalAlquileres > 0;
+    
+    document.getElementById('modalBody').innerHTML = `
+        <div style="padding:20px 0">
+            <div style="background:#fff3e0; border-left:4px solid #f57c00; padding:20px; border-radius:8px; margin-bottom:20px">
+                <div style="display:flex; align-items:center; gap:12px; margin-bottom:15px">
+                    <svg width="32" height="32" viewBox="0 0 24 24" fill="none" stroke="#f57c00" stroke-width="2">
+                        <circle cx="12" cy="12" r="10"/>
+                        <line x1="12" y1="8" x2="12" y2="12"/>
+                        <line x1="12" y1="16" x2="12.01" y2="16"/>
+                    </svg>
+                    <h3 style="margin:0; color:#e65100">Advertencia de Eliminación</h3>
+                </div>
+                
+                <p style="font-size:15px; line-height:1.6; margin-bottom:15px">
+                    Estás a punto de eliminar al cliente <strong>"${nombre}"</strong>.
+                </p>
+                
+                ${tieneRegistros ? `
+                    <div style="background:#ffebee; padding:15px; border-radius:6px; margin-top:15px">
+                        <p style="margin:0 0 10px 0; font-weight:600; color:#c62828">
+                            Esta acción también eliminará:
+                        </p>
+                        <ul style="margin:0; padding-left:20px; color:#666">
+                            ${totalCompras > 0 ? `<li><strong>${totalCompras}</strong> venta(s) registrada(s)</li>` : ''}
+                            ${totalAlquileres > 0 ? `<li><strong>${totalAlquileres}</strong> alquiler(es) registrado(s)</li>` : ''}
+                        </ul>
+                        <p style="margin:15px 0 0 0; font-size:13px; color:#999; font-style:italic">
+                            * El stock de los productos será restaurado automáticamente
+                        </p>
+                    </div>
+                ` : `
+                    <div style="background:#e8f5e9; padding:15px; border-radius:6px; margin-top:15px">
+                        <p style="margin:0; color:#2e7d32; font-size:14px">
+                            ✓ Este cliente no tiene ventas ni alquileres registrados.
+                        </p>
+                    </div>
+                `}
+            </div>
+            
+            <p style="font-size:14px; color:#666; text-align:center; margin-top:20px">
+                <strong style="color:#d32f2f">Esta acción no se puede deshacer.</strong>
+            </p>
+        </div>
+        
+        <div style="display:flex; gap:10px; margin-top:20px">
+            <button class="btn btn-danger" style="flex:1; padding:12px; font-weight:600" onclick="confirmarEliminacionCliente(${id}, '${nombre.replace(/'/g, "\\'")}')">
+                <svg width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" style="margin-right:8px">
+                    <polyline points="3 6 5 6 21 6"/>
+                    <path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"/>
+                </svg>
+                Sí, Eliminar Cliente
+            </button>
+            <button class="btn btn-primary" style="flex:1; padding:12px" onclick="closeModal()">Cancelar</button>
+        </div>
+    `;
+    
+    document.getElementById('modalForm').classList.add('active');
+}
+
+async function confirmarEliminacionCliente(id, nombre) {
+    try {
+        const result = await request('/api/clientes', { 
+            method: 'DELETE', 
+            body: JSON.stringify({ id }) 
+        });
+        
+        if (result.success) {
+            closeModal();
+            
+            // Mostrar modal de éxito
+            document.getElementById('modalTitle').textContent = 'Eliminación Exitosa';
+            document.getElementById('modalBody').innerHTML = `
+                <div style="text-align:center; padding:30px 20px">
+                    <svg width="64" height="64" viewBox="0 0 24 24" fill="none" stroke="#2e7d32" stroke-width="2" style="margin-bottom:20px">
+                        <circle cx="12" cy="12" r="10"/>
+                        <path d="M9 12l2 2 4-4"/>
+                    </svg>
+                    <h3 style="color:#2e7d32; margin-bottom:15px">Cliente eliminado correctamente</h3>
+                    <p style="color:#666; margin-bottom:10px">
+                        El cliente <strong>"${nombre}"</strong> ha sido eliminado.
+                    </p>
+                    ${result.ventas_eliminadas > 0 || result.alquileres_eliminados > 0 ? `
+                        <div style="background:#f5f5f5; padding:15px; border-radius:8px; margin-top:15px">
+                            <p style="margin:0; color:#666; font-size:14px">
+                                También se eliminaron:
+                            </p>
+                            <ul style="list-style:none; padding:0; margin:10px 0 0 0">
+                                ${result.ventas_eliminadas > 0 ? `<li>🛒 ${result.ventas_eliminadas} venta(s)</li>` : ''}
+                                ${result.alquileres_eliminados > 0 ? `<li>🏠 ${result.alquileres_eliminados} alquiler(es)</li>` : ''}
+                            </ul>
+                        </div>
+                    ` : ''}
+                </div>
+                <button class="btn btn-primary" style="width:100%; padding:12px" onclick="closeModal(); renderClientes()">Aceptar</button>
+            `;
+            document.getElementById('modalForm').classList.add('active');
+        } else {
+            alert('❌ Error al eliminar cliente: ' + (result.error || 'Error desconocido'));
+        }
+    } catch (error) {
+        console.error('Error al eliminar cliente:', error);
+        alert('❌ Error al eliminar cliente: ' + error.message);
+    }
+}
+
+function mostrarFormCliente(cliente = null) {
+    const c = cliente || { nombre: '', telefono: '', email: '', direccion: '' };
+    document.getElementById('modalTitle').textContent = cliente ? 'Editar Cliente' : 'Nuevo Cliente';
+    document.getElementById('modalBody').innerHTML = `
+        <form onsubmit="guardarCliente(event, ${cliente ? cliente.id : 'null'})">
+            <div class="form-group">
+                <label class="form-label">Nombre <span style="color:red">*</span></label>
+                <input class="form-control" name="nombre" id="nombreCliente" value="${c.nombre}" required>
+            </div>
+            
+            <div class="form-group">
+                <label class="form-label">Teléfono</label>
+                <input 
+                    type="tel" 
+                    class="form-control" 
+                    name="telefono" 
+                    id="telefonoCliente" 
+                    value="${c.telefono||''}"
+                    placeholder="Ej: 9876543210"
+                    maxlength="10"
+                    oninput="validarTelefonoInput(this)"
+                    onkeypress="return soloNumeros(event)"
+                >
+                <small id="telefonoError" style="color:#d32f2f; display:none; margin-top:5px; font-size:12px">
+                    El teléfono debe tener 10 dígitos
+                </small>
+                <small style="color:#666; font-size:12px; margin-top:5px; display:block">
+                    Debe contener 10 dígitos numéricos
+                </small>
+            </div>
+            
+            <div class="form-group">
+                <label class="form-label">Email</label>
+                <input type="email" class="form-control" name="email" id="emailCliente" value="${c.email||''}" placeholder="correo@ejemplo.com">
+            </div>
+            
+            <div class="form-group">
+                <label class="form-label">Dirección</label>
+                <textarea class="form-control" name="direccion" id="direccionCliente" rows="3">${c.direccion||''}</textarea>
+            </div>
+            
+            <div style="display:flex; gap:10px">
+                <button type="submit" class="btn btn-primary" id="btnGuardarCliente" style="flex:1">Guardar</button>
+                <button type="button" class="btn btn-danger" onclick="closeModal()">Cancelar</button>
+            </div>
+        </form>
+    `;
+    document.getElementById('modalForm').classList.add('active');
+}
+
+function editarCliente(c) { mostrarFormCliente(c); }
+
+async function guardarCliente(e, id) {
+    e.preventDefault();
+    
+    const telefono = document.getElementById('telefonoCliente').value;
+    
+    // Validar teléfono si se proporcionó
+    if (telefono && telefono.length > 0) {
+        if (telefono.length !== 10) {
+            document.getElementById('telefonoError').style.display = 'block';
+            document.getElementById('telefonoCliente').style.borderColor = '#d32f2f';
+            document.getElementById('telefonoCliente').style.backgroundColor = '#ffebee';
+            document.getElementById('telefonoCliente').focus();
+            return;
+        }
+        
+        // Verificar que solo contenga números
+        if (!/^\d+$/.test(telefono)) {
+            alert('❌ El teléfono solo debe contener números');
+            document.getElementById('telefonoCliente').focus();
+            return;
+        }
+    }
+    
+    const form = new FormData(e.target);
+    const datos = Object.fromEntries(form);
+    if (id) datos.id = id;
+    
+    const result = await request('/api/clientes', { 
+        method: id ? 'PUT' : 'POST', 
+        body: JSON.stringify(datos) 
+    });
+    
+    if (result.success) {
+        closeModal();
+        
+        // Mostrar modal de éxito
+        document.getElementById('modalTitle').textContent = '✅ Cliente Guardado';
+        document.getElementById('modalBody').innerHTML = `
+            <div style="text-align:center; padding:30px 20px">
+                <svg width="64" height="64" viewBox="0 0 24 24" fill="none" stroke="#2e7d32" stroke-width="2" style="margin-bottom:20px">
+                    <circle cx="12" cy="12" r="10"/>
+                    <path d="M9 12l2 2 4-4"/>
+                </svg>
+                <h3 style="color:#2e7d32; margin-bottom:15px">
+                    ${id ? 'Cliente actualizado' : 'Cliente creado'} correctamente
+                </h3>
+                <p style="color:#666">
+                    <strong>"${datos.nombre}"</strong> ha sido ${id ? 'actualizado' : 'registrado'} en el sistema.
+                </p>
+            </div>
+            <button class="btn btn-primary" style="width:100%; padding:12px" onclick="closeModal(); renderClientes()">Aceptar</button>
+        `;
+        document.getElementById('modalForm').classList.add('active');
+    } else {
+        alert('❌ Error al guardar cliente: ' + (result.error || 'Error desconocido'));
+    }
+}
+
+async function renderAlquileres() {
+    data.alquileresResumen = await request('/api/alquileres/resumen');
+    clienteSeleccionado = null;
+    filtroActual = 'todos';
+    mostrarAlquileres(data.alquileresResumen.grupos);
+}
+
+function htmlAlquiler(alq) {
+    return `
+        <div class="item">
+            <div class="item-header">
+                <span class="item-id">Alquiler #${alq.id}</span>
+                <span class="item-total">$ ${alq.total.toFixed(2)}</span>
+            </div>
+            <div class="item-info">
+                <span style="display:flex; align-items:center; gap:5px">
+                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <rect x="3" y="4" width="18" height="18" rx="2" ry="2"/>
+                        <line x1="16" y1="2" x2="16" y2="6"/>
+                        <line x1="8" y1="2" x2="8" y2="6"/>
+                        <line x1="3" y1="10" x2="21" y2="10"/>
+                    </svg>
+                    ${alq.fecha_inicio} → ${alq.fecha_fin}
+                </span>
+                <span class="badge ${alq.estado === 'activo' ? 'badge-success' : 'badge-info'}">${alq.estado}</span>
+                <span style="display:flex; align-items:center; gap:5px">
+                    💰 Depósito: $ ${alq.deposito.toFixed(2)}
+                </span>
+                <span style="display:flex; align-items:center; gap:5px">
+                    💳 ${alq.metodo_pago}
+                </span>
+            </div>
+            ${alq.fecha_devolucion_real ? `<p style="color:#2e7d32; font-size:13px; margin-top:5px">✅ Devuelto: ${alq.fecha_devolucion_real}</p>` : ''}
+            ${alq.notas ? `<p style="color:#666; font-size:13px; margin-top:5px">📝 ${alq.notas}</p>` : ''}
+            <div class="item-productos">
+                <strong style="font-size:13px; color:#666">Productos:</strong>
+                ${alq.productos.map(p => `
+                    <div class="producto-detalle">
+                        <div>
+                            <strong>${p.nombre}</strong>
+                            <span class="badge badge-info" style="margin-left:5px">${p.tipo}</span>
+                            <br>
+                            <small style="color:#666">${p.cantidad} x $ ${p.precio_dia.toFixed(2)}/día x ${p.dias} días</small>
+                        </div>
+                        <div><strong>$ ${p.subtotal.toFixed(2)}</strong></div>
+                    </div>
+                `).join('')}
+            </div>
+            <div style="text-align:right; margin-top:10px; display:flex; gap:10px; justify-content:flex-end">
+                ${alq.estado === 'activo' ? `
+                    <button class="btn btn-success" style="padding:6px 12px; font-size:13px" onclick="event.stopPropagation(); finalizarAlquiler(${alq.id})">
+                        Finalizar Alquiler
+                    </button>
+                ` : ''}
+                <button class="btn btn-danger" style="padding:6px 12px; font-size:13px" onclick="event.stopPropagation(); eliminarAlquiler(${alq.id})">
+                    Eliminar
+                </button>
+            </div>
+        </div>
+    `;
+}
+
+function mostrarAlquileres(alquileresData) {
+    gruposVisibles.alquiler = alquileresData;
+    
+    document.getElementById('mainContent').innerHTML = `
+        <div class="card">
+            <div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:20px">
+                <h2>Alquileres por Cliente</h2>
+                <button class="btn btn-warning" onclick="mostrarFormAlquiler()">Nuevo Alquiler</button>
+            </div>
+            
+            <div id="alquileresContainer">
+                ${alquileresData.length === 0 ? '<p style="text-align:center; padding:40px; color:#999">No hay alquileres registrados</p>' : 
+                    alquileresData.map((grupo, index) => `
+                    <div class="cliente-grupo">
+                        <div class="cliente-header" onclick="toggleItems('alquiler', ${index})">
+                            <div class="cliente-info">
+                                <div>
+                                    <div class="cliente-nombre">${grupo.cliente}</div>
+                                    <div class="cliente-stats">
+                                        <span><strong>${grupo.total_alquileres}</strong> alquileres</span>
+                                        ${grupo.alquileres_activos > 0 ? `<span><strong>${grupo.alquileres_activos}</strong> activos</span>` : ''}
+                                        <span>Total: <strong>$ ${grupo.total_gastado.toFixed(2)}</strong></span>
+                                        <span>Último: ${grupo.ultima_fecha}</span>
+                                    </div>
+                                </div>
+                            </div>
+                            <div class="toggle-icon" id="toggle-alquiler-${index}">
+                                <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                                    <polyline points="6 9 12 15 18 9"/>
+                                </svg>
+                            </div>
+                        </div>
+                        <div class="items-lista" id="alquiler-lista-${index}"></div>
+                    </div>
+                `).join('')}
+            </div>
+        </div>
+    `;
+}
+
+async function finalizarAlquiler(id) {
+    if (!confirm('¿Finalizar este alquiler? El stock de los productos será restaurado.')) return;
+    
+    const result = await request('/api/alquileres', { 
+        method: 'PUT', 
+        body: JSON.stringify({ id, accion: 'finalizar' }) 
+    });
+    
+    if (result.success) {
+        alert('Alquiler finalizado correctamente');
+        await renderAlquileres();
+    } else {
+        alert('Error: ' + result.error);
+    }
+}
+
+async function eliminarAlquiler(id) {
+    if (!confirm('¿Eliminar este alquiler? El stock será restaurado.')) return;
+    
+    const result = await request('/api/alquileres', { 
+        method: 'DELETE', 
+        body: JSON.stringify({ id }) 
+    });
+    
+    if (result.success) {
+        alert('Alquiler eliminado correctamente');
+        await renderAlquileres();
+    } else {
+        alert('Error: ' + result.error);
+    }
+}
+
+async function mostrarFormAlquiler() {
+    data.productos = await request('/api/productos');
+    data.clientes = await request('/api/clientes');
+    data.carrito = [];
+    productoSeleccionado = null;
+    
+    const productosAlquilables = data.productos.filter(p => p.disponible_alquiler && p.stock > 0);
+    
+    let dropdownHTML = '';
+    if (productosAlquilables.length === 0) {
+        dropdownHTML = '<div class="no-products-message">No hay productos alquilables con stock</div>';
+    } else {
+        dropdownHTML = productosAlquilables.map(p => {
+            const stockClass = p.stock <= p.stock_minimo ? 'low' : '';
+            return `
+                <div class="custom-dropdown-item" onclick="seleccionarProductoDropdown(${p.id}, '${p.nombre.replace(/'/g, "\\'")}')">
+                    <span class="product-item-name">${p.nombre}</span>
+                    <div class="product-item-details">
+                        <span class="product-item-price">$ ${p.precio_alquiler_dia.toFixed(2)}/día</span>
+                        <span class="product-item-stock ${stockClass}">Stock: ${p.stock}</span>
+                    </div>
+                </div>
+            `;
+        }).join('');
+    }
+    
+    const hoy = new Date().toISOString().split('T')[0];
+    const manana = new Date(Date.now() + 86400000).toISOString().split('T')[0];
+    
+    document.getElementById('modalTitle').textContent = 'Nuevo Alquiler';
+    document.getElementById('modalBody').innerHTML = `
+        <div class="form-group">
+            <label class="form-label">Cliente</label>
+            <select class="form-control" id="alquilerCliente" required>
+                <option value="">Seleccione...</option>
+                ${data.clientes.map(c => `<option value="${c.id}">${c.nombre}</option>`).join('')}
+            </select>
+        </div>
+        <div class="grid-2">
+            <div class="form-group">
+                <label class="form-label">Fecha Inicio</label>
+                <input type="date" class="form-control" id="fechaInicio" value="${hoy}" required>
+            </div>
+            <div class="form-group">
+                <label class="form-label">Fecha Fin</label>
+                <input type="date" class="form-control" id="fechaFin" value="${manana}" required>
+            </div>
+        </div>
+        <div class="grid-2">
+            <div class="form-group">
+                <label class="form-label">Método de Pago</label>
+                <select class="form-control" id="alquilerPago" required>
+                    <option value="Efectivo">Efectivo</option>
+                    <option value="Tarjeta">Tarjeta</option>
+                    <option value="Transferencia">Transferencia</option>
+                    <option value="Yape/Plin">Yape/Plin</option>
+                </select>
+            </div>
+            <div class="form-group">
+                <label class="form-label">Depósito ($)</label>
+                <input type="number" step="0.01" class="form-control" id="deposito" value="0" required>
+            </div>
+        </div>
+        <div class="form-group">
+            <label class="form-label">Notas (opcional)</label>
+            <textarea class="form-control" id="notas" rows="2"></textarea>
+        </div>
+        <div class="form-group">
+            <label class="form-label">Producto</label>
+            <div class="custom-dropdown">
+                <button type="button" class="custom-dropdown-button" onclick="toggleCustomDropdown('dropdownProductosAlq')">
+                    <span class="placeholder">Seleccione un producto...</span>
+                    <span class="arrow"></span>
+                </button>
+                <div class="custom-dropdown-menu" id="dropdownProductosAlq">
+                    ${productosAlquilables.length > 5 ? `
+                        <div class="custom-dropdown-search">
+                            <input type="text" placeholder="Buscar producto..." onkeyup="filtrarProductosDropdown(this)" onclick="event.stopPropagation()">
+                        </div>
+                    ` : ''}
+                    ${dropdownHTML}
+                </div>
+            </div>
+            <button type="button" class="btn btn-black" style="margin-top:10px; width:100%" onclick="agregarAlCarritoAlquiler()">Agregar al Carrito</button>
+        </div>
+        <div id="carritoAlquiler"></div>
+        <div style="margin-top:20px; padding:15px; background:#f3e5f5; border-radius:8px">
+            <div style="display:flex; justify-content:space-between; margin-bottom:5px">
+                <span>Días: <span id="diasAlquiler">1</span></span>
+                <span>Subtotal: $ <span id="subtotalAlquiler">0.00</span></span>
+            </div>
+            <div style="display:flex; justify-content:space-between; margin-bottom:5px">
+                <span>Depósito:</span>
+                <span>$ <span id="depositoMostrar">0.00</span></span>
+            </div>
+            <div style="display:flex; justify-content:space-between; font-size:18px; font-weight:700; border-top:2px solid #7b1fa2; padding-top:10px">
+                <span>Total:</span>
+                <span>$ <span id="totalAlquiler">0.00</span></span>
+            </div>
+        </div>
+        <div style="display:flex; gap:10px; margin-top:20px">
+            <button class="btn btn-warning" style="flex:1" onclick="procesarAlquiler()">Procesar Alquiler</button>
+            <button class="btn btn-danger" onclick="closeModal()">Cancelar</button>
+        </div>
+    `;
+    document.getElementById('modalForm').classList.add('active');
+    
+    document.getElementById('fechaInicio').addEventListener('change', actualizarDiasAlquiler);
+    document.getElementById('fechaFin').addEventListener('change', actualizarDiasAlquiler);
+    document.getElementById('deposito').addEventListener('input', actualizarCarritoAlquiler);
+}
+
+function actualizarDiasAlquiler() {
+    const inicio = new Date(document.getElementById('fechaInicio').value);
+    const fin = new Date(document.getElementById('fechaFin').value);
+    const dias = Math.ceil((fin - inicio) / (1000 * 60 * 60 * 24));
+    document.getElementById('diasAlquiler').textContent = dias > 0 ? dias : 0;
+    actualizarCarritoAlquiler();
+}
+
+function agregarAlCarritoAlquiler() {
+    if (!productoSeleccionado) {
+        alert('Seleccione un producto');
+        return;
+    }
+    
+    const prod = data.productos.find(p => p.id === productoSeleccionado);
+    if (!prod) {
+        alert('Producto no encontrado');
+        return;
+    }
+    
+    if (!prod.disponible_alquiler) {
+        alert('Este producto no está disponible para alquiler');
+        return;
+    }
+    
+    const existe = data.carrito.find(c => c.producto_id === productoSeleccionado);
+    
+    if (existe) {
+        if (existe.cantidad < prod.stock) {
+            existe.cantidad++;
+        } else {
+            alert('Stock insuficiente');
+            return;
+        }
+    } else {
+        data.carrito.push({ 
+            producto_id: productoSeleccionado, 
+            nombre: prod.nombre, 
+            precio_dia: prod.precio_alquiler_dia, 
+            cantidad: 1, 
+            stock: prod.stock 
+        });
+    }
+    
+    actualizarCarritoAlquiler();
+    
+    const button = document.querySelector('.custom-dropdown-button');
+    button.innerHTML = `
+        <span class="placeholder">Seleccione un producto...</span>
+        <span class="arrow"></span>
+    `;
+    productoSeleccionado = null;
+}
+
+function actualizarCarritoAlquiler() {
+    const inicio = new Date(document.getElementById('fechaInicio').value);
+    const fin = new Date(document.getElementById('fechaFin').value);
+    const dias = Math.max(1, Math.ceil((fin - inicio) / (1000 * 60 * 60 * 24)));
+    
+    const deposito = parseFloat(document.getElementById('deposito').value) || 0;
+    const subtotal = data.carrito.reduce((sum, item) => sum + (item.precio_dia * item.cantidad * dias), 0);
+    const total = subtotal + deposito;
+    
+    document.getElementById('diasAlquiler').textContent = dias;
+    document.getElementById('subtotalAlquiler').textContent = subtotal.toFixed(2);
+    document.getElementById('depositoMostrar').textContent = deposito.toFixed(2);
+    document.getElementById('totalAlquiler').textContent = total.toFixed(2);
+    
+    document.getElementById('carritoAlquiler').innerHTML = `
+        <h4 style="margin:15px 0">Carrito:</h4>
+        ${data.carrito.map((item, i) => `
+            <div style="background:#f5f5f5; padding:10px; border-radius:8px; margin-bottom:10px; display:flex; justify-content:space-between; align-items:center">
+                <div>
+                    <strong>${item.nombre}</strong><br>
+                    $ ${item.precio_dia.toFixed(2)}/día x ${item.cantidad} x ${dias} días = $ ${(item.precio_dia * item.cantidad * dias).toFixed(2)}
+                </div>
+                <div>
+                    <button class="btn btn-danger" style="padding:5px 10px" onclick="data.carrito.splice(${i}, 1); actualizarCarritoAlquiler()">Eliminar</button>
+                </div>
+            </div>
+        `).join('')}
+    `;
+}
+
+async function procesarAlquiler() {
+    const cliente_id = parseInt(document.getElementById('alquilerCliente').value);
+    const fecha_inicio = document.getElementById('fechaInicio').value;
+    const fecha_fin = document.getElementById('fechaFin').value;
+    const metodo_pago = document.getElementById('alquilerPago').value;
+    const deposito = parseFloat(document.getElementById('deposito').value) || 0;
+    const notas = document.getElementById('notas').value;
+    
+    if (!cliente_id) {
+        alert('Seleccione un cliente');
+        return;
+    }
+    if (data.carrito.length === 0) {
+        alert('Agregue productos al carrito');
+        return;
+    }
+    if (!fecha_inicio || !fecha_fin) {
+        alert('Especifique las fechas de alquiler');
+        return;
+    }
+    
+    const result = await request('/api/alquileres', {
+        method: 'POST',
+        body: JSON.stringify({ 
+            cliente_id, 
+            fecha_inicio, 
+            fecha_fin, 
+            metodo_pago, 
+            deposito,
+            notas,
+            productos: data.carrito 
+        })
+    });
+    
+    if (result.success) {
+        alert('Alquiler registrado correctamente');
+        closeModal();
+        await renderAlquileres();
+    } else {
+        alert('Error: ' + result.error);
+    }
+}
+
+async function renderVentas() {
+    data.ventasResumen = await request('/api/ventas/resumen');
+    clienteSeleccionado = null;
+    filtroActual = 'todos';
+    await aplicarFiltro('todos');
+}
+
+async function aplicarFiltro(filtro, esSeleccionCliente = false) {
+    if (esSeleccionCliente && filtro.startsWith('cliente_')) {
+        const clienteId = parseInt(filtro.replace('cliente_', ''));
+        clienteSeleccionado = clienteId;
+        filtroActual = 'todos';
+    } else if (filtro.startsWith('cliente_')) {
+        const clienteId = parseInt(filtro.replace('cliente_', ''));
+        clienteSeleccionado = clienteId;
+        filtroActual = 'todos';
+    } else {
+        filtroActual = filtro;
+    }
+    
+    document.querySelectorAll('.dropdown-content').forEach(dropdown => {
+        dropdown.classList.remove('show');
+    });
+    
+    // El filtro por tipo decide qué clientes aparecen; "más recientes" y "última venta"
+    // solo limitan lo que se carga al abrir cada grupo
+    let grupos = data.ventasResumen.grupos;
+    if (filtroActual.startsWith('tipo_')) {
+        const tipo = filtroActual.replace('tipo_', '');
+        grupos = (await request(`/api/ventas/resumen?tipo=${encodeURIComponent(tipo)}`)).grupos || [];
+    }
+    
+    if (clienteSeleccionado !== null) {
+        grupos = grupos.filter(grupo => grupo.cliente_id === clienteSeleccionado);
+    }
+    
+    mostrarVentas(grupos);
+    
+    if (clienteSeleccionado !== null && grupos.length === 1) {
+        await toggleItems('venta', 0);
+    }
+}
+
+function limpiarFiltroCliente() {
+    clienteSeleccionado = null;
+    aplicarFiltro('todos');
+}
+
+// Los grupos llegan solo con sus totales; las ventas o alquileres de cada cliente se piden
+// al abrir el grupo, página a página
+const LIMITE_POR_FILTRO = { mas_recientes: 3, ultima_venta: 1 };
+
+function urlDetalleGrupo(tipo, grupo, cursor) {
+    const params = new URLSearchParams({ cliente_id: grupo.cliente_id });
+    if (tipo === 'venta') {
+        if (LIMITE_POR_FILTRO[filtroActual]) params.set('limite', LIMITE_POR_FILTRO[filtroActual]);
+        if (filtroActual.startsWith('tipo_')) params.set('tipo', filtroActual.replace('tipo_', ''));
+    }
+    if (cursor) params.set('cursor', cursor);
+    return `/api/${tipo === 'venta' ? 'ventas' : 'alquileres'}?${params}`;
+}
+
+async function cargarGrupo(tipo, index, cursor = null) {
+    const grupo = gruposVisibles[tipo][index];
+    const itemsLista = document.getElementById(`${tipo}-lista-${index}`);
+    if (!grupo || !itemsLista) return;
+    
+    const pagina = await request(urlDetalleGrupo(tipo, grupo, cursor));
+    const items = (tipo === 'venta' ? pagina.ventas : pagina.alquileres) || [];
+    const botonMas = itemsLista.querySelector('.cargar-mas');
+    if (botonMas) botonMas.remove();
+    
+    itemsLista.insertAdjacentHTML('beforeend', items.map(tipo === 'venta' ? htmlVenta : htmlAlquiler).join(''));
+    if (pagina.siguiente && !(tipo === 'venta' && LIMITE_POR_FILTRO[filtroActual])) {
+        itemsLista.insertAdjacentHTML('beforeend', `
+            <div class="cargar-mas" style="text-align:center; margin-top:10px">
+                <button class="btn btn-black" style="padding:6px 12px; font-size:13px" onclick="event.stopPropagation(); cargarGrupo('${tipo}', ${index}, '${pagina.siguiente}')">
+                    Cargar más
+                </button>
+            </div>
+        `);
+    }
+    itemsLista.dataset.cargado = 'si';
+}
+
+function toggleDropdown(id, event) {
+    if (event) {
+        event.stopPropagation();
+    }
+    
+    document.querySelectorAll('.dropdown-content').forEach(dropdown => {
+        if (dropdown.id !== id) {
+            dropdown.classList.remove('show');
+        }
+    });
+    
+    const dropdown = document.getElementById(id);
+    if (dropdown) {
+        dropdown.classList.toggle('show');
+    }
+}
+
+document.addEventListener('click', function(event) {
+    if (!event.target.closest('.dropdown')) {
+        document.querySelectorAll('.dropdown-content').forEach(dropdown => {
+            dropdown.classList.remove('show');
+        });
+    }
+});
+
+async function toggleItems(tipo, index) {
+    const itemsLista = document.getElementById(`${tipo}-lista-${index}`);
+    const toggleIcon = document.getElementById(`toggle-${tipo}-${index}`);
+    
+    if (itemsLista && toggleIcon) {
+        itemsLista.classList.toggle('show');
+        toggleIcon.classList.toggle('rotated');
+        if (itemsLista.classList.contains('show') && !itemsLista.dataset.cargado) {
+            await cargarGrupo(tipo, index);
+        }
+    }
+}
+
+function mostrarVentas(ventasData) {
+    const tipos = data.ventasResumen.tipos;
+    gruposVisibles.venta = ventasData;
+    
+    const getFiltroActualText = () => {
+        let textos = [];
+        
+        if (clienteSeleccionado !== null) {
+            const grupo = data.ventasResumen.grupos.find(g => g.cliente_id === clienteSeleccionado);
+            if (grupo) {
+                textos.push(`Cliente: ${grupo.cliente}`);
+            }
+        }
+        
+        if (filtroActual === 'todos') {
+            textos.push('Todas las ventas');
+        } else if (filtroActual === 'mas_recientes') {
+            textos.push('3 más recientes');
+        } else if (filtroActual === 'ultima_venta') {
+            textos.push('Última venta');
+        } else if (filtroActual.startsWith('tipo_')) {
+            const tipo = filtroActual.replace('tipo_', '');
+            textos.push(tipo.charAt(0).toUpperCase() + tipo.slice(1));
+        }
+        
+        return textos.join(' → ');
+    };
+    
+    document.getElementById('mainContent').innerHTML = `
+        <div class="card">
+            <div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:20px">
+                <h2>Ventas por Cliente</h2>
+                <button class="btn btn-primary" onclick="mostrarFormVenta()">Nueva Venta</button>
+            </div>
+            
+            <div class="filtros-container">
+                <div class="dropdown">
+                    <button class="dropdown-btn" onclick="toggleDropdown('dropdownGeneral', event)">
+                        <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                            <line x1="4" y1="6" x2="20" y2="6"/>
+                            <line x1="4" y1="12" x2="20" y2="12"/>
+                            <line x1="4" y1="18" x2="20" y2="18"/>
+                        </svg>
+                        Filtros Generales
+                        <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" style="width:12px">
+                            <polyline points="6 9 12 15 18 9"/>
+                        </svg>
+                    </button>
+                    <div class="dropdown-content" id="dropdownGeneral">
+                        <div class="dropdown-item ${filtroActual === 'todos' && clienteSeleccionado === null ? 'active' : ''}" onclick="aplicarFiltro('todos', false)">Todas las ventas</div>
+                        <div class="dropdown-item ${filtroActual === 'mas_recientes' ? 'active' : ''}" onclick="aplicarFiltro('mas_recientes', false)">3 más recientes</div>
+                        <div class="dropdown-item ${filtroActual === 'ultima_venta' ? 'active' : ''}" onclick="aplicarFiltro('ultima_venta', false)">Última venta</div>
+                    </div>
+                </div>
+                
+                <div class="dropdown">
+                    <button class="dropdown-btn" onclick="toggleDropdown('dropdownTipos', event)">
+                        <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                            <path d="M21 16V8a2 2 0 0 0-1-1.73l-7-4a2 2 0 0 0-2 0l-7 4A2 2 0 0 0 3 8v8a2 2 0 0 0 1 1.73l7 4a2 2 0 0 0 2 0l7-4A2 2 0 0 0 21 16z"/>
+                        </svg>
+                        Por Tipo de Producto
+                        <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" style="width:12px">
+                            <polyline points="6 9 12 15 18 9"/>
+                        </svg>
+                    </button>
+                    <div class="dropdown-content" id="dropdownTipos">
+                        ${tipos.map(tipo => `
+                            <div class="dropdown-item ${filtroActual === 'tipo_'+tipo ? 'active' : ''}" onclick="aplicarFiltro('tipo_${tipo}', false)">
+                                ${tipo.charAt(0).toUpperCase() + tipo.slice(1)}
+                            </div>
+                        `).join('')}
+                    </div>
+                </div>
+                
+                <div class="dropdown">
+                    <button class="dropdown-btn ${clienteSeleccionado !== null ? 'active' : ''}" onclick="toggleDropdown('dropdownClientes', event)">
+                        <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                            <path d="M17 21v-2a4 4 0 0 0-4-4H5a4 4 0 0 0-4 4v2"/>
+                            <circle cx="9" cy="7" r="4"/>
+                            <path d="M23 21v-2a4 4 0 0 0-3-3.87"/>
+                            <path d="M16 3.13a4 4 0 0 1 0 7.75"/>
+                        </svg>
+                        Por Cliente
+                        <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" style="width:12px">
+                            <polyline points="6 9 12 15 18 9"/>
+                        </svg>
+                    </button>
+                    <div class="dropdown-content" id="dropdownClientes">
+                        ${data.ventasResumen.grupos.map(grupo => `
+                            <div class="dropdown-item ${clienteSeleccionado === grupo.cliente_id ? 'active' : ''}" onclick="aplicarFiltro('cliente_${grupo.cliente_id}', true)">
+                                ${grupo.cliente}
+                            </div>
+                        `).join('')}
+                    </div>
+                </div>
+                
+                ${clienteSeleccionado !== null ? `
+                    <button class="btn btn-danger" style="padding:8px 16px; font-size:13px; display:inline-flex; align-items:center; gap:5px" onclick="limpiarFiltroCliente()">
+                        <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                            <line x1="18" y1="6" x2="6" y2="18"/>
+                            <line x1="6" y1="6" x2="18" y2="18"/>
+                        </svg>
+                        Limpiar Cliente
+                    </button>
+                ` : ''}
+                
+                <div style="margin-left:auto; padding:10px 15px; background:#f5f5f5; border-radius:8px; font-weight:500">
+                    Mostrando: <strong>${getFiltroActualText()}</strong>
+                </div>
+            </div>
+            
+            <div id="ventasContainer">
+                ${ventasData.length === 0 ? '<p style="text-align:center; padding:40px; color:#999">No hay ventas con este filtro</p>' : 
+                    ventasData.map((grupo, index) => `
+                    <div class="cliente-grupo">
+                        <div class="cliente-header" onclick="toggleItems('venta', ${index})">
+                            <div class="cliente-info">
+                                <div>
+                                    <div class="cliente-nombre">${grupo.cliente}</div>
+                                    <div class="cliente-stats">
+                                        <span><strong>${grupo.total_compras}</strong> compras</span>
+                                        <span>Total gastado: <strong>$ ${grupo.total_gastado.toFixed(2)}</strong></span>
+                                        <span>Última: ${grupo.ultima_fecha}</span>
+                                    </div>
+                                </div>
+                            </div>
+                            <div class="toggle-icon" id="toggle-venta-${index}">
+                                <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                                    <polyline points="6 9 12 15 18 9"/>
+                                </svg>
+                            </div>
+                        </div>
+                        <div class="items-lista" id="venta-lista-${index}"></div>
+                    </div>
+                `).join('')}
+            </div>
+        </div>
+    `;
+}
+
+function htmlVenta(venta) {
+    return `
+        <div class="item">
+            <div class="item-header">
+                <span class="item-id">Venta #${venta.id}</span>
+                <span class="item-total">$ ${venta.total.toFixed(2)}</span>
+            </div>
+            <div class="item-info">
+                <span style="display:flex; align-items:center; gap:5px">
+                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <rect x="3" y="4" width="18" height="18" rx="2" ry="2"/>
+                        <line x1="16" y1="2" x2="16" y2="6"/>
+                        <line x1="8" y1="2" x2="8" y2="6"/>
+                        <line x1="3" y1="10" x2="21" y2="10"/>
+                    </svg>
+                    ${venta.fecha}
+                </span>
+                <span style="display:flex; align-items:center; gap:5px">
+                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <rect x="1" y="4" width="22" height="16" rx="2" ry="2"/>
+                        <line x1="1" y1="10" x2="23" y2="10"/>
+                    </svg>
+                    ${venta.metodo_pago}
+                </span>
+                <span style="display:flex; align-items:center; gap:5px">
+                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <path d="M21 16V8a2 2 0 0 0-1-1.73l-7-4a2 2 0 0 0-2 0l-7 4A2 2 0 0 0 3 8v8a2 2 0 0 0 1 1.73l7 4a2 2 0 0 0 2 0l7-4A2 2 0 0 0 21 16z"/>
+                    </svg>
+                    ${venta.cantidad_productos} producto(s)
+                </span>
+            </div>
+            <div class="item-productos">
+                <strong style="font-size:13px; color:#666">Productos:</strong>
+                ${venta.productos.map(p => `
+                    <div class="producto-detalle">
+                        <div>
+                            <strong>${p.nombre}</strong>
+                            <span class="badge badge-info" style="margin-left:5px">${p.tipo}</span>
+                            <br>
+                            <small style="color:#666">${p.cantidad} x $ ${p.precio.toFixed(2)}</small>
+                        </div>
+                        <div><strong>$ ${p.subtotal.toFixed(2)}</strong></div>
+                    </div>
+                `).join('')}
+            </div>
+            <div style="text-align:right; margin-top:10px">
+                <button class="btn btn-danger" style="padding:6px 12px; font-size:13px; display:inline-flex; align-items:center; gap:5px" onclick="event.stopPropagation(); eliminarVenta(${venta.id})">
+                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <polyline points="3 6 5 6 21 6"/>
+                        <path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"/>
+                        <line x1="10" y1="11" x2="10" y2="17"/>
+                        <line x1="14" y1="11" x2="14" y2="17"/>
+                    </svg>
+                    Eliminar Venta
+                </button>
+            </div>
+        </div>
+    `;
+}
+
+async function eliminarVenta(id) {
+    if (!confirm('¿Estás seguro de eliminar esta venta? El stock de los productos será restaurado.')) return;
+    
+    const result = await request('/api/ventas', { 
+        method: 'DELETE', 
+        body: JSON.stringify({ id }) 
+    });
+    
+    if (result.success) {
+        alert('Venta eliminada correctamente');
+        data.ventasResumen = await request('/api/ventas/resumen');
+        await aplicarFiltro(filtroActual, false);
+    } else {
+        alert('Error al eliminar venta: ' + result.error);
+    }
+}
+
+function toggleCustomDropdown(dropdownId) {
+    const menu = document.getElementById(dropdownId);
+    const button = menu.previousElementSibling;
+    
+    document.querySelectorAll('.custom-dropdown-menu').forEach(m => {
+        if (m.id !== dropdownId) {
+            m.classList.remove('show');
+            m.previousElementSibling.classList.remove('active');
+        }
+    });
+    
+    menu.classList.toggle('show');
+    button.classList.toggle('active');
+}
+
+function filtrarProductosDropdown(input) {
+    const searchText = input.value.toLowerCase();
+    const items = document.querySelectorAll('.custom-dropdown-item');
+    
+    items.forEach(item => {
+        const text = item.textContent.toLowerCase();
+        if (text.includes(searchText)) {
+            item.style.display = 'flex';
+        } else {
+            item.style.display = 'none';
+        }
+    });
+}
+
+function seleccionarProductoDropdown(productoId, productoNombre) {
+    const button = document.querySelector('.custom-dropdown-button');
+    const menu = document.querySelectorAll('.custom-dropdown-menu')[0];
+    
+    button.innerHTML = `
+        <span class="selected-text">${productoNombre}</span>
+        <span class="arrow"></span>
+    `;
+    
+    productoSeleccionado = productoId;
+    
+    menu.classList.remove('show');
+    button.classList.remove('active');
+    
+    const searchInput = document.querySelector('.custom-dropdown-search input');
+    if (searchInput) {
+        searchInput.value = '';
+        filtrarProductosDropdown(searchInput);
+    }
+}
+
+document.addEventListener('click', function(event) {
+    if (!event.target.closest('.custom-dropdown')) {
+        document.querySelectorAll('.custom-dropdown-menu').forEach(menu => {
+            menu.classList.remove('show');
+            if (menu.previousElementSibling) {
+                menu.previousElementSibling.classList.remove('active');
+            }
+        });
+    }
+});
+
+async function mostrarFormVenta() {
+    data.productos = await request('/api/productos');
+    data.clientes = await request('/api/clientes');
+    data.carrito = [];
+    productoSeleccionado = null;
+    
+    const productosDisponibles = data.productos.filter(p => p.stock > 0);
+    
+    let dropdownHTML = '';
+    if (productosDisponibles.length === 0) {
+        dropdownHTML = '<div class="no-products-message">No hay productos disponibles con stock</div>';
+    } else {
+        dropdownHTML = productosDisponibles.map(p => {
+            const stockClass = p.stock <= p.stock_minimo ? 'low' : '';
+            return `
+                <div class="custom-dropdown-item" onclick="seleccionarProductoDropdown(${p.id}, '${p.nombre.replace(/'/g, "\\'")}')">
+                    <span class="product-item-name">${p.nombre}</span>
+                    <div class="product-item-details">
+                        <span class="product-item-price">$ ${p.precio.toFixed(2)}</span>
+                        <span class="product-item-stock ${stockClass}">Stock: ${p.stock}</span>
+                    </div>
+                </div>
+            `;
+        }).join('');
+    }
+    
+    document.getElementById('modalTitle').textContent = 'Nueva Venta';
+    document.getElementById('modalBody').innerHTML = `
+        <div class="form-group">
+            <label class="form-label">Cliente</label>
+            <select class="form-control" id="ventaCliente" required>
+                <option value="">Seleccione...</option>
+                ${data.clientes.map(c => `<option value="${c.id}">${c.nombre}</option>`).join('')}
+            </select>
+        </div>
+        <div class="form-group">
+            <label class="form-label">Método de Pago</label>
+            <select class="form-control" id="ventaPago" required>
+                <option value="Efectivo">Efectivo</option>
+                <option value="Tarjeta">Tarjeta</option>
+                <option value="Transferencia">Transferencia</option>
+                <option value="Yape/Plin">Yape/Plin</option>
+            </select>
+        </div>
+        <div class="form-group">
+            <label class="form-label">Producto</label>
+            <div class="custom-dropdown">
+                <button type="button" class="custom-dropdown-button" onclick="toggleCustomDropdown('dropdownProductos')">
+                    <span class="placeholder">Seleccione un producto...</span>
+                    <span class="arrow"></span>
+                </button>
+                <div class="custom-dropdown-menu" id="dropdownProductos">
+                    ${productosDisponibles.length > 5 ? `
+                        <div class="custom-dropdown-search">
+                            <input type="text" placeholder="Buscar producto..." onkeyup="filtrarProductosDropdown(this)" onclick="event.stopPropagation()">
+                        </div>
+                    ` : ''}
+                    ${dropdownHTML}
+                </div>
+            </div>
+            <button type="button" class="btn btn-black" style="margin-top:10px; width:100%" onclick="agregarAlCarrito()">Agregar al Carrito</button>
+        </div>
+        <div id="carritoVenta"></div>
+        <div style="margin-top:20px; padding:15px; background:#f5f5f5; border-radius:8px">
+            <h3>Total: $ <span id="totalVenta">0.00</span></h3>
+        </div>
+        <div style="display:flex; gap:10px; margin-top:20px">
+            <button class="btn btn-primary" style="flex:1" onclick="procesarVenta()">Procesar Venta</button>
+            <button class="btn btn-danger" onclick="closeModal()">Cancelar</button>
+        </div>
+    `;
+    document.getElementById('modalForm').classList.add('active');
+}
+
+function agregarAlCarrito() {
+    if (!productoSeleccionado) {
+        alert('Seleccione un producto');
+        return;
+    }
+    
+    const prod = data.productos.find(p => p.id === productoSeleccionado);
+    if (!prod) {
+        alert('Producto no encontrado');
+        return;
+    }
+    
+    const existe = data.carrito.find(c => c.producto_id === productoSeleccionado);
+    
+    if (existe) {
+        if (existe.cantidad < prod.stock) {
+            existe.cantidad++;
+        } else {
+            alert('Stock insuficiente');
+            return;
+        }
+    } else {
+        data.carrito.push({ 
+            producto_id: productoSeleccionado, 
+            nombre: prod.nombre, 
+            precio: prod.precio, 
+            cantidad: 1, 
+            stock: prod.stock 
+        });
+    }
+    
+    actualizarCarrito();
+    
+    const button = document.querySelector('.custom-dropdown-button');
+    button.innerHTML = `
+        <span class="placeholder">Seleccione un producto...</span>
+        <span class="arrow"></span>
+    `;
+    productoSeleccionado = null;
+}
+
+function actualizarCarrito() {
+    const total = data.carrito.reduce((sum, item) => sum + (item.precio * item.cantidad), 0);
+    document.getElementById('totalVenta').textContent = total.toFixed(2);
+    document.getElementById('carritoVenta').innerHTML = `
+        <h4 style="margin:15px 0">Carrito:</h4>
+        ${data.carrito.map((item, i) => `
+            <div style="background:#f5f5f5; padding:10px; border-radius:8px; margin-bottom:10px; display:flex; justify-content:space-between; align-items:center">
+                <div>
+                    <strong>${item.nombre}</strong><br>
+                    $ ${item.precio.toFixed(2)} x ${item.cantidad} = $ ${(item.precio * item.cantidad).toFixed(2)}
+                </div>
+                <div>
+                    <button class="btn btn-danger" style="padding:5px 10px" onclick="data.carrito.splice(${i}, 1); actualizarCarrito()">Eliminar</button>
+                </div>
+            </div>
+        `).join('')}
+    `;
+}
+
+async function procesarVenta() {
+    const cliente_id = parseInt(document.getElementById('ventaCliente').value);
+    const metodo_pago = document.getElementById('ventaPago').value;
+    
+    if (!cliente_id) {
+        alert('Seleccione un cliente');
+        return;
+    }
+    if (data.carrito.length === 0) {
+        alert('Agregue productos al carrito');
+        return;
+    }
+    
+    const result = await request('/api/ventas', {
+        method: 'POST',
+        body: JSON.stringify({ cliente_id, metodo_pago, productos: data.carrito })
+    });
+    
+    if (result.success) {
+        alert('Venta registrada correctamente');
+        closeModal();
+        data.ventasResumen = await request('/api/ventas/resumen');
+        await aplicarFiltro(filtroActual, false);
+    } else {
+        alert('Error: ' + result.error);
+    }
+}
+
+async function renderReportes() {
+    const r = await request('/api/reportes');
+    
+    const reportesHistoricos = await request('/api/reportes/historicos');
+    
+    const fechaActual = new Date();
+    const mesActual = fechaActual.toLocaleDateString('es-ES', { month: 'long', year: 'numeric' });
+    
+    document.getElementById('mainContent').innerHTML = `
+        <div class="stats-grid">
+            <div class="stat-card blue">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <circle cx="12" cy="12" r="10"/>
+                        <path d="M12 6v6l4 2"/>
+                    </svg>
+                </div>
+                <div class="stat-value">${r.total_ventas}</div>
+                <div class="stat-label">Total Ventas</div>
+            </div>
+            <div class="stat-card green">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <line x1="12" y1="1" x2="12" y2="23"/>
+                        <path d="M17 5H9.5a3.5 3.5 0 0 0 0 7h5a3.5 3.5 0 0 1 0 7H6"/>
+                    </svg>
+                </div>
+                <div class="stat-value">$ ${r.total_ingresos.toFixed(2)}</div>
+                <div class="stat-label">Ingresos Ventas</div>
+            </div>
+            <div class="stat-card purple">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <path d="M3 9l9-7 9 7v11a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2z"/>
+                        <polyline points="9 22 9 12 15 12 15 22"/>
+                    </svg>
+                </div>
+                <div class="stat-value">${r.total_alquileres}</div>
+                <div class="stat-label">Total Alquileres</div>
+            </div>
+            <div class="stat-card orange">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <line x1="12" y1="1" x2="12" y2="23"/>
+                        <path d="M17 5H9.5a3.5 3.5 0 0 0 0 7h5a3.5 3.5 0 0 1 0 7H6"/>
+                    </svg>
+                </div>
+                <div class="stat-value">$ ${r.ingresos_alquileres.toFixed(2)}</div>
+                <div class="stat-label">Ingresos Alquileres</div>
+            </div>
+            <div class="stat-card red">
+                <div class="stat-icon">
+                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <path d="M3 9l9-7 9 7v11a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2z"/>
+                    </svg>
+                </div>
+                <div class="stat-value">${r.alquileres_activos}</div>
+                <div class="stat-label">Alquileres Activos</div>
+            </div>
+        </div>
+        
+        <div class="card" style="margin-bottom:20px">
+            <div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:20px">
+                <h3 style="margin:0">Reporte del Mes: ${mesActual}</h3>
+                <div style="display:flex; gap:10px">
+                    <button class="btn btn-primary" onclick="mostrarGenerarHistoricos()">Meses Anteriores</button>
+                    <button class="btn btn-black" onclick="generarReporteMensual()" style="display:inline-flex; align-items:center; gap:8px">
+                        <svg width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                            <path d="M21 15v4a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2v-4"/>
+                            <polyline points="7 10 12 15 17 10"/>
+                            <line x1="12" y1="15" x2="12" y2="3"/>
+                        </svg>
+                        Generar y Guardar Reporte
+                    </button>
+                </div>
+            </div>
+            
+            <div class="grid-2">
+                <div style="background:#f9f9f9; padding:20px; border-radius:8px">
+                    <h4 style="margin-bottom:15px; display:flex; align-items:center; gap:8px">
+                        <svg width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                            <path d="M21 16V8a2 2 0 0 0-1-1.73l-7-4a2 2 0 0 0-2 0l-7 4A2 2 0 0 0 3 8v8a2 2 0 0 0 1 1.73l7 4a2 2 0 0 0 2 0l7-4A2 2 0 0 0 21 16z"/>
+                        </svg>
+                        Productos Más Vendidos
+                    </h4>
+                    ${r.productos_mas_vendidos.length > 0 ? r.productos_mas_vendidos.map((p, i) => `
+                        <div style="display:flex; justify-content:space-between; align-items:center; padding:12px; background:white; border-radius:6px; margin-bottom:8px; border-left:3px solid ${i === 0 ? '#2e7d32' : i === 1 ? '#1976d2' : '#666'}">
+                            <div>
+                                <span><strong>${i + 1}.</strong> ${p.nombre}</span>
+                                <br>
+                                <small style="color:#999">📦 ${p.tipo} | 🏢 ${p.proveedor || 'No especificado'}</small>
+                            </div>
+                            <span class="badge badge-success">${p.cantidad} unidades</span>
+                        </div>
+                    `).join('') : '<p style="text-align:center; color:#999">No hay datos</p>'}
+                </div>
+                
+                <div style="background:#f9f9f9; padding:20px; border-radius:8px">
+                    <h4 style="margin-bottom:15px; display:flex; align-items:center; gap:8px">
+                        <svg width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                            <path d="M3 9l9-7 9 7v11a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2z"/>
+                            <polyline points="9 22 9 12 15 12 15 22"/>
+                        </svg>
+                        Productos Más Alquilados
+                    </h4>
+                    ${r.productos_mas_alquilados && r.productos_mas_alquilados.length > 0 ? r.productos_mas_alquilados.map((p, i) => `
+                        <div style="display:flex; justify-content:space-between; padding:12px; background:white; border-radius:6px; margin-bottom:8px; border-left:3px solid ${i === 0 ? '#9c27b0' : i === 1 ? '#7b1fa2' : '#666'}">
+                            <div>
+                                <strong>${i + 1}.</strong> ${p.nombre}
+                                <br><small style="color:#666">${p.tipo}</small>
+                            </div>
+                            <span class="badge badge-purple">${p.cantidad} veces</span>
+                        </div>
+                    `).join('') : '<p style="text-align:center; color:#999">No hay datos</p>'}
+                </div>
+            </div>
+        </div>
+        
+        <div class="card">
+            <div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:20px">
+                <h3 style="margin:0; display:flex; align-items:center; gap:8px">
+                    <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                        <line x1="18" y1="20" x2="18" y2="10"/>
+                        <line x1="12" y1="20" x2="12" y2="4"/>
+                        <line x1="6" y1="20" x2="6" y2="14"/>
+                    </svg>
+                    Reportes Históricos Completos
+                </h3>
+                ${reportesHistoricos && reportesHistoricos.length > 0 ? `
+                    <button class="btn btn-black" onclick="descargarTodosLosReportes()">Descargar Todos (ZIP)</button>
+                ` : ''}
+            </div>
+            ${reportesHistoricos && reportesHistoricos.length > 0 ? `
+                <div style="display:grid; gap:15px">
+                    ${reportesHistoricos.map(rep => `
+                        <div style="background:#f9f9f9; padding:20px; border-radius:8px; display:flex; justify-content:space-between; align-items:center">
+                            <div>
+                                <h4 style="margin:0 0 8px 0">${rep.mes}</h4>
+                                <div style="display:flex; gap:20px; font-size:14px; color:#666; flex-wrap:wrap">
+                                    <span style="display:flex; align-items:center; gap:5px">
+                                        🛒 ${rep.total_ventas} ventas ($ ${rep.total_ingresos.toFixed(2)})
+                                    </span>
+                                    <span style="display:flex; align-items:center; gap:5px">
+                                        🏠 ${rep.total_alquileres} alquileres ($ ${rep.ingresos_alquileres.toFixed(2)})
+                                    </span>
+                                    <span style="display:flex; align-items:center; gap:5px">
+                                        📅 ${rep.fecha_generacion}
+                                    </span>
+                                </div>
+                            </div>
+                            <div style="display:flex; gap:10px">
+                                <button class="btn btn-primary" onclick="verReporteDetallado('${rep.id}')" style="padding:8px 16px">
+                                    Ver Completo
+                                </button>
+                                <button class="btn btn-black" onclick="descargarReporte('${rep.id}')" style="padding:8px 16px">
+                                    PDF
+                                </button>
+                                <button class="btn btn-danger" onclick="eliminarReporte('${rep.id}')" style="padding:8px 16px">
+                                    🗑️
+                                </button>
+                            </div>
+                        </div>
+                    `).join('')}
+                </div>
+            ` : '<p style="text-align:center; padding:40px; color:#999">No hay reportes guardados. Genera tu primer reporte mensual completo.</p>'}
+        </div>
+    `;
+}
+
+async function generarReporteMensual() {
+    if (!confirm('¿Deseas generar y guardar el reporte completo del mes actual? Incluirá ventas, alquileres, productos y más.')) return;
+    
+    const result = await request('/api/reportes/generar', { method: 'POST' });
+    if (!result.success) {
+        alert('❌ Error al generar reporte: ' + (result.error || 'Error desconocido'));
+        return;
+    }
+    
+    const trabajo = await esperarTrabajo(result.trabajo_id);
+    if (trabajo.estado === 'error') {
+        alert('❌ Error al generar reporte: ' + trabajo.mensaje);
+        return;
+    }
+    alert('Reporte completo generado y guardado correctamente');
+    if (currentView === 'reportes') renderReportes();
+}
+
+function mostrarGenerarHistoricos() {
+    const hasta = new Date().toISOString().slice(0, 7);
+    document.getElementById('modalTitle').textContent = 'Generar Reportes de Meses Anteriores';
+    document.getElementById('modalBody').innerHTML = `
+        <form onsubmit="generarReportesHistoricos(event)">
+            <div class="grid-2">
+                <div class="form-group"><label class="form-label">Desde</label><input type="month" class="form-control" name="desde" max="${hasta}" required></div>
+                <div class="form-group"><label class="form-label">Hasta</label><input type="month" class="form-control" name="hasta" value="${hasta}" max="${hasta}" required></div>
+            </div>
+            <div class="form-group">
+                <label style="display:flex; align-items:center; gap:8px"><input type="checkbox" name="reemplazar"> Regenerar los meses que ya tienen reporte</label>
+            </div>
+            <div id="progresoReportes" style="margin-bottom:15px"></div>
+            <div style="display:flex; gap:10px">
+                <button type="submit" class="btn btn-primary" style="flex:1" id="btnGenerarHistoricos">Generar</button>
+                <button type="button" class="btn btn-danger" onclick="closeModal()">Cerrar</button>
+            </div>
+        </form>
+    `;
+    document.getElementById('modalForm').classList.add('active');
+}
+
+async function generarReportesHistoricos(e) {
+    e.preventDefault();
+    const form = new FormData(e.target);
+    document.getElementById('btnGenerarHistoricos').disabled = true;
+    
+    const result = await request('/api/reportes/generar', {
+        method: 'POST',
+        body: JSON.stringify({ desde: form.get('desde'), hasta: form.get('hasta'), reemplazar: form.get('reemplazar') === 'on' })
+    });
+    if (!result.success) {
+        alert('Error: ' + result.error);
+        document.getElementById('btnGenerarHistoricos').disabled = false;
+        return;
+    }
+    
+    // Cada mes se calcula en paralelo en el servidor; aquí solo se muestra el avance
+    const trabajo = await esperarTrabajo(result.trabajo_id, t => {
+        const progreso = document.getElementById('progresoReportes');
+        if (progreso) progreso.innerHTML = `Procesados <strong>${t.procesados}</strong> de ${t.total || result.meses.length} meses`;
+    });
+    
+    const progreso = document.getElementById('progresoReportes');
+    if (trabajo.estado === 'error') {
+        if (progreso) progreso.innerHTML = `<p style="color:#c62828">❌ ${trabajo.mensaje}</p>`;
+    } else if (progreso) {
+        const r = trabajo.resultado || { generados: [], omitidos: [] };
+        progreso.innerHTML = `
+            <p>✅ ${r.generados.length} generados, ${r.omitidos.length} ya existían, ${trabajo.errores.length} con error</p>
+            ${trabajo.errores.length ? `<div style="max-height:150px; overflow:auto; font-size:13px; color:#c62828; margin-top:10px">
+                ${trabajo.errores.map(err => `${err.mes}: ${err.error}`).join('<br>')}
+            </div>` : ''}
+        `;
+    }
+    if (currentView === 'reportes') renderReportes();
+}
+
+async function verReporteDetallado(reporteId) {
+    const reporte = await request(`/api/reportes/${reporteId}`);
+    
+    if (!reporte) {
+        alert('Error al cargar el reporte');
+        return;
+    }
+    
+    document.getElementById('modalTitle').textContent = `📊 Reporte Completo - ${reporte.mes}`;
+    document.getElementById('modalBody').innerHTML = `
+        <div style="max-height:600px; overflow-y:auto">
+            <div class="stats-grid" style="margin-bottom:25px">
+                <div style="background:#e3f2fd; padding:15px; border-radius:8px; text-align:center">
+                    <div style="font-size:24px; font-weight:700; color:#1976d2">${reporte.total_ventas}</div>
+                    <div style="font-size:12px; color:#666">Ventas</div>
+                </div>
+                <div style="background:#e8f5e9; padding:15px; border-radius:8px; text-align:center">
+                    <div style="font-size:24px; font-weight:700; color:#2e7d32">$ ${reporte.total_ingresos.toFixed(2)}</div>
+                    <div style="font-size:12px; color:#666">Ingresos Ventas</div>
+                </div>
+                <div style="background:#f3e5f5; padding:15px; border-radius:8px; text-align:center">
+                    <div style="font-size:24px; font-weight:700; color:#7b1fa2">${reporte.total_alquileres}</div>
+                    <div style="font-size:12px; color:#666">Alquileres</div>
+                </div>
+                <div style="background:#fff3e0; padding:15px; border-radius:8px; text-align:center">
+                    <div style="font-size:24px; font-weight:700; color:#f57c00">$ ${reporte.ingresos_alquileres.toFixed(2)}</div>
+                    <div style="font-size:12px; color:#666">Ingresos Alquileres</div>
+                </div>
+            </div>
+            
+            ${reporte.productos_mas_vendidos && reporte.productos_mas_vendidos.length > 0 ? `
+                <div style="margin-bottom:25px">
+                    <h4 style="display:flex; align-items:center; gap:8px; margin-bottom:15px">
+                        🛒 Productos Más Vendidos
+                    </h4>
+                    <table class="table">
+                        <thead><tr><th>#</th><th>Producto</th><th>Tipo</th><th>Proveedor</th><th>Cantidad</th></tr></thead>
+                        <tbody>
+                            ${reporte.productos_mas_vendidos.map((p, i) => `
+                                <tr>
+                                    <td>${i + 1}</td>
+                                    <td><strong>${p.nombre}</strong></td>
+                                    <td><span class="badge badge-info">${p.tipo}</span></td>
+                                    <td><span class="badge badge-warning">${p.proveedor || 'No especificado'}</span></td>
+                                    <td><span class="badge badge-success">${p.cantidad}</span></td>
+                                </tr>
+                            `).join('')}
+                        </tbody>
+                    </table>
+                </div>
+            ` : ''}
+            
+            ${reporte.productos_mas_alquilados && reporte.productos_mas_alquilados.length > 0 ? `
+                <div style="margin-bottom:25px">
+                    <h4 style="display:flex; align-items:center; gap:8px; margin-bottom:15px">
+                        Productos Más Alquilados
+                    </h4>
+                    <table class="table">
+                        <thead><tr><th>#</th><th>Producto</th><th>Tipo</th><th>Veces Alquilado</th></tr></thead>
+                        <tbody>
+                            ${reporte.productos_mas_alquilados.map((p, i) => `
+                                <tr>
+                                    <td>${i + 1}</td>
+                                    <td><strong>${p.nombre}</strong></td>
+                                    <td><span class="badge badge-info">${p.tipo}</span></td>
+                                    <td><span class="badge badge-purple">${p.cantidad}</span></td>
+                                </tr>
+                            `).join('')}
+                        </tbody>
+                    </table>
+                </div>
+            ` : ''}
+            
+            ${reporte.alquileres_activos && reporte.alquileres_activos.length > 0 ? `
+                <div style="margin-bottom:25px">
+                    <h4 style="display:flex; align-items:center; gap:8px; margin-bottom:15px">
+                        Alquileres Activos (${reporte.alquileres_activos.length})
+                    </h4>
+                    <table class="table">
+                        <thead><tr><th>Cliente</th><th>Inicio</th><th>Fin</th><th>Total</th></tr></thead>
+                        <tbody>
+                            ${reporte.alquileres_activos.map(a => `
+                                <tr>
+                                    <td><strong>${a.cliente}</strong></td>
+                                    <td>${a.fecha_inicio}</td>
+                                    <td>${a.fecha_fin}</td>
+                                    <td><span class="badge badge-success">$ ${a.total.toFixed(2)}</span></td>
+                                </tr>
+                            `).join('')}
+                        </tbody>
+                    </table>
+                </div>
+            ` : ''}
+        </div>
+        
+        <div style="margin-top:20px; display:flex; gap:10px">
+            <button class="btn btn-black" onclick="descargarReporte('${reporte.id}')" style="flex:1">
+                Descargar PDF
+            </button>
+            <button class="btn btn-primary" onclick="closeModal()">Cerrar</button>
+        </div>
+    `;
+    document.getElementById('modalForm').classList.add('active');
+}
+
+async function descargarReporte(reporteId) {
+    try {
+        window.open(`/api/reportes/${reporteId}/descargar`, '_blank');
+    } catch (error) {
+        alert('Error al descargar reporte: ' + error.message);
+    }
+}
+
+function descargarTodosLosReportes() {
+    // El servidor arma el ZIP a medida que termina cada PDF, así que la descarga empieza enseguida
+    window.location.href = '/api/reportes/exportar';
+}
+
+async function eliminarReporte(reporteId) {
+    if (!confirm('¿Estás seguro de eliminar este reporte histórico? Esta acción no se puede deshacer.')) return;
+    
+    try {
+        const response = await fetch(`/api/reportes/${reporteId}`, {
+            method: 'DELETE',
+            headers: { 'Content-Type': 'application/json' }
+        });
+        
+        const result = await response.json();
+        
+        if (result.success) {
+            alert('Reporte eliminado correctamente');
+            renderReportes();
+        } else {
+            alert('❌ Error al eliminar reporte: ' + (result.error || 'Error desconocido'));
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert('❌ Error al eliminar reporte: ' + error.message);
+    }
+}
+
+function closeModal() {
+    document.getElementById('modalForm').classList.remove('active');
+}
+
+async function cerrarSesion() {
+    if (confirm('¿Estás seguro de que deseas cerrar sesión?')) {
+        try {
+            const response = await fetch('/logout', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' }
+            });
+            
+            const result = await response.json();
+            
+            if (result.success) {
+                data = { 
+                    productos: [], 
+                    clientes: [], 
+                    ventas: [], 
+                    alquileres: [],
+                    carrito: [], 
+                    ventasResumen: { grupos: [], tipos: [] },
+                    alquileresResumen: { grupos: [], tipos: [] }
+                };
+                
+                alert('Sesión cerrada correctamente. ¡Hasta pronto!');
+                window.location.href = '/login';
+            } else {
+                alert('Error al cerrar sesión: ' + (result.error || 'Inténtalo de nuevo'));
+            }
+        } catch (error) {
+            console.error('Error al cerrar sesión:', error);
+            alert('Error de conexión al cerrar sesión');
+            window.location.href = '/login';
+        }
+    }
+}
+
+document.getElementById('modalForm').onclick = (e) => {
+    if (e.target === document.getElementById('modalForm')) closeModal();
+};
+
+document.addEventListener('DOMContentLoaded', function() {
+    currentView = 'dashboard';
+    
+    const panelLink = document.querySelector('[data-view="dashboard"]');
+    if (panelLink) {
+        panelLink.classList.add('active');
+    }
+    
+    if (!isInitialized) {
+        showView('dashboard');
+        isInitialized = true;
+    }
+});
+// ==================== FUNCIÓN PARA VALIDAR SOLO NÚMEROS ====================
+
+function soloNumeros(event) {
+    const charCode = event.which ? event.which : event.keyCode;
+    // Permitir solo números (48-57) y teclas especiales (8=backspace, 46=delete, etc)
+    if (charCode > 31 && (charCode < 48 || charCode > 57)) {
+        event.preventDefault();
+        return false;
+    }
+    return true;
+}
+
+// ==================== FUNCIÓN PARA VALIDAR TELÉFONO EN TIEMPO REAL ====================
+
+function validarTelefonoInput(input) {
+    const telefono = input.value;
+    const errorElement = document.getElementById('telefonoError');
+    const btnGuardar = document.getElementById('btnGuardarCliente');
+    
+    // Remover cualquier carácter que no sea número
+    input.value = telefono.replace(/\D/g, '');
+    
+    // Si tiene contenido, validar longitud
+    if (input.value.length > 0) {
+        if (input.value.length === 10) {
+            // Teléfono válido
+            input.style.borderColor = '#2e7d32';
+            input.style.backgroundColor = '#e8f5e9';
+            errorElement.style.display = 'none';
+            btnGuardar.disabled = false;
+        } else {
+            // Teléfono inválido
+            input.style.borderColor = '#d32f2f';
+            input.style.backgroundColor = '#ffebee';
+            errorElement.style.display = 'block';
+            btnGuardar.disabled = true;
+        }
+    } else {
+        // Sin contenido (permitido ya que no es obligatorio)
+        input.style.borderColor = '';
+        input.style.backgroundColor = '';
+        errorElement.style.display = 'none';
+        btnGuardar.disabled = false;
+    }
+}
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+
+@pytest.fixture(scope='session')
+def aplicacion(tmp_path_factory):
+    """El módulo app sobre una base temporal y el modelo falso de benchmark.py."""
+    return benchmark.preparar_entorno(str(tmp_path_factory.mktemp('sabirus')))
+
+
+@pytest.fixture
+def contar_sentencias(aplicacion):
+    """Ejecuta `funcion` en un contexto de la app y devuelve su resultado y las sentencias SQL lanzadas."""
+    def contar(funcion, *args):
+        sentencias = []
+
+        def registrar(conexion, cursor, sql, parametros, contexto, varias):
+            sentencias.append(sql)
+
+        with aplicacion.app.app_context():
+            event.listen(aplicacion.db.engine, 'before_cursor_execute', registrar)
+            try:
+                resultado = funcion(*args)
+            finally:
+                event.remove(aplicacion.db.engine, 'before_cursor_execute', registrar)
+        return resultado, sentencias
+    return contar
+
+
+@pytest.fixture
+def contar_filas(aplicacion):
+    """Ejecuta `funcion` en un contexto de la app y devuelve su resultado y las filas que leyeron sus SELECT."""
+    def contar(funcion, *args):
+        consultas = []
+
+        def registrar(conexion, cursor, sql, parametros, contexto, varias):
+            if sql.lstrip().upper().startswith('SELECT'):
+                consultas.append((sql, parametros))
+
+        with aplicacion.app.app_context():
+            event.listen(aplicacion.db.engine, 'before_cursor_execute', registrar)
+            try:
+                resultado = funcion(*args)
+            finally:
+                event.remove(aplicacion.db.engine, 'before_cursor_execute', registrar)
+            # Cada SELECT se repite envuelto en un count(*) con los mismos parámetros
+            with aplicacion.db.engine.connect() as conexion:
+                filas = sum(
+                    conexion.exec_driver_sql(f'SELECT count(*) FROM ({sql})', tuple(parametros)).scalar()
+                    for sql, parametros in consultas
+                )
+        return resultado, filas
+    return contar
+
+
+@pytest.fixture
+def esperar_trabajo():
+    """Consulta /api/trabajos/<id> hasta que el trabajo termina y devuelve su estado final."""
+    def esperar(cliente, trabajo_id, limite=30):
+        fin = time.monotonic() + limite
+        while True:
+            trabajo = cliente.get(f'/api/trabajos/{trabajo_id}').get_json()
+            if trabajo['estado'] in ('completado', 'error'):
+                return trabajo
+            assert time.monotonic() < fin, trabajo
+            time.sleep(0.05)
+    return esperar
@@ -0,0 +1,20 @@
+import benchmark
+
+
+def test_listado_de_clientes_en_una_consulta(aplicacion, contar_sentencias):
+    benchmark.sembrar(aplicacion, 2000)
+    cliente = benchmark.cliente_autenticado(aplicacion)
+    respuesta, sentencias = contar_sentencias(cliente.get, '/api/clientes')
+    assert respuesta.status_code == 200
+    listado = respuesta.get_json()
+
+    with aplicacion.app.app_context():
+        m = aplicacion
+        assert len(listado) == m.Cliente.query.count()
+        assert sum(c['total_compras'] for c in listado) == m.Venta.query.count()
+        assert sum(c['total_alquileres'] for c in listado) == m.Alquiler.query.count()
+        primero = m.db.session.get(m.Cliente, listado[0]['id'])
+        assert listado[0]['total_compras'] == len(primero.ventas)
+        assert listado[0]['total_alquileres'] == len(primero.alquileres)
+    # Sesión de usuario, versiones del ETag y el listado: nada que dependa del número de clientes
+    assert len(sentencias) < 10
@@ -0,0 +1,61 @@
+import gzip
+import os
+import re
+
+import pytest
+
+import benchmark
+
+
+@pytest.fixture(scope='module')
+def cliente(aplicacion):
+    benchmark.sembrar(aplicacion, 200)
+    return benchmark.cliente_autenticado(aplicacion)
+
+
+def recursos_de_main(cliente):
+    html = cliente.get('/main').get_data(as_text=True)
+    return re.findall(r'/recursos/[\w/.-]+\.[0-9a-f]{12}\.\w+', html)
+
+
+def test_recursos_con_huella_e_inmutables(aplicacion, cliente):
+    urls = recursos_de_main(cliente)
+    assert any(url.endswith('.css') for url in urls) and any(url.endswith('.js') for url in urls)
+    for url in urls:
+        respuesta = cliente.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert respuesta.status_code == 200
+        assert respuesta.cache_control.immutable and respuesta.cache_control.max_age == aplicacion.CACHE_INMUTABLE
+        ruta = re.sub(r'\.[0-9a-f]{12}(\.\w+)$', r'\1', url[len('/recursos/'):])
+        with open(os.path.join(aplicacion.app.static_folder, ruta), 'rb') as archivo:
+            original = archivo.read()
+        if respuesta.content_encoding == 'gzip':
+            assert gzip.decompress(respuesta.data) == original
+        else:
+            assert respuesta.data == original
+
+
+def test_huella_vieja_redirige_y_desconocido_da_404(cliente):
+    url = next(u for u in recursos_de_main(cliente) if u.endswith('.js'))
+    vieja = re.sub(r'\.[0-9a-f]{12}\.js$', '.000000000000.js', url)
+    respuesta = cliente.get(vieja)
+    assert respuesta.status_code == 302
+    assert respuesta.headers['Location'].endswith(url)
+    assert cliente.get('/recursos/js/no-existe.000000000000.js').status_code == 404
+
+
+def test_json_grande_comprimido_segun_accept_encoding(cliente):
+    comprimida = cliente.get('/api/productos', headers={'Accept-Encoding': 'gzip'})
+    plana = cliente.get('/api/productos')
+    assert comprimida.content_encoding == 'gzip'
+    assert 'Accept-Encoding' in comprimida.vary
+    assert plana.content_encoding is None
+    assert gzip.decompress(comprimida.data) == plana.data
+    assert len(comprimida.data) < len(plana.data)
+
+
+def test_no_comprime_respuestas_pequenas_ni_en_streaming(cliente):
+    pequena = cliente.get('/api/trabajos/no-existe', headers={'Accept-Encoding': 'gzip'})
+    assert pequena.content_encoding is None
+    exportacion = cliente.get('/api/exportar/ventas', headers={'Accept-Encoding': 'gzip'})
+    assert exportacion.content_encoding is None
+    assert exportacion.data.startswith(b'{')
@@ -0,0 +1,41 @@
+import pytest
+
+import benchmark
+
+
+def recorridos_sin_indice(m):
+    """Pasos SCAN sin índice del plan de cada consulta crítica que debería usar uno."""
+    with m.app.app_context():
+        recorridos = {}
+        for nombre, consulta in m.consultas_criticas().items():
+            if nombre in m.RECORRIDO_ESPERADO:
+                continue
+            pasos = [paso for paso in m.plan_consulta(consulta) if paso.startswith('SCAN') and 'INDEX' not in paso]
+            if pasos:
+                recorridos[nombre] = pasos
+        return recorridos
+
+
+@pytest.mark.parametrize('ventas', [200, 2000])
+def test_consultas_criticas_con_estadisticas_al_dia(aplicacion, ventas):
+    # sembrar() corre ANALYZE al terminar la carga, como una importación
+    benchmark.sembrar(aplicacion, ventas)
+    with aplicacion.app.app_context():
+        analizadas = {tabla for tabla, in aplicacion.db.session.execute(aplicacion.db.text('SELECT tbl FROM sqlite_stat1'))}
+    assert {'venta', 'detalle_venta', 'alquiler', 'producto'} <= analizadas
+    assert recorridos_sin_indice(aplicacion) == {}
+
+
+def test_estadisticas_se_recalculan_tras_crecer(aplicacion):
+    m = aplicacion
+    benchmark.sembrar(m, 200)
+    with m.app.app_context():
+        # Foto tomada con una sola línea por venta, como la que quedaba al crear los índices
+        m.db.session.execute(m.db.text("UPDATE sqlite_stat1 SET stat = '200 200' WHERE idx = 'ix_detalle_venta_venta_id'"))
+        m.db.session.commit()
+        m.db.engine.dispose()
+        m.actualizar_estadisticas()
+        stat = m.db.session.execute(m.db.text(
+            "SELECT stat FROM sqlite_stat1 WHERE idx = 'ix_detalle_venta_venta_id'")).scalar()
+    assert stat != '200 200'
+    assert recorridos_sin_indice(m) == {}
@@ -0,0 +1,35 @@
+import benchmark
+
+
+def sembrar_con_agotados(aplicacion, ventas):
+    """sembrar() siempre crea 200 productos; los agotados extra hacen crecer también el catálogo."""
+    benchmark.sembrar(aplicacion, ventas)
+    with aplicacion.app.app_context():
+        aplicacion.db.session.execute(aplicacion.db.insert(aplicacion.Producto), [{
+            'nombre': f'Manta agotada {i}', 'tipo': 'manta', 'precio': 10,
+            'stock': 0, 'stock_minimo': 5, 'activo': True
+        } for i in range(ventas // 4)])
+        aplicacion.db.session.commit()
+
+
+def test_contexto_ia_no_crece_con_los_datos(aplicacion, contar_sentencias):
+    # Con 2000 ventas hay diez veces más clientes y ventas: un N+1 se notaría en el conteo
+    conteos = {}
+    for ventas in (200, 2000):
+        benchmark.sembrar(aplicacion, ventas)
+        contexto, sentencias = contar_sentencias(aplicacion.asistente_ia.obtener_contexto_completo)
+        assert contexto['ventas_recientes']
+        conteos[ventas] = len(sentencias)
+    assert conteos[200] == conteos[2000]
+
+
+def test_contexto_ia_lee_las_mismas_filas(aplicacion, contar_filas):
+    filas = {}
+    for ventas in (200, 2000):
+        sembrar_con_agotados(aplicacion, ventas)
+        contexto, filas[ventas] = contar_filas(aplicacion.asistente_ia.obtener_contexto_completo)
+        assert len(contexto['productos_stock_bajo']) == aplicacion.MAX_STOCK_BAJO_PROMPT
+        assert contexto['estadisticas']['total_stock_bajo'] >= ventas // 4
+    # Las últimas ventas y alquileres traen de 1 a 3 líneas de detalle cada uno según la semilla;
+    # los 450 agotados de diferencia sí se notarían
+    assert abs(filas[2000] - filas[200]) <= 20
@@ -0,0 +1,28 @@
+import benchmark
+
+
+def test_variante_comprimida_solo_vale_si_se_acepta(aplicacion):
+    benchmark.sembrar(aplicacion, 200)
+    cliente = benchmark.cliente_autenticado(aplicacion)
+    etag = cliente.get('/api/productos', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    assert cliente.get('/api/productos', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+    # Sin gzip la respuesta es otra entidad: el ETag comprimido no puede dar 304
+    respuesta = cliente.get('/api/productos', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+
+
+def test_etag_no_coincide_tras_recrear_la_base(aplicacion):
+    benchmark.sembrar(aplicacion, 200)
+    cliente = benchmark.cliente_autenticado(aplicacion)
+    etag = cliente.get('/api/productos').headers['ETag']
+    assert cliente.get('/api/productos', headers={'If-None-Match': etag}).status_code == 304
+
+    # La base nueva empieza otra vez con las versiones a cero
+    benchmark.sembrar(aplicacion, 200)
+    cliente = benchmark.cliente_autenticado(aplicacion)
+    respuesta = cliente.get('/api/productos', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+
+import pytest
+
+import benchmark
+
+
+def descargar(cliente, ruta, **parametros):
+    """Devuelve la respuesta y los bloques que envió, leídos según llegan."""
+    respuesta = cliente.get(ruta, query_string=parametros, buffered=False)
+    bloques = list(respuesta.response)
+    respuesta.close()
+    return respuesta, [b.decode('utf-8') if isinstance(b, bytes) else b for b in bloques]
+
+
+@pytest.fixture(scope='module')
+def cliente(aplicacion):
+    benchmark.sembrar(aplicacion, 2000)
+    return benchmark.cliente_autenticado(aplicacion)
+
+
+@pytest.mark.parametrize('entidad, modelo, detalle', [
+    ('ventas', 'Venta', 'DetalleVenta'),
+    ('alquileres', 'Alquiler', 'DetalleAlquiler'),
+])
+def test_ndjson_un_registro_por_linea(aplicacion, cliente, entidad, modelo, detalle):
+    respuesta, bloques = descargar(cliente, f'/api/exportar/{entidad}')
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/x-ndjson'
+    # Se envía por bloques, no como un único cuerpo
+    assert len(bloques) > 1
+    registros = [json.loads(linea) for linea in ''.join(bloques).splitlines()]
+    with aplicacion.app.app_context():
+        assert len(registros) == getattr(aplicacion, modelo).query.count()
+        assert sum(len(r['productos']) for r in registros) == getattr(aplicacion, detalle).query.count()
+
+
+def test_csv_una_fila_por_detalle(aplicacion, cliente):
+    respuesta, bloques = descargar(cliente, '/api/exportar/ventas', formato='csv')
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/csv'
+    filas = list(csv.DictReader(io.StringIO(''.join(bloques))))
+    with aplicacion.app.app_context():
+        assert len(filas) == aplicacion.DetalleVenta.query.count()
+        assert len({f['venta_id'] for f in filas}) == aplicacion.Venta.query.count()
+
+
+def test_rango_de_fechas(aplicacion, cliente):
+    ultima = cliente.get('/api/ventas?limite=1').get_json()['ventas'][0]
+    dia = '-'.join(reversed(ultima['fecha'][:10].split('/')))
+    _, bloques = descargar(cliente, '/api/exportar/ventas', desde=dia, hasta=dia)
+    registros = [json.loads(linea) for linea in ''.join(bloques).splitlines()]
+    assert ultima['id'] in {r['venta_id'] for r in registros}
+    assert all(r['fecha'].startswith(dia) for r in registros)
+
+
+@pytest.mark.parametrize('parametros', [{'formato': 'xml'}, {'desde': 'ayer'}, {'hasta': '2024-02-30'}])
+def test_parametros_invalidos_dan_400(cliente, parametros):
+    respuesta = cliente.get('/api/exportar/ventas', query_string=parametros)
+    assert respuesta.status_code == 400
+
+
+def test_consultas_fijas_con_el_historial(aplicacion, contar_sentencias):
+    conteos = {}
+    for ventas in (200, 2000):
+        benchmark.sembrar(aplicacion, ventas)
+        cliente = benchmark.cliente_autenticado(aplicacion)
+        _, sentencias = contar_sentencias(descargar, cliente, '/api/exportar/ventas')
+        conteos[ventas] = len(sentencias)
+    assert conteos[200] == conteos[2000]
@@ -0,0 +1,70 @@
+import io
+import os
+import zipfile
+from datetime import datetime
+
+import pytest
+
+import benchmark
+from reportes_agregacion import calcular_reporte_mensual, empaquetar_reporte, guardar_datos_reporte, rango_mes
+
+MESES = ['2023-10', '2023-11', '2023-12', '2024-01', '2024-02']
+
+
+@pytest.fixture
+def cliente(aplicacion):
+    """Reportes sin PDF guardado: la exportación los dibuja en el pool de procesos."""
+    benchmark.sembrar(aplicacion, 200)
+    m = aplicacion
+    with m.app.app_context():
+        datos = calcular_reporte_mensual(m.db.session, *rango_mes(datetime.utcnow()))
+        for mes_id in MESES:
+            reporte = m.ReporteMensual(id=mes_id, mes=mes_id)
+            guardar_datos_reporte(reporte, datos)
+            m.db.session.add(reporte)
+            m.eliminar_pdf_reporte(mes_id)
+        m.db.session.commit()
+    return benchmark.cliente_autenticado(aplicacion)
+
+
+def descargar_zip(cliente, **parametros):
+    respuesta = cliente.get('/api/reportes/exportar', query_string=parametros)
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/zip'
+    return zipfile.ZipFile(io.BytesIO(respuesta.data))
+
+
+def test_zip_con_un_pdf_por_reporte(aplicacion, cliente):
+    archivo = descargar_zip(cliente)
+    assert sorted(archivo.namelist()) == [f'reporte_completo_{mes}.pdf' for mes in MESES]
+    assert all(archivo.read(nombre).startswith(b'%PDF') for nombre in archivo.namelist())
+
+    # Los PDF dibujados quedan guardados: la siguiente exportación los copia tal cual
+    with aplicacion.app.app_context():
+        for mes_id in MESES:
+            reporte = aplicacion.db.session.get(aplicacion.ReporteMensual, mes_id)
+            ruta = aplicacion.ruta_pdf_reporte(reporte)
+            assert os.path.exists(ruta)
+            with open(ruta, 'rb') as pdf:
+                assert archivo.read(f'reporte_completo_{mes_id}.pdf') == pdf.read()
+
+
+def test_rango_de_meses(cliente):
+    archivo = descargar_zip(cliente, desde='2023-12', hasta='2024-01')
+    assert sorted(archivo.namelist()) == ['reporte_completo_2023-12.pdf', 'reporte_completo_2024-01.pdf']
+
+
+def test_un_pdf_que_falla_no_corta_el_zip(aplicacion, cliente):
+    with aplicacion.app.app_context():
+        roto = aplicacion.db.session.get(aplicacion.ReporteMensual, '2023-11')
+        empaquetar_reporte(roto, {'productos_mas_vendidos': None})
+        aplicacion.db.session.commit()
+    archivo = descargar_zip(cliente)
+    assert 'reporte_completo_2023-11.pdf' not in archivo.namelist()
+    assert len([n for n in archivo.namelist() if n.endswith('.pdf')]) == len(MESES) - 1
+    assert archivo.read('errores.txt').decode().startswith('2023-11:')
+
+
+def test_parametros(cliente):
+    assert cliente.get('/api/reportes/exportar?desde=2023-13').status_code == 400
+    assert cliente.get('/api/reportes/exportar?desde=2030-01').status_code == 404
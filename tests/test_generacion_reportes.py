@@ -0,0 +1,72 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+import benchmark
+from reportes_agregacion import calcular_reporte_mensual, rango_mes
+
+
+@pytest.fixture(scope='module')
+def cliente(aplicacion):
+    benchmark.sembrar(aplicacion, 2000)
+    with aplicacion.app.app_context():
+        aplicacion.ReporteMensual.query.delete()
+        aplicacion.db.session.commit()
+    return benchmark.cliente_autenticado(aplicacion)
+
+
+def meses_hacia_atras(cantidad):
+    meses = [rango_mes(datetime.utcnow())[0]]
+    for _ in range(cantidad - 1):
+        meses.append(rango_mes(meses[-1] - timedelta(days=1))[0])
+    return [mes.strftime('%Y-%m') for mes in reversed(meses)]
+
+
+def backfill(cliente, esperar_trabajo, **cuerpo):
+    respuesta = cliente.post('/api/reportes/generar', json=cuerpo)
+    assert respuesta.status_code == 202, respuesta.get_json()
+    return esperar_trabajo(cliente, respuesta.get_json()['trabajo_id'])
+
+
+def test_backfill_genera_y_luego_omite(aplicacion, cliente, esperar_trabajo):
+    meses = meses_hacia_atras(13)
+    trabajo = backfill(cliente, esperar_trabajo, desde=meses[0], hasta=meses[-1])
+    assert trabajo['estado'] == 'completado'
+    assert trabajo['procesados'] == trabajo['total'] == 13
+    assert trabajo['resultado'] == {'generados': meses, 'omitidos': []}
+
+    with aplicacion.app.app_context():
+        for mes_id in meses:
+            guardado = cliente.get(f'/api/reportes/{mes_id}').get_json()
+            esperado = calcular_reporte_mensual(aplicacion.db.session, *rango_mes(datetime.strptime(mes_id, '%Y-%m')))
+            assert guardado['total_ventas'] == esperado['total_ventas']
+            assert math.isclose(guardado['total_ingresos'], esperado['total_ingresos'])
+            assert guardado['ventas_por_dia'] == esperado['ventas_por_dia']
+
+    trabajo = backfill(cliente, esperar_trabajo, desde=meses[0], hasta=meses[-1])
+    assert trabajo['resultado'] == {'generados': [], 'omitidos': meses}
+
+    trabajo = backfill(cliente, esperar_trabajo, desde=meses[-3], hasta=meses[-1], reemplazar=True)
+    assert trabajo['resultado'] == {'generados': meses[-3:], 'omitidos': []}
+
+
+def test_mes_ya_generado_da_400(cliente, esperar_trabajo):
+    mes = meses_hacia_atras(1)[0]
+    respuesta = cliente.post('/api/reportes/generar', json={'mes': mes})
+    if respuesta.status_code == 202:
+        esperar_trabajo(cliente, respuesta.get_json()['trabajo_id'])
+    assert cliente.post('/api/reportes/generar', json={'mes': mes}).status_code == 400
+
+
+@pytest.mark.parametrize('cuerpo', [
+    {'mes': '2024-13'},
+    {'desde': 'enero'},
+    {'desde': '2024-05', 'hasta': '2024-01'},
+    {'desde': '2024-01', 'hasta': '2999-01'},
+    {'desde': '1990-01', 'hasta': '2024-01'},
+])
+def test_rangos_invalidos_dan_400(cliente, cuerpo):
+    respuesta = cliente.post('/api/reportes/generar', json=cuerpo)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['success'] is False
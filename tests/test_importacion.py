@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+import benchmark
+
+
+@pytest.fixture
+def cliente(aplicacion):
+    benchmark.sembrar(aplicacion, 200)
+    return benchmark.cliente_autenticado(aplicacion)
+
+
+def importar(cliente, contenido, nombre='catalogo.csv'):
+    respuesta = cliente.post('/api/productos/importar', data={'archivo': (io.BytesIO(contenido), nombre)},
+                             content_type='multipart/form-data')
+    assert respuesta.status_code == 202
+    return respuesta.get_json()['trabajo_id']
+
+
+def test_importa_csv_de_excel(aplicacion, cliente, esperar_trabajo):
+    with aplicacion.app.app_context():
+        existente = aplicacion.db.session.get(aplicacion.Producto, 1)
+        nombre, proveedor = existente.nombre, existente.proveedor
+    # Punto y coma, coma decimal y cp1252: lo que guarda Excel en español
+    contenido = '\n'.join([
+        'Nombre;Tipo;Proveedor;Precio;Stock;Disponible alquiler',
+        'Poncho añil;poncho;Lanas Cusco;120,50;7;sí',
+        f'{nombre};vestido;{proveedor};99;3;no',
+        'Sin precio;manta;Lanas Cusco;;1;no',
+        'Chompa;chompa;Hilos del Valle;-5;1;no',
+    ]).encode('cp1252')
+    trabajo = esperar_trabajo(cliente, importar(cliente, contenido))
+
+    assert trabajo['estado'] == 'completado'
+    assert trabajo['resultado'] == {'creados': 1, 'actualizados': 1, 'con_error': 2}
+    assert trabajo['procesados'] == trabajo['total'] == 4
+    assert [e['fila'] for e in trabajo['errores']] == [4, 5]
+    with aplicacion.app.app_context():
+        m = aplicacion
+        nuevo = m.Producto.query.filter_by(nombre='Poncho añil').one()
+        assert (nuevo.precio, nuevo.stock, nuevo.disponible_alquiler) == (120.5, 7, True)
+        assert m.db.session.get(m.Producto, 1).precio == 99
+        assert m.db.session.get(m.ResumenContadores, 1).total_productos == m.Producto.query.filter_by(activo=True).count()
+
+
+def test_un_insert_por_bloque(aplicacion, cliente, esperar_trabajo, contar_sentencias, monkeypatch):
+    monkeypatch.setattr(aplicacion, 'TAMANO_LOTE_IMPORTACION', 100)
+    contenido = '\n'.join(['nombre,tipo,proveedor,precio'] + [
+        f'Manta nueva {i},manta,Textiles Sur,{10 + i}' for i in range(250)
+    ]).encode('utf-8')
+    trabajo, sentencias = contar_sentencias(lambda: esperar_trabajo(cliente, importar(cliente, contenido)))
+    assert trabajo['resultado'] == {'creados': 250, 'actualizados': 0, 'con_error': 0}
+    assert sum(1 for sql in sentencias if sql.startswith('INSERT INTO producto')) == 3
+
+
+def test_bloque_fallido_no_pierde_el_avance(aplicacion, cliente, esperar_trabajo, monkeypatch):
+    monkeypatch.setattr(aplicacion, 'TAMANO_LOTE_IMPORTACION', 10)
+    guardar_lote = aplicacion._guardar_lote_catalogo
+    llamadas = []
+
+    def fallar_el_segundo(lote):
+        llamadas.append(len(lote))
+        if len(llamadas) == 2:
+            raise RuntimeError('disco lleno')
+        return guardar_lote(lote)
+
+    monkeypatch.setattr(aplicacion, '_guardar_lote_catalogo', fallar_el_segundo)
+    contenido = '\n'.join(['nombre,tipo,proveedor,precio'] + [
+        f'Sombrero {i},sombrero,Textiles Sur,30' for i in range(25)
+    ]).encode('utf-8')
+    trabajo = esperar_trabajo(cliente, importar(cliente, contenido))
+
+    assert trabajo['estado'] == 'completado'
+    assert trabajo['resultado'] == {'creados': 15, 'actualizados': 0, 'con_error': 10}
+    assert trabajo['procesados'] == 25
+    assert all('disco lleno' in e['error'] for e in trabajo['errores'])
+
+
+def test_formato_no_soportado(cliente):
+    respuesta = cliente.post('/api/productos/importar', data={'archivo': (io.BytesIO(b'x'), 'catalogo.pdf')},
+                             content_type='multipart/form-data')
+    assert respuesta.status_code == 400
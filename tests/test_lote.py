@@ -0,0 +1,85 @@
+import pytest
+
+import benchmark
+
+
+@pytest.fixture
+def cliente(aplicacion):
+    benchmark.sembrar(aplicacion, 200)
+    with aplicacion.app.app_context():
+        producto = aplicacion.db.session.get(aplicacion.Producto, 1)
+        producto.stock, producto.disponible_alquiler = 5, True
+        aplicacion.db.session.commit()
+    return benchmark.cliente_autenticado(aplicacion)
+
+
+def venta(cantidad, producto_id=1, cliente_id=1, **extra):
+    return {'cliente_id': cliente_id, 'metodo_pago': 'efectivo',
+            'productos': [{'producto_id': producto_id, 'cantidad': cantidad}], **extra}
+
+
+def alquiler(cantidad, estado='activo'):
+    return {'cliente_id': 2, 'metodo_pago': 'efectivo', 'fecha_inicio': '2024-03-01', 'fecha_fin': '2024-03-04',
+            'estado': estado, 'productos': [{'producto_id': 1, 'cantidad': cantidad}]}
+
+
+def contadores(aplicacion):
+    resumen = aplicacion.db.session.get(aplicacion.ResumenContadores, 1)
+    return (resumen.total_ventas, round(resumen.ingresos_ventas, 6), resumen.total_alquileres,
+            resumen.alquileres_activos, round(resumen.ingresos_alquileres, 6))
+
+
+def test_lote_acepta_y_rechaza_cada_item(aplicacion, cliente):
+    respuesta = cliente.post('/api/lote', json={
+        'ventas': [
+            venta(3),
+            venta(3),                   # solo quedan 2 tras la anterior
+            venta(1, cliente_id=99999),
+            {'cliente_id': 1, 'productos': []},
+            venta(1, fecha='2024-01-15T10:00:00'),
+        ],
+        'alquileres': [alquiler(10, estado='finalizado'), alquiler(1)],
+    })
+    assert respuesta.status_code == 200
+    cuerpo = respuesta.get_json()
+    assert [r['success'] for r in cuerpo['ventas']] == [True, False, False, False, True]
+    assert [r['success'] for r in cuerpo['alquileres']] == [True, True]
+    assert 'Stock insuficiente' in cuerpo['ventas'][1]['error']
+    assert (cuerpo['registradas'], cuerpo['rechazadas']) == (4, 3)
+
+    with aplicacion.app.app_context():
+        m = aplicacion
+        # El alquiler ya devuelto no descuenta stock
+        assert m.db.session.get(m.Producto, 1).stock == 0
+        historica = m.db.session.get(m.Venta, cuerpo['ventas'][4]['venta_id'])
+        assert historica.fecha.strftime('%Y-%m-%d') == '2024-01-15'
+        # Los contadores ajustados en la transacción coinciden con los reconstruidos desde las tablas
+        ajustados = contadores(m)
+        m.reconciliar_contadores()
+        assert contadores(m) == ajustados
+
+
+def test_lote_con_consultas_fijas(aplicacion, cliente, contar_sentencias):
+    with aplicacion.app.app_context():
+        m = aplicacion
+        m.Producto.query.filter(m.Producto.id.between(100, 149)).update({'stock': 1000})
+        m.db.session.commit()
+    conteos = {}
+    for cantidad in (10, 100):
+        lote = {'ventas': [venta(1, producto_id=100 + i % 50, cliente_id=1 + i % 7) for i in range(cantidad)]}
+        respuesta, sentencias = contar_sentencias(lambda: cliente.post('/api/lote', json=lote))
+        resultados = respuesta.get_json()['ventas']
+        assert all(r['success'] for r in resultados)
+        conteos[cantidad] = len(sentencias)
+        # Cada id devuelto corresponde a su item aunque las cabeceras se inserten en bloque
+        with aplicacion.app.app_context():
+            for item, resultado in zip(lote['ventas'], resultados):
+                registrada = aplicacion.db.session.get(aplicacion.Venta, resultado['venta_id'])
+                assert registrada.cliente_id == item['cliente_id']
+                assert registrada.detalles[0].producto_id == item['productos'][0]['producto_id']
+    assert conteos[10] == conteos[100]
+
+
+def test_lote_invalido(cliente):
+    assert cliente.post('/api/lote', json={'ventas': {'cliente_id': 1}}).status_code == 400
+    assert cliente.post('/api/lote', json={'ventas': [venta(1)] * 1001}).status_code == 413
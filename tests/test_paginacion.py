@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+import benchmark
+
+
+@pytest.fixture(scope='module')
+def cliente(aplicacion):
+    benchmark.sembrar(aplicacion, 2000)
+    return benchmark.cliente_autenticado(aplicacion)
+
+
+def recorrer(cliente, ruta, clave, **parametros):
+    paginas, cursor = [], None
+    while True:
+        consulta = dict(parametros, **({'cursor': cursor} if cursor else {}))
+        respuesta = cliente.get(ruta, query_string=consulta)
+        assert respuesta.status_code == 200
+        cuerpo = respuesta.get_json()
+        paginas.append(cuerpo[clave])
+        cursor = cuerpo['siguiente']
+        if cursor is None:
+            return paginas
+
+
+@pytest.mark.parametrize('ruta, clave, modelo', [
+    ('/api/ventas', 'ventas', 'Venta'),
+    ('/api/alquileres', 'alquileres', 'Alquiler'),
+])
+def test_cursor_recorre_todo_sin_repetir(aplicacion, cliente, ruta, clave, modelo):
+    paginas = recorrer(cliente, ruta, clave, limite=150)
+    ids = [registro['id'] for pagina in paginas for registro in pagina]
+    with aplicacion.app.app_context():
+        assert sorted(ids) == sorted(i for i, in aplicacion.db.session.query(getattr(aplicacion, modelo).id))
+    assert all(len(pagina) == 150 for pagina in paginas[:-1])
+
+
+def test_pagina_con_consultas_fijas(aplicacion, cliente, contar_sentencias):
+    conteos = set()
+    for limite in (10, 200):
+        respuesta, sentencias = contar_sentencias(cliente.get, f'/api/ventas?limite={limite}')
+        assert len(respuesta.get_json()['ventas']) == limite
+        conteos.add(len(sentencias))
+    assert len(conteos) == 1
+
+
+def test_filtros_de_fecha_y_cliente(aplicacion, cliente):
+    ventas = [v for pagina in recorrer(cliente, '/api/ventas', 'ventas', limite=200, cliente_id=3) for v in pagina]
+    assert ventas and all(v['cliente_id'] == 3 for v in ventas)
+
+    ultima = cliente.get('/api/ventas?limite=1').get_json()['ventas'][0]
+    dia = datetime.strptime(ultima['fecha'], '%d/%m/%Y %H:%M')
+    ventas = [v for pagina in recorrer(
+        cliente, '/api/ventas', 'ventas', desde=dia.strftime('%Y-%m-%d'), hasta=dia.strftime('%Y-%m-%d')
+    ) for v in pagina]
+    assert ultima['id'] in {v['id'] for v in ventas}
+    assert all(v['fecha'].startswith(dia.strftime('%d/%m/%Y')) for v in ventas)
+
+
+@pytest.mark.parametrize('parametros', [
+    {'cursor': 'sin-separador'},
+    {'cursor': 'ayer|1'},
+    {'cursor': '2024-01-01T00:00:00|uno'},
+    {'desde': '01/02/2024'},
+    {'hasta': '2024-13-01'},
+])
+@pytest.mark.parametrize('ruta', ['/api/ventas', '/api/alquileres'])
+def test_parametros_invalidos_dan_400(cliente, ruta, parametros):
+    respuesta = cliente.get(ruta, query_string=parametros)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['success'] is False
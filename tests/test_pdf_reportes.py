@@ -0,0 +1,76 @@
+import os
+from datetime import datetime
+
+import pytest
+
+import benchmark
+from reportes_agregacion import rango_mes
+
+
+@pytest.fixture
+def reporte(aplicacion):
+    """Genera el reporte del mes actual y devuelve (cliente, id, ruta del PDF)."""
+    benchmark.sembrar(aplicacion, 200)
+    mes = rango_mes(datetime.utcnow())[0]
+    assert aplicacion.generar_reporte_mes(mes, reemplazar=True) == 'generado'
+    reporte_id = mes.strftime('%Y-%m')
+    with aplicacion.app.app_context():
+        ruta = aplicacion.ruta_pdf_reporte(aplicacion.db.session.get(aplicacion.ReporteMensual, reporte_id))
+    return benchmark.cliente_autenticado(aplicacion), reporte_id, ruta
+
+
+def test_descarga_sale_del_artefacto(aplicacion, reporte, monkeypatch):
+    cliente, reporte_id, ruta = reporte
+    assert os.path.exists(ruta)
+
+    # Con el PDF ya dibujado por el trabajo, la descarga no vuelve a maquetar
+    def no_dibujar(datos):
+        raise AssertionError('el PDF no debería dibujarse otra vez')
+    monkeypatch.setattr(aplicacion, 'renderizar_reporte_pdf', no_dibujar)
+
+    respuesta = cliente.get(f'/api/reportes/{reporte_id}/descargar')
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/pdf'
+    assert respuesta.data.startswith(b'%PDF')
+    with open(ruta, 'rb') as archivo:
+        assert respuesta.data == archivo.read()
+
+
+def test_descarga_condicional_y_por_rangos(reporte):
+    cliente, reporte_id, _ = reporte
+    url = f'/api/reportes/{reporte_id}/descargar'
+    completa = cliente.get(url)
+    etag = completa.headers['ETag']
+
+    assert cliente.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert cliente.get(url, headers={'If-Modified-Since': completa.headers['Last-Modified']}).status_code == 304
+
+    parcial = cliente.get(url, headers={'Range': 'bytes=0-99'})
+    assert parcial.status_code == 206
+    assert parcial.data == completa.data[:100]
+    assert parcial.headers['Content-Range'] == f'bytes 0-99/{len(completa.data)}'
+
+
+def test_regenerar_cambia_la_clave_y_borra_el_anterior(aplicacion, reporte):
+    cliente, reporte_id, ruta = reporte
+    url = f'/api/reportes/{reporte_id}/descargar'
+    etag = cliente.get(url).headers['ETag']
+
+    aplicacion.generar_reporte_mes(datetime.strptime(reporte_id, '%Y-%m'), reemplazar=True)
+    assert not os.path.exists(ruta)
+    respuesta = cliente.get(url, headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+
+
+def test_sin_artefacto_se_dibuja_al_descargar(aplicacion, reporte):
+    cliente, reporte_id, ruta = reporte
+    os.remove(ruta)
+    respuesta = cliente.get(f'/api/reportes/{reporte_id}/descargar')
+    assert respuesta.status_code == 200
+    assert respuesta.data.startswith(b'%PDF')
+    assert os.path.exists(ruta)
+
+    assert cliente.delete(f'/api/reportes/{reporte_id}').status_code == 200
+    assert not os.path.exists(ruta)
+    assert cliente.get(f'/api/reportes/{reporte_id}/descargar').status_code == 404
@@ -0,0 +1,187 @@
+import math
+from datetime import timedelta
+
+import pytest
+
+import benchmark
+from reportes_agregacion import calcular_reporte_mensual, rango_mes
+
+
+def reporte_mensual_anterior(m, inicio_mes, fin_mes):
+    """Cálculo del reporte previo a calcular_reporte_mensual: objetos ORM y un SUM por producto."""
+    Venta, Alquiler, Producto, Cliente = m.Venta, m.Alquiler, m.Producto, m.Cliente
+    DetalleVenta, DetalleAlquiler, db = m.DetalleVenta, m.DetalleAlquiler, m.db
+
+    ventas_mes = Venta.query.filter(Venta.fecha >= inicio_mes, Venta.fecha < fin_mes).all()
+    total_ventas = len(ventas_mes)
+    total_ingresos = sum(v.total for v in ventas_mes)
+    promedio_venta = (total_ingresos / total_ventas) if total_ventas > 0 else 0
+
+    alquileres_mes = Alquiler.query.filter(Alquiler.fecha_registro >= inicio_mes, Alquiler.fecha_registro < fin_mes).all()
+    total_alquileres = len(alquileres_mes)
+    ingresos_alquileres = sum(a.total for a in alquileres_mes)
+
+    productos_mes = db.session.query(
+        Producto.nombre,
+        Producto.tipo,
+        Producto.proveedor,
+        db.func.sum(DetalleVenta.cantidad).label('total')
+    ).join(DetalleVenta).join(Venta).filter(
+        Venta.fecha >= inicio_mes,
+        Venta.fecha < fin_mes
+    ).group_by(Producto.id).order_by(db.desc('total')).limit(10).all()
+    productos_json = [{'nombre': p[0], 'tipo': p[1], 'proveedor': p[2], 'cantidad': int(p[3])} for p in productos_mes]
+
+    productos_alquilados = db.session.query(
+        Producto.nombre,
+        Producto.tipo,
+        db.func.sum(DetalleAlquiler.cantidad).label('total')
+    ).join(DetalleAlquiler).join(Alquiler).filter(
+        Alquiler.fecha_registro >= inicio_mes,
+        Alquiler.fecha_registro < fin_mes
+    ).group_by(Producto.id).order_by(db.desc('total')).limit(10).all()
+
+    alquileres_activos = Alquiler.query.filter(
+        Alquiler.estado == 'activo',
+        Alquiler.fecha_registro >= inicio_mes,
+        Alquiler.fecha_registro < fin_mes
+    ).all()
+
+    clientes_mes = db.session.query(
+        Cliente.nombre,
+        db.func.count(Venta.id).label('compras'),
+        db.func.sum(Venta.total).label('gastado')
+    ).join(Venta).filter(
+        Venta.fecha >= inicio_mes,
+        Venta.fecha < fin_mes
+    ).group_by(Cliente.id).order_by(db.desc('compras')).limit(10).all()
+
+    clientes_nuevos = Cliente.query.filter(
+        Cliente.fecha_registro >= inicio_mes,
+        Cliente.fecha_registro < fin_mes
+    ).all()
+
+    productos_stock_bajo = []
+    for producto in Producto.query.filter_by(activo=True).all():
+        ventas_producto = db.session.query(
+            db.func.sum(DetalleVenta.cantidad)
+        ).join(Venta).filter(
+            DetalleVenta.producto_id == producto.id,
+            Venta.fecha >= inicio_mes,
+            Venta.fecha < fin_mes
+        ).scalar() or 0
+        if ventas_producto > 0 and producto.stock <= producto.stock_minimo:
+            productos_stock_bajo.append({
+                'nombre': producto.nombre,
+                'tipo': producto.tipo,
+                'stock_actual': producto.stock,
+                'stock_minimo': producto.stock_minimo,
+                'veces_vendido': int(ventas_producto)
+            })
+
+    ventas_por_dia = {}
+    for venta in ventas_mes:
+        dia = venta.fecha.strftime('%d/%m')
+        if dia not in ventas_por_dia:
+            ventas_por_dia[dia] = {'cantidad': 0, 'total': 0}
+        ventas_por_dia[dia]['cantidad'] += 1
+        ventas_por_dia[dia]['total'] += venta.total
+
+    ventas_por_metodo = {}
+    for venta in ventas_mes:
+        if venta.metodo_pago not in ventas_por_metodo:
+            ventas_por_metodo[venta.metodo_pago] = {'cantidad': 0, 'total': 0}
+        ventas_por_metodo[venta.metodo_pago]['cantidad'] += 1
+        ventas_por_metodo[venta.metodo_pago]['total'] += venta.total
+
+    ventas_por_tipo = db.session.query(
+        Producto.tipo,
+        db.func.sum(DetalleVenta.cantidad).label('cantidad'),
+        db.func.sum(DetalleVenta.subtotal).label('total')
+    ).join(DetalleVenta).join(Venta).filter(
+        Venta.fecha >= inicio_mes,
+        Venta.fecha < fin_mes
+    ).group_by(Producto.tipo).all()
+
+    return {
+        'total_ventas': total_ventas,
+        'total_ingresos': total_ingresos,
+        'promedio_venta': promedio_venta,
+        'total_alquileres': total_alquileres,
+        'ingresos_alquileres': ingresos_alquileres,
+        'productos_mas_vendidos': productos_json,
+        'clientes_frecuentes': [{'nombre': c[0], 'compras': c[1], 'gastado': float(c[2])} for c in clientes_mes],
+        'clientes_nuevos': [{
+            'nombre': c.nombre,
+            'fecha_registro': c.fecha_registro.strftime('%d/%m/%Y'),
+            'telefono': c.telefono or 'N/A',
+            'email': c.email or 'N/A'
+        } for c in clientes_nuevos],
+        'productos_stock_bajo': productos_stock_bajo,
+        'ventas_por_dia': [
+            {'dia': dia, 'cantidad': datos['cantidad'], 'total': datos['total']}
+            for dia, datos in sorted(ventas_por_dia.items())
+        ],
+        'ventas_por_metodo_pago': [
+            {'metodo': metodo, 'cantidad': datos['cantidad'], 'total': datos['total']}
+            for metodo, datos in ventas_por_metodo.items()
+        ],
+        'productos_mas_reabastecidos': productos_json[:5],
+        'ventas_por_tipo_producto': [
+            {'tipo': t[0], 'cantidad': int(t[1]), 'total': float(t[2])} for t in ventas_por_tipo
+        ],
+        'alquileres_activos': [{
+            'cliente': a.cliente.nombre,
+            'total': a.total,
+            'fecha_inicio': a.fecha_inicio.strftime('%d/%m/%Y'),
+            'fecha_fin': a.fecha_fin.strftime('%d/%m/%Y')
+        } for a in alquileres_activos],
+        'productos_mas_alquilados': [{'nombre': p[0], 'tipo': p[1], 'cantidad': int(p[2])} for p in productos_alquilados]
+    }
+
+
+def assert_equivalentes(nuevo, anterior, ruta='reporte'):
+    """Igualdad estructural; los flotantes con tolerancia porque el orden de las sumas cambia."""
+    if isinstance(anterior, float) or isinstance(nuevo, float):
+        assert math.isclose(nuevo, anterior, rel_tol=1e-9, abs_tol=1e-6), ruta
+    elif isinstance(anterior, dict):
+        assert nuevo.keys() == anterior.keys(), ruta
+        for clave in anterior:
+            assert_equivalentes(nuevo[clave], anterior[clave], f'{ruta}.{clave}')
+    elif isinstance(anterior, list):
+        assert len(nuevo) == len(anterior), ruta
+        for indice, (a, b) in enumerate(zip(nuevo, anterior)):
+            assert_equivalentes(a, b, f'{ruta}[{indice}]')
+    else:
+        assert nuevo == anterior, ruta
+
+
+def como_conjunto(filas):
+    return {tuple(sorted(fila.items())) for fila in filas}
+
+
+@pytest.fixture(scope='module')
+def meses_sembrados(aplicacion):
+    benchmark.sembrar(aplicacion, 2000)
+    with aplicacion.app.app_context():
+        fechas = aplicacion.db.session.query(aplicacion.Venta.fecha).all()
+    inicios = sorted({rango_mes(fecha)[0] for fecha, in fechas})
+    # Un mes sin movimientos también tiene que salir igual
+    return inicios + [rango_mes(inicios[0] - timedelta(days=1))[0]]
+
+
+def test_reporte_igual_al_calculo_anterior(aplicacion, meses_sembrados):
+    with aplicacion.app.app_context():
+        for inicio in meses_sembrados:
+            rango = rango_mes(inicio)
+            nuevo = calcular_reporte_mensual(aplicacion.db.session, *rango)
+            anterior = reporte_mensual_anterior(aplicacion, *rango)
+            # La consulta anterior de alquileres activos no tenía ORDER BY
+            assert como_conjunto(nuevo.pop('alquileres_activos')) == como_conjunto(anterior.pop('alquileres_activos'))
+            assert_equivalentes(nuevo, anterior, inicio.strftime('%Y-%m'))
+
+
+def test_reporte_sentencias_fijas(aplicacion, meses_sembrados, contar_sentencias):
+    for inicio in meses_sembrados:
+        _, sentencias = contar_sentencias(calcular_reporte_mensual, aplicacion.db.session, *rango_mes(inicio))
+        assert len(sentencias) == 8
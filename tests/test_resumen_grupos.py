@@ -0,0 +1,40 @@
+import math
+
+import pytest
+
+import benchmark
+
+
+@pytest.mark.parametrize('entidad, total', [('ventas', 'total_compras'), ('alquileres', 'total_alquileres')])
+def test_resumen_coincide_con_los_grupos_completos(aplicacion, entidad, total):
+    benchmark.sembrar(aplicacion, 2000)
+    cliente = benchmark.cliente_autenticado(aplicacion)
+    resumen = cliente.get(f'/api/{entidad}/resumen').get_json()
+    agrupado = {g['cliente_id']: g for g in cliente.get(f'/api/{entidad}?modo=agrupado').get_json()}
+
+    assert {g['cliente_id'] for g in resumen['grupos']} == set(agrupado)
+    for grupo in resumen['grupos']:
+        completo = agrupado[grupo['cliente_id']]
+        assert grupo[total] == completo[total] == len(completo[entidad])
+        assert math.isclose(grupo['total_gastado'], completo['total_gastado'])
+
+    # Con ?tipo= solo quedan los clientes con alguna transacción de ese tipo
+    tipo = resumen['tipos'][0]
+    filtrado = cliente.get(f'/api/{entidad}/resumen', query_string={'tipo': tipo}).get_json()['grupos']
+    esperados = {
+        cliente_id for cliente_id, grupo in agrupado.items()
+        if any(p['tipo'] == tipo for registro in grupo[entidad] for p in registro['productos'])
+    }
+    assert {g['cliente_id'] for g in filtrado} == esperados
+
+
+@pytest.mark.parametrize('entidad', ['ventas', 'alquileres'])
+def test_resumen_no_crece_con_las_transacciones(aplicacion, contar_sentencias, entidad):
+    conteos = {}
+    for ventas in (200, 2000):
+        benchmark.sembrar(aplicacion, ventas)
+        cliente = benchmark.cliente_autenticado(aplicacion)
+        respuesta, sentencias = contar_sentencias(cliente.get, f'/api/{entidad}/resumen')
+        assert respuesta.status_code == 200
+        conteos[ventas] = len(sentencias)
+    assert conteos[200] == conteos[2000]
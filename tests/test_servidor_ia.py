@@ -0,0 +1,43 @@
+import os
+import socket
+import stat
+
+import pytest
+
+
+@pytest.fixture
+def ruta_socket(tmp_path):
+    return str(tmp_path / 'ia.sock')
+
+
+def test_socket_solo_para_el_usuario(aplicacion, ruta_socket):
+    servidor = aplicacion.ServidorIA(ruta_socket, aplicacion.asistente_ia)
+    try:
+        assert stat.S_IMODE(os.stat(ruta_socket).st_mode) == 0o600
+    finally:
+        servidor.server_close()
+
+
+def test_reemplaza_el_socket_de_un_servidor_caido(aplicacion, ruta_socket):
+    anterior = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    anterior.bind(ruta_socket)
+    anterior.close()
+
+    servidor = aplicacion.ServidorIA(ruta_socket, aplicacion.asistente_ia)
+    servidor.server_close()
+
+
+def test_no_borra_lo_que_no_es_un_socket_libre(aplicacion, ruta_socket):
+    with open(ruta_socket, 'w') as archivo:
+        archivo.write('datos')
+    with pytest.raises(RuntimeError):
+        aplicacion.ServidorIA(ruta_socket, aplicacion.asistente_ia)
+    assert os.path.isfile(ruta_socket)
+
+    os.unlink(ruta_socket)
+    servidor = aplicacion.ServidorIA(ruta_socket, aplicacion.asistente_ia)
+    try:
+        with pytest.raises(RuntimeError):
+            aplicacion.ServidorIA(ruta_socket, aplicacion.asistente_ia)
+    finally:
+        servidor.server_close()
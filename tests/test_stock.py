@@ -0,0 +1,10 @@
+import benchmark
+
+
+def test_compras_concurrentes_no_sobrevenden(aplicacion):
+    benchmark.sembrar(aplicacion, 200)
+    # Más cajas que unidades, comprando y alquilando el mismo producto a la vez
+    resultado = benchmark.medir_reserva_stock(aplicacion, hilos=16, stock_inicial=5)
+    assert resultado['stock_final'] >= 0
+    assert resultado['exitosas'] == resultado['stock_inicial'] - resultado['stock_final']
+    assert resultado['errores'] == 0
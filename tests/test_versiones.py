@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+import benchmark
+
+
+@pytest.fixture
+def externos(aplicacion, monkeypatch):
+    """Recursos que version_datos da por cambiados en otro proceso (lo que reinicia los índices)."""
+    benchmark.sembrar(aplicacion, 200)
+    avisos = []
+    monkeypatch.setattr(aplicacion.version_datos, '_suscriptores_externos', [avisos.extend])
+    return avisos
+
+
+def sincronizar(aplicacion):
+    with aplicacion.app.app_context():
+        aplicacion.version_datos.sincronizar(('clientes',))
+
+
+def subir_en_otro_proceso(aplicacion, veces=1):
+    """Sube la versión de clientes sin pasar por la sesión, como lo haría otro worker."""
+    with aplicacion.app.app_context(), aplicacion.db.engine.begin() as conexion:
+        for _ in range(veces):
+            conexion.exec_driver_sql("UPDATE version_recurso SET version = version + 1 WHERE recurso = 'clientes'")
+        return conexion.exec_driver_sql("SELECT version FROM version_recurso WHERE recurso = 'clientes'").scalar()
+
+
+def nuevo_cliente(cliente, nombre):
+    assert cliente.post('/api/clientes', json={'nombre': nombre}).get_json()['success']
+
+
+def test_escrituras_propias_no_son_cambios_externos(aplicacion, externos):
+    cliente = benchmark.cliente_autenticado(aplicacion)
+    # Primera escritura del proceso, sin ninguna versión vista antes
+    nuevo_cliente(cliente, 'Rosa Quispe')
+    sincronizar(aplicacion)
+    nuevo_cliente(cliente, 'Juana Mamani')
+    sincronizar(aplicacion)
+    assert externos == []
+
+
+def test_confirmaciones_desordenadas(aplicacion, externos):
+    sincronizar(aplicacion)
+    externos.clear()
+    # Dos commits de este proceso (v+1 y v+2) cuyos after_commit llegan al revés
+    version = subir_en_otro_proceso(aplicacion, veces=2)
+    confirmar = aplicacion.version_datos._confirmar
+    confirmar(SimpleNamespace(info={'versiones_nuevas': {'clientes': (version - 1, version)}}))
+    confirmar(SimpleNamespace(info={'versiones_nuevas': {'clientes': (version - 2, version - 1)}}))
+    assert aplicacion.version_datos.vistas['clientes'] == version
+    sincronizar(aplicacion)
+    assert externos == []
+
+
+def test_cambio_de_otro_proceso_se_detecta(aplicacion, externos):
+    cliente = benchmark.cliente_autenticado(aplicacion)
+    sincronizar(aplicacion)
+    externos.clear()
+
+    subir_en_otro_proceso(aplicacion)
+    sincronizar(aplicacion)
+    assert externos == ['clientes']
+
+    # Un cambio ajeno entre dos escrituras propias deja un salto que también se detecta
+    externos.clear()
+    nuevo_cliente(cliente, 'Rosa Quispe')
+    subir_en_otro_proceso(aplicacion)
+    nuevo_cliente(cliente, 'Juana Mamani')
+    sincronizar(aplicacion)
+    assert externos == ['clientes']